@@ -0,0 +1,81 @@
+"""Compara el ajuste conjunto de ``SeasonalForecast`` con un bucle por estación.
+
+El bucle resuelve, para cada estación, el mínimos cuadrados completo con
+``np.linalg.lstsq`` (168 indicadoras de franja + tendencia) sobre sus horas
+registradas, que es lo que habría que hacer sin el ajuste por lotes.
+
+Uso (desde la raíz del repositorio)::
+
+    python benchmarks/bench_forecast.py [carpeta] [repeticiones]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mobility.traffic_anomaly import FRANJAS, slot_of
+from mobility.traffic_forecast import HORAS_ANIO, SeasonalForecast
+from mobility.traffic_store import CARPETA_CACHE, open_tensor
+
+
+def loop_fit(tensor):
+    """Perfil y pendiente estación a estación con ``lstsq``."""
+    horas = np.asarray(tensor.horas)
+    origen = float(horas.mean())
+    t = (horas - origen) / HORAS_ANIO
+    franjas = slot_of(horas)
+    totales = tensor.conteos.sum(axis=2, dtype=np.int64)
+
+    perfil = np.full((len(tensor.estaciones), FRANJAS), np.nan)
+    pendiente = np.zeros(len(tensor.estaciones))
+    for fila in range(len(tensor.estaciones)):
+        registradas = tensor.presente[fila]
+        if not registradas.any():
+            continue
+        diseno = np.zeros((registradas.sum(), FRANJAS + 1))
+        diseno[np.arange(len(diseno)), franjas[registradas]] = 1.0
+        diseno[:, FRANJAS] = t[registradas]
+        usadas = np.unique(franjas[registradas])
+        columnas = np.append(usadas, FRANJAS)
+        coeficientes = np.linalg.lstsq(diseno[:, columnas], totales[fila, registradas], rcond=None)[0]
+        perfil[fila, usadas] = coeficientes[:-1]
+        pendiente[fila] = coeficientes[-1]
+    return perfil, pendiente
+
+
+def best_of(funcion, repeticiones):
+    mejor, resultado = float('inf'), None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def main():
+    carpeta = sys.argv[1] if len(sys.argv) > 1 else "Datos 2"
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    tensor, _ = open_tensor(carpeta, CARPETA_CACHE)
+
+    t_lotes, modelo = best_of(lambda: SeasonalForecast.fit(tensor), repeticiones)
+    t_bucle, (perfil, pendiente) = best_of(lambda: loop_fit(tensor), 1)
+
+    # Ambos caminos resuelven el mismo problema de mínimos cuadrados. En las
+    # estaciones con una sola muestra por franja la pendiente no está
+    # identificada (el ajuste conjunto la deja en 0 y lstsq da la de norma mínima)
+    identificadas = np.isfinite(modelo.var_pendiente)
+    assert np.allclose(modelo.pendiente[identificadas], pendiente[identificadas], rtol=1e-6, atol=1e-6)
+    assert np.allclose(modelo.perfil[identificadas], perfil[identificadas], rtol=1e-6, atol=1e-6, equal_nan=True)
+
+    print(f"{len(tensor.estaciones)} stations x {len(tensor.horas):,} hours "
+          f"({identificadas.sum()} with an identifiable trend)")
+    print(f"per-station lstsq : {t_bucle:8.3f} s")
+    print(f"batched fit       : {t_lotes:8.3f} s")
+    print(f"speedup           : {t_bucle / t_lotes:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
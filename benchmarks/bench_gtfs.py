@@ -0,0 +1,252 @@
+"""Escalabilidad de las páginas de autobuses con feeds GTFS sintéticos.
+
+Para cada escala se genera (una vez) un feed con ``synthetic_gtfs`` en
+``<trabajo>/x<escala>/Datos 1`` y se miden, cada una en su propio proceso y
+con ``<trabajo>/x<escala>`` como directorio de trabajo (las páginas usan las
+rutas relativas ``Datos 1`` y ``cache/artifacts``), estas etapas:
+
+- ``build``: ``load_gtfs`` forzando la reconstrucción de los artefactos, con
+  el tiempo de ``read_feed``, ``enrich_stop_times``, ``snap_stops`` y
+  ``build_segments`` por separado (el resto es escribir las tablas)
+- ``load``: ``load_gtfs`` con los artefactos ya al día
+- una etapa por página (``Bus_Stations``, ``Interactive_map``,
+  ``Time_efficiency``): la página entera sin navegador con ``AppTest``, con
+  los valores por defecto de sus controles y la caché de Streamlit vacía
+- ``temp.py``: el script de ``Datos 1`` ejecutado en la carpeta del feed
+
+De cada etapa se guarda el tiempo y el pico de RSS, y de las páginas el
+número de excepciones que han mostrado. Los resultados se añaden como líneas
+JSON a ``--salida`` y se imprimen junto a la última medición de otro commit,
+como en ``bench_scaling.py``.
+
+``--ejes`` elige qué dimensiones del feed crecen con la escala: ``rutas``
+(y con ellas los shapes), ``viajes``, ``paradas`` y ``puntos`` (por shape).
+
+Uso (desde la raíz del repositorio)::
+
+    python benchmarks/bench_gtfs.py [--escalas 1,10,50] [--ejes rutas,viajes,paradas] [--trabajo DIR]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import runpy
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks import synthetic_gtfs
+from benchmarks.bench_scaling import git_commit, wait_result
+from mobility import artifacts, gtfs
+from mobility.artifacts import CARPETA_ARTEFACTOS, load_gtfs
+from mobility.gtfs import CARPETA_GTFS
+
+ESCALAS = (1, 10, 50)
+EJES = ('rutas', 'viajes', 'paradas', 'puntos')
+EJES_POR_DEFECTO = ('rutas', 'viajes', 'paradas')
+TRABAJO = os.path.join(tempfile.gettempdir(), "mobility-bench-gtfs")
+SALIDA = os.path.join("benchmarks", "results", "gtfs.jsonl")
+PAGINAS = ("Bus_Stations", "Interactive_map", "Time_efficiency")
+SCRIPT = os.path.join(RAIZ, CARPETA_GTFS, "temp.py")
+
+
+def _rss_mb():
+    """Pico de RSS del proceso en MB (Linux da ``ru_maxrss`` en KB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def scale_feed(escala, ejes=EJES_POR_DEFECTO):
+    """Parámetros de ``generate_feed`` para un feed ``escala`` veces mayor en ``ejes``."""
+    base = {
+        'rutas': synthetic_gtfs.RUTAS, 'viajes': synthetic_gtfs.VIAJES,
+        'paradas': synthetic_gtfs.PARADAS, 'puntos': synthetic_gtfs.PUNTOS,
+    }
+    return {eje: int(round(valor * escala)) if eje in ejes else valor for eje, valor in base.items()}
+
+
+# =============================================
+# ETAPAS
+# =============================================
+def _timed(modulo, nombre, tiempos):
+    """Sustituye ``modulo.nombre`` por una versión que acumula su tiempo en ``tiempos``."""
+    funcion = getattr(modulo, nombre)
+
+    def medida(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            tiempos[nombre] = tiempos.get(nombre, 0.0) + time.perf_counter() - inicio
+
+    setattr(modulo, nombre, medida)
+
+
+def _stage_build():
+    tiempos = {}
+    _timed(artifacts, 'read_feed', tiempos)
+    _timed(gtfs, 'enrich_stop_times', tiempos)
+    _timed(gtfs, 'snap_stops', tiempos)
+    _timed(gtfs, 'build_segments', tiempos)
+    tablas = load_gtfs(CARPETA_ARTEFACTOS, CARPETA_GTFS, forzar=True)
+    return {'tiempos': tiempos, 'filas': {nombre: int(len(df)) for nombre, df in tablas.items()}}
+
+
+def _stage_load():
+    tablas = load_gtfs(CARPETA_ARTEFACTOS, CARPETA_GTFS)
+    return {'filas': {nombre: int(len(df)) for nombre, df in tablas.items()}}
+
+
+def _stage_page(pagina):
+    from streamlit.testing.v1 import AppTest
+
+    prueba = AppTest.from_file(os.path.join(RAIZ, "pages", f"{pagina}.py"), default_timeout=24 * 3600)
+    prueba.run()
+    return {'excepciones': [str(e.value)[:200] for e in prueba.exception]}
+
+
+def _stage_script():
+    directorio = os.getcwd()
+    os.chdir(CARPETA_GTFS)
+    try:
+        variables = runpy.run_path(SCRIPT, run_name="__main__")
+    finally:
+        os.chdir(directorio)
+    return {'filas': int(len(variables['df_final']))}
+
+
+ETAPAS = {
+    'build': _stage_build,
+    'load': _stage_load,
+    **{pagina: (lambda pagina=pagina: _stage_page(pagina)) for pagina in PAGINAS},
+    'temp.py': _stage_script,
+}
+
+
+def _child(etapa, directorio, cola):
+    os.chdir(directorio)
+    base = _rss_mb()
+    inicio = time.perf_counter()
+    try:
+        detalle = ETAPAS[etapa]()
+    except Exception as e:
+        cola.put({'error': f"{type(e).__name__}: {e}"})
+        return
+    cola.put({
+        'segundos': time.perf_counter() - inicio,
+        'rss_pico_mb': _rss_mb(),
+        'rss_base_mb': base,
+        'detalle': detalle,
+    })
+
+
+def run_stage(etapa, directorio):
+    """Ejecuta una etapa en un proceso nuevo con ``directorio`` como directorio de trabajo."""
+    contexto = multiprocessing.get_context('spawn')
+    cola = contexto.Queue()
+    proceso = contexto.Process(target=_child, args=(etapa, directorio, cola))
+    proceso.start()
+    return wait_result(proceso, cola)
+
+
+# =============================================
+# DATOS SINTÉTICOS Y RESULTADOS
+# =============================================
+def prepare_feed(trabajo, escala, ejes=EJES_POR_DEFECTO, semilla=synthetic_gtfs.SEMILLA):
+    """Directorio de trabajo con el feed sintético de una escala (se genera solo si falta)."""
+    directorio = os.path.join(trabajo, f"x{escala:g}")
+    carpeta = os.path.join(directorio, CARPETA_GTFS)
+    sello = os.path.join(directorio, "feed.json")
+    parametros = dict(scale_feed(escala, ejes), semilla=semilla)
+    if os.path.exists(sello):
+        with open(sello, encoding='utf-8') as f:
+            guardado = json.load(f)
+        if guardado['parametros'] == parametros:
+            return directorio, guardado
+    shutil.rmtree(directorio, ignore_errors=True)
+    # En otro proceso: ru_maxrss se conserva al lanzar las etapas, y generar un
+    # feed grande subiría la RSS base de todas
+    with multiprocessing.get_context('spawn').Pool(1) as grupo:
+        filas = grupo.apply(synthetic_gtfs.generate_feed, (carpeta,), parametros)
+    guardado = {'parametros': parametros, 'filas': filas}
+    with open(sello, 'w', encoding='utf-8') as f:
+        json.dump(guardado, f)
+    return directorio, guardado
+
+
+def _previous(salida, commit):
+    """Última medición de cada (escala, ejes, etapa) de otro commit."""
+    previas = {}
+    if not os.path.exists(salida):
+        return previas
+    with open(salida, encoding='utf-8') as f:
+        for linea in f:
+            registro = json.loads(linea)
+            if registro.get('commit') == commit or 'error' in registro:
+                continue
+            previas[(registro['escala'], tuple(registro['ejes']), registro['etapa'])] = registro
+    return previas
+
+
+def _compare(previo):
+    return f"  (was {previo:8.2f})" if previo is not None else ""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the bus pages on synthetic GTFS feeds.")
+    parser.add_argument("--escalas", default=",".join(map(str, ESCALAS)), help="comma-separated sizes relative to Datos 1")
+    parser.add_argument("--ejes", default=",".join(EJES_POR_DEFECTO),
+                        help=f"comma-separated dimensions that grow with the scale ({', '.join(EJES)})")
+    parser.add_argument("--etapas", default=",".join(ETAPAS), help="comma-separated stages to run")
+    parser.add_argument("--trabajo", default=TRABAJO, help="folder for the synthetic feeds and their artifacts")
+    parser.add_argument("--salida", default=SALIDA, help="JSON lines file the results are appended to")
+    args = parser.parse_args(argv)
+
+    ejes = tuple(e for e in EJES if e in args.ejes.split(","))
+    etapas = [e for e in ETAPAS if e in args.etapas.split(",")]
+    commit = git_commit()
+    previas = _previous(args.salida, commit)
+    entorno = {
+        'commit': commit, 'fecha': time.strftime("%Y-%m-%dT%H:%M:%S"), 'maquina': platform.platform(),
+        'cpus': os.cpu_count(), 'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+    }
+    os.makedirs(os.path.dirname(args.salida) or ".", exist_ok=True)
+
+    for escala in (float(e) for e in args.escalas.split(",")):
+        inicio = time.perf_counter()
+        directorio, datos = prepare_feed(args.trabajo, escala, ejes)
+        filas = datos['filas']
+        print(f"\n== {escala:g}x ({', '.join(ejes)}): {filas['routes']} routes, {filas['trips']:,} trips, "
+              f"{filas['stops']:,} stops, {filas['shapes']:,} shape points, {filas['stop_times']:,} stop times "
+              f"(feed ready in {time.perf_counter() - inicio:.1f} s)")
+
+        for etapa in etapas:
+            resultado = run_stage(etapa, directorio)
+            registro = dict(entorno, escala=escala, ejes=list(ejes), etapa=etapa, filas=filas,
+                            parametros=datos['parametros'], **resultado)
+            with open(args.salida, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(registro) + "\n")
+
+            if 'error' in resultado:
+                print(f"{etapa:<20} failed: {resultado['error']}")
+                continue
+            previo = previas.get((escala, ejes, etapa))
+            print(f"{etapa:<20}{resultado['segundos']:8.2f} s{_compare(previo and previo['segundos'])}"
+                  f"   peak RSS {resultado['rss_pico_mb']:8.1f} MB (base {resultado['rss_base_mb']:.1f} MB)")
+            for nombre, segundos in resultado['detalle'].get('tiempos', {}).items():
+                anterior = previo and previo['detalle']['tiempos'].get(nombre)
+                print(f"  {nombre:<18}{segundos:8.2f} s{_compare(anterior)}")
+            for excepcion in resultado['detalle'].get('excepciones', []):
+                print(f"  exception: {excepcion}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Compara el lector de ancho fijo con la lectura antigua basada en pandas.
+
+Uso (desde la raíz del repositorio)::
+
+    python benchmarks/bench_parser.py [carpeta] [repeticiones]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mobility.traffic_parser import parse_datosvolumen
+from mobility.traffic_store import SUFIJO_SEMANAL
+
+
+def legacy_parse(ruta):
+    """Lectura por fichero tal y como la hacía Traffic_networks.py."""
+    try:
+        df = pd.read_csv(ruta, delimiter=";", encoding='utf-8')
+    except UnicodeDecodeError:
+        df = pd.read_csv(ruta, delimiter=";", encoding='latin1')
+
+    df['Fecha'] = pd.to_datetime(df['Fecha'], dayfirst=True)
+    df['Hora'] = df['Hora'].astype(str)
+    for col in df.columns:
+        if 'ligeros' in col or 'pesados' in col:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
+    return df
+
+
+def best_of(funcion, ficheros, repeticiones):
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for ruta in ficheros:
+            funcion(ruta)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main():
+    carpeta = sys.argv[1] if len(sys.argv) > 1 else "Datos 2"
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    ficheros = sorted(os.path.join(carpeta, f) for f in os.listdir(carpeta) if f.endswith(SUFIJO_SEMANAL))
+
+    # Comprobación de que ambos lectores producen los mismos valores
+    for ruta in ficheros:
+        nuevo = parse_datosvolumen(ruta)
+        antiguo = legacy_parse(ruta)
+        columnas = [c for c in antiguo.columns if 'ligeros' in c or 'pesados' in c]
+        assert np.array_equal(nuevo['carriles'], antiguo[columnas].to_numpy()), ruta
+        assert np.array_equal(nuevo['fecha'], antiguo['Fecha'].to_numpy().astype('datetime64[D]')), ruta
+
+    filas = sum(len(parse_datosvolumen(r)['estacion']) for r in ficheros)
+    t_antiguo = best_of(legacy_parse, ficheros, repeticiones)
+    t_nuevo = best_of(parse_datosvolumen, ficheros, repeticiones)
+
+    print(f"{len(ficheros)} files, {filas:,} rows")
+    print(f"pandas read_csv path : {t_antiguo:8.3f} s  ({t_antiguo / len(ficheros) * 1000:6.1f} ms/file)")
+    print(f"fixed-layout parser  : {t_nuevo:8.3f} s  ({t_nuevo / len(ficheros) * 1000:6.1f} ms/file)")
+    print(f"speedup              : {t_antiguo / t_nuevo:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
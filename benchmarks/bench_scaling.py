@@ -0,0 +1,380 @@
+"""Escalabilidad del pipeline de tráfico con históricos sintéticos 1x, 10x, 100x.
+
+Para cada escala se genera (una vez) un histórico con ``synthetic_traffic`` y
+se miden, cada una en su propio proceso para que el pico de memoria sea solo
+suyo, estas etapas:
+
+- ``ingest``: ``sync_store`` en frío (lectura, partes, histórico, tensor,
+  cubo, bocetos y resumen)
+- ``load``: abrir todo lo que carga ``traffic_data`` con el almacén ya al día
+- ``sections``: los cálculos y la figura de cada sección de
+  Traffic_networks.py con los valores por defecto de sus controles (cada
+  sección con su tiempo, el de ``to_json`` y el tamaño de lo que se enviaría
+  al navegador)
+
+De cada etapa se guarda el tiempo y el pico de RSS (``ru_maxrss``) junto con
+la RSS del proceso antes de empezar (intérprete y módulos importados). Los
+resultados se añaden como líneas JSON a ``--salida`` con el commit, y cada
+fila se imprime junto al valor del último commit distinto que haya en el
+fichero, de modo que dos ejecuciones en la misma máquina se comparan
+directamente. Los datos sintéticos son deterministas (misma semilla, mismos
+ficheros), y se reutilizan entre ejecuciones.
+
+Uso (desde la raíz del repositorio)::
+
+    python benchmarks/bench_scaling.py [--escalas 1,10,100] [--trabajo DIR] [--salida FICHERO]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import folium
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.synthetic_traffic import SEMILLA, generate_archive, scale_shape
+from mobility.boxplot import box_figure, box_stats
+from mobility.downsample import downsample_series
+from mobility.station_registry import StationRegistry
+from mobility.stations import read_stations
+from mobility.traffic_anomaly import TrafficAnomalies
+from mobility.traffic_correlation import StationCorrelation
+from mobility.traffic_forecast import SeasonalForecast
+from mobility.traffic_sketch import ALFA
+from mobility.traffic_store import load_cube, load_sketches, load_summary, load_traffic, open_tensor, sync_store
+
+ESCALAS = (1, 10, 100)
+TRABAJO = os.path.join(tempfile.gettempdir(), "mobility-bench")
+SALIDA = os.path.join("benchmarks", "results", "scaling.jsonl")
+# Cada cuánto se comprueba si sigue vivo el proceso de una etapa
+ESPERA_SEGUNDOS = 5
+
+
+def _rss_mb():
+    """Pico de RSS del proceso en MB (Linux da ``ru_maxrss`` en KB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# =============================================
+# SECCIONES DE TRAFFIC_NETWORKS.PY
+# =============================================
+# Cada función repite los cálculos de una sección de la página con los
+# valores por defecto de sus controles y devuelve la figura
+def _distribution(d):
+    top = d['bocetos'].station_quantiles(0.5)[0.5].nlargest(5).index
+    resumen = pd.DataFrame([
+        {'Estacion': e, **box_stats(d['tensor'].totals(e), cuartiles=d['bocetos'].quantiles(e, [0.25, 0.5, 0.75]),
+                                    error_relativo=ALFA)}
+        for e in top
+    ])
+    return box_figure(resumen, x='Estacion', y='Total_Vehiculos', color='Estacion')
+
+
+def _hourly_evolution(d):
+    agrupado = d['cubo'].select(anio=[d['anios'][-1]], estacion=d['estaciones'][:3]).reduce(['hora', 'estacion', 'anio'])
+    agrupado['clave'] = agrupado['anio'].astype(str) + " - " + agrupado['estacion'].astype(str)
+    return px.line(agrupado, x='hora', y='mean', color='clave', line_dash='estacion')
+
+
+def _raw_series(d):
+    fig = go.Figure()
+    for estacion in d['estaciones'][:3]:
+        horas, totales = downsample_series(*d['tensor'].series(estacion))
+        fig.add_trace(go.Scattergl(x=horas.astype('datetime64[h]'), y=totales, mode='lines'))
+    return fig
+
+
+def _anomalies(d):
+    if 'anomalias' not in d:
+        d['anomalias'] = TrafficAnomalies.detect(d['tensor'])
+    return d['anomalias']
+
+
+def _correlation(d):
+    correlacion = StationCorrelation.compute(d['tensor'], perfil=_anomalies(d).mediana)
+    orden = correlacion.cluster_order()
+    return go.Figure(go.Heatmap(z=correlacion.r[np.ix_(orden, orden)]))
+
+
+def _weekly(d):
+    por_dia = d['cubo'].select(estacion=d['estaciones'][0], anio=d['anios'][-1], mes=1).reduce(['dia_semana'])
+    return px.area(por_dia, x='dia_semana', y='mean')
+
+
+def _monthly(d):
+    por_mes = d['cubo'].select(estacion=d['estaciones'][0], anio=d['anios'][-1]).reduce(['mes'])
+    return px.bar(por_mes, x='mes', y='mean', color='mean')
+
+
+def _yearly(d):
+    anual = d['cubo'].select(estacion=d['estaciones'][0]).reduce(['anio'])
+    fig = go.Figure(go.Scatter(x=anual['anio'], y=anual['mean'], mode='lines+markers'))
+    if len(anual) > 2:
+        fig.add_trace(go.Scatter(x=anual['anio'], y=np.poly1d(np.polyfit(anual['anio'], anual['mean'], 1))(anual['anio'])))
+    return fig
+
+
+def _seasonal(d):
+    por_mes = d['cubo'].select(anio=d['anios'][-1]).reduce(['mes'])
+    return px.bar(por_mes, x='mes', y='mean')
+
+
+def _anomalous_hours(d):
+    anomalias = _anomalies(d)
+    conteo = anomalias.counts_by_station()
+    estacion = conteo.index[0]
+    horas, totales = d['tensor'].series(estacion)
+    marcadas = anomalias.flagged(estacion=estacion)
+    fig = go.Figure()
+    for valores in (totales, anomalias.expected(estacion, horas)):
+        x, y = downsample_series(horas, valores)
+        fig.add_trace(go.Scattergl(x=x.astype('datetime64[h]'), y=y, mode='lines'))
+    fig.add_trace(go.Scattergl(x=marcadas['Fecha_Hora'], y=marcadas['Total_Vehiculos'], mode='markers'))
+    anomalias.flagged().head(200)
+    return fig
+
+
+def _forecast(d):
+    prevision = SeasonalForecast.fit(d['tensor'], _anomalies(d).flags())
+    futuro = prevision.predict(d['estaciones'][0], prevision.future_hours(2))
+    prevision.weekly_totals(2)
+    fig = go.Figure()
+    for columna in ('Superior', 'Inferior', 'Prevision'):
+        fig.add_trace(go.Scatter(x=futuro['Fecha_Hora'], y=futuro[columna], mode='lines'))
+    return fig
+
+
+def _stations_map(d):
+    registro = StationRegistry.build(read_stations(d['carpeta']), d['tensor'].estaciones)
+    con_coordenadas = registro.located()
+    mapa = folium.Map(location=[np.mean([r.lat for r in con_coordenadas]), np.mean([r.lon for r in con_coordenadas])])
+    for r in con_coordenadas:
+        folium.Marker(location=[r.lat, r.lon], popup=f"Station: {r.codigo}<br>Road: {r.sistema}").add_to(mapa)
+    registro.report()
+    return mapa
+
+
+def _patterns(d):
+    estacion = d['estaciones'][0]
+    por_hora = d['cubo'].select(estacion=estacion, dia_semana=range(5)).reduce(['hora'])
+    niveles = d['bocetos'].quantiles(estacion, [0.25, 0.75])
+    fig = px.bar(por_hora, x='hora', y='mean')
+    for nivel in niveles:
+        fig.add_hline(y=nivel)
+    return fig
+
+
+SECCIONES = (
+    ("1.1 distribution", _distribution),
+    ("1.2 hourly evolution", _hourly_evolution),
+    ("1.3 raw hourly series", _raw_series),
+    ("1.4 station correlation", _correlation),
+    ("2.1 weekly pattern", _weekly),
+    ("2.2 monthly distribution", _monthly),
+    ("2.3 yearly evolution", _yearly),
+    ("2.4 seasonal trends", _seasonal),
+    ("2.5 anomalous hours", _anomalous_hours),
+    ("2.6 traffic forecast", _forecast),
+    ("3.1 stations map", _stations_map),
+    ("3.2 traffic patterns", _patterns),
+)
+
+
+# =============================================
+# ETAPAS
+# =============================================
+def _stage_ingest(carpeta, destino, procesos):
+    shutil.rmtree(destino, ignore_errors=True)
+    avisos = sync_store(carpeta, destino, procesos)
+    return {'avisos': len(avisos)}
+
+
+def _open_all(carpeta, destino):
+    archivo, _ = load_traffic(carpeta, destino)
+    tensor, _ = open_tensor(carpeta, destino)
+    resumen, _ = load_summary(carpeta, destino)
+    return archivo, tensor, load_cube(carpeta, destino), load_sketches(carpeta, destino), resumen
+
+
+def _stage_load(carpeta, destino, procesos):
+    archivo, tensor, _, _, _ = _open_all(carpeta, destino)
+    return {'filas': int(len(archivo)), 'estaciones': int(len(tensor.estaciones)), 'horas': int(len(tensor.horas))}
+
+
+def _stage_sections(carpeta, destino, procesos):
+    _, tensor, cubo, bocetos, _ = _open_all(carpeta, destino)
+    datos = {
+        'carpeta': carpeta, 'tensor': tensor, 'cubo': cubo, 'bocetos': bocetos,
+        'estaciones': list(tensor.estaciones), 'anios': list(cubo.anios),
+    }
+    detalle = {}
+    for nombre, seccion in SECCIONES:
+        inicio = time.perf_counter()
+        figura = seccion(datos)
+        calculo = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        carga = figura.get_root().render() if hasattr(figura, 'get_root') else figura.to_json()
+        detalle[nombre] = {
+            'segundos': calculo, 'serializar': time.perf_counter() - inicio, 'kb': len(carga.encode()) / 1024,
+        }
+    return detalle
+
+
+ETAPAS = {'ingest': _stage_ingest, 'load': _stage_load, 'sections': _stage_sections}
+
+
+def _child(etapa, carpeta, destino, procesos, cola):
+    base = _rss_mb()
+    inicio = time.perf_counter()
+    try:
+        detalle = ETAPAS[etapa](carpeta, destino, procesos)
+    except Exception as e:
+        cola.put({'error': f"{type(e).__name__}: {e}"})
+        return
+    cola.put({
+        'segundos': time.perf_counter() - inicio,
+        'rss_pico_mb': _rss_mb(),
+        'rss_base_mb': base,
+        'detalle': detalle,
+    })
+
+
+def run_stage(etapa, carpeta, destino, procesos=None):
+    """Ejecuta una etapa en un proceso nuevo y devuelve sus mediciones."""
+    contexto = multiprocessing.get_context('spawn')
+    cola = contexto.Queue()
+    proceso = contexto.Process(target=_child, args=(etapa, carpeta, destino, procesos, cola))
+    proceso.start()
+    return wait_result(proceso, cola)
+
+
+def wait_result(proceso, cola):
+    """Resultado que deja en ``cola`` el proceso de una etapa, o un error si
+    termina sin dejarlo (p. ej. si lo mata el sistema por falta de memoria)."""
+    while True:
+        try:
+            resultado = cola.get(timeout=ESPERA_SEGUNDOS)
+            break
+        except queue.Empty:
+            if proceso.is_alive():
+                continue
+            # Lo que dejara justo antes de terminar ya está en la cola
+            try:
+                resultado = cola.get(timeout=1)
+            except queue.Empty:
+                codigo = proceso.exitcode
+                motivo = f"killed by signal {-codigo}" if codigo < 0 else f"exit code {codigo}"
+                resultado = {'error': f"stage process ended without a result ({motivo})"}
+            break
+    proceso.join()
+    return resultado
+
+
+# =============================================
+# DATOS SINTÉTICOS Y RESULTADOS
+# =============================================
+def prepare_data(trabajo, escala, semilla=SEMILLA):
+    """Carpeta con el histórico sintético de una escala (se genera solo si falta)."""
+    estaciones, semanas = scale_shape(escala)
+    carpeta = os.path.join(trabajo, f"x{escala:g}", "datos")
+    sello = os.path.join(trabajo, f"x{escala:g}", "datos.json")
+    parametros = {'estaciones': estaciones, 'semanas': semanas, 'semilla': semilla}
+    if os.path.exists(sello):
+        with open(sello, encoding='utf-8') as f:
+            guardado = json.load(f)
+        if guardado['parametros'] == parametros:
+            return carpeta, guardado
+    shutil.rmtree(carpeta, ignore_errors=True)
+    filas = generate_archive(carpeta, estaciones, semanas, semilla=semilla)
+    guardado = {'parametros': parametros, 'filas': filas}
+    with open(sello, 'w', encoding='utf-8') as f:
+        json.dump(guardado, f)
+    return carpeta, guardado
+
+
+def git_commit():
+    try:
+        salida = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                                cwd=RAIZ)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return salida.stdout.strip()
+
+
+def _previous(salida, commit):
+    """Última medición de cada (escala, etapa[, sección]) de otro commit."""
+    previas = {}
+    if not os.path.exists(salida):
+        return previas
+    with open(salida, encoding='utf-8') as f:
+        for linea in f:
+            registro = json.loads(linea)
+            if registro.get('commit') == commit or 'error' in registro:
+                continue
+            previas[(registro['escala'], registro['etapa'])] = registro
+    return previas
+
+
+def _compare(previo):
+    return f"  (was {previo:8.2f})" if previo is not None else ""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the traffic pipeline on synthetic archives.")
+    parser.add_argument("--escalas", default=",".join(map(str, ESCALAS)), help="comma-separated sizes relative to Datos 2")
+    parser.add_argument("--trabajo", default=TRABAJO, help="folder for the synthetic archives and their stores")
+    parser.add_argument("--salida", default=SALIDA, help="JSON lines file the results are appended to")
+    parser.add_argument("--procesos", type=int, default=None, help="parser processes (default: one per core)")
+    args = parser.parse_args(argv)
+
+    commit = git_commit()
+    previas = _previous(args.salida, commit)
+    entorno = {
+        'commit': commit, 'fecha': time.strftime("%Y-%m-%dT%H:%M:%S"), 'maquina': platform.platform(),
+        'cpus': os.cpu_count(), 'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+    }
+    os.makedirs(os.path.dirname(args.salida) or ".", exist_ok=True)
+
+    for escala in (float(e) for e in args.escalas.split(",")):
+        inicio = time.perf_counter()
+        carpeta, datos = prepare_data(args.trabajo, escala)
+        parametros = datos['parametros']
+        print(f"\n== {escala:g}x: {parametros['estaciones']} stations, {parametros['semanas']} weeks, "
+              f"{datos['filas']:,} rows (data ready in {time.perf_counter() - inicio:.1f} s)")
+        destino = os.path.join(args.trabajo, f"x{escala:g}", "store")
+
+        for etapa in ETAPAS:
+            resultado = run_stage(etapa, carpeta, destino, args.procesos)
+            registro = dict(entorno, escala=escala, etapa=etapa, filas=datos['filas'], **parametros, **resultado)
+            with open(args.salida, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(registro) + "\n")
+
+            if 'error' in resultado:
+                print(f"{etapa:<28} failed: {resultado['error']}")
+                continue
+            previo = previas.get((escala, etapa))
+            print(f"{etapa:<28}{resultado['segundos']:8.2f} s{_compare(previo and previo['segundos'])}"
+                  f"   peak RSS {resultado['rss_pico_mb']:8.1f} MB (base {resultado['rss_base_mb']:.1f} MB)")
+            if etapa == 'sections':
+                for nombre, medida in resultado['detalle'].items():
+                    anterior = previo and previo['detalle'].get(nombre, {}).get('segundos')
+                    print(f"  {nombre:<26}{medida['segundos']:8.2f} s{_compare(anterior)}"
+                          f"   to_json {medida['serializar']:6.2f} s   {medida['kb']:9.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
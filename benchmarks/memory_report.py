@@ -0,0 +1,80 @@
+"""Memoria del histórico de tráfico: DataFrame antiguo frente a ``TrafficArchive``.
+
+El DataFrame antiguo se construye como lo hacía Traffic_networks.py (lectura
+con pandas, ``Hora`` como texto, carriles int64 y las columnas ``DiaSemana``,
+``Mes``, ``Total_Vehiculos`` y ``Day_Type`` añadidas en la carga). Para cada
+representación se mide el tamaño de las columnas y el pico de memoria
+asignada durante la carga (el histórico compacto se mapea en memoria, así que
+apenas reserva memoria propia).
+
+Uso (desde la raíz del repositorio)::
+
+    python benchmarks/memory_report.py [carpeta]
+"""
+import os
+import sys
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_parser import legacy_parse
+from mobility.traffic_store import SUFIJO_SEMANAL, load_traffic
+
+
+def legacy_frame(carpeta):
+    """``df_final`` con las columnas que añadía la página de tráfico."""
+    ficheros = sorted(os.path.join(carpeta, f) for f in os.listdir(carpeta) if f.endswith(SUFIJO_SEMANAL))
+    df_final = pd.concat([legacy_parse(ruta) for ruta in ficheros], ignore_index=True)
+    df_final['DiaSemana'] = df_final['Fecha'].dt.day_name()
+    df_final['Mes'] = df_final['Fecha'].dt.month
+    columnas_carriles = [col for col in df_final.columns if 'ligeros' in col.lower() or 'pesados' in col.lower()]
+    df_final['Total_Vehiculos'] = df_final[columnas_carriles].sum(axis=1)
+    df_final['Day_Type'] = df_final['Fecha'].dt.dayofweek.apply(lambda x: 'Weekend' if x >= 5 else 'Weekday')
+    return df_final
+
+
+def measure(funcion, *args):
+    """Ejecuta ``funcion`` y devuelve ``(resultado, pico de memoria en bytes)``."""
+    tracemalloc.start()
+    resultado = funcion(*args)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, pico
+
+
+def mb(n):
+    return f"{n / 2**20:8.1f} MB"
+
+
+def main():
+    carpeta = sys.argv[1] if len(sys.argv) > 1 else "Datos 2"
+
+    # Se sincroniza antes el almacén para medir solo la carga
+    load_traffic(carpeta)
+
+    df_final, pico_antiguo = measure(legacy_frame, carpeta)
+    (archivo, _), pico_nuevo = measure(load_traffic, carpeta)
+
+    por_columna_antiguo = df_final.memory_usage(deep=True, index=False)
+    por_columna_nuevo = archivo.memory_usage()
+    residente_antiguo = int(por_columna_antiguo.sum())
+    residente_nuevo = archivo.nbytes
+
+    print(f"{len(archivo):,} rows, {len(archivo.estaciones)} stations\n")
+    print("Legacy DataFrame columns")
+    for nombre, n in por_columna_antiguo.items():
+        print(f"  {nombre:<24}{mb(n)}  {df_final[nombre].dtype}")
+    print("\nTrafficArchive columns")
+    for nombre, n in por_columna_nuevo.items():
+        print(f"  {nombre:<24}{mb(n)}  {getattr(archivo, nombre).dtype}{list(getattr(archivo, nombre).shape)}")
+
+    print(f"\n{'':<26}{'legacy':>11}{'compact':>11}{'ratio':>9}")
+    print(f"{'resident columns':<26}{mb(residente_antiguo)}  {mb(residente_nuevo)}  {residente_antiguo / residente_nuevo:6.1f}x")
+    print(f"{'heap allocated in load':<26}{mb(pico_antiguo)}  {mb(pico_nuevo)}")
+    print("\nThe compact archive is memory-mapped read-only, so its pages are shared by every session.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Generador de feeds GTFS sintéticos con el formato de "Datos 1".
+
+Escribe las mismas tablas que el feed de Dbus (``agency``, ``calendar``,
+``routes``, ``stops``, ``trips``, ``sha`` y ``stop_times`` con el sufijo
+``_dbus.csv``) tal como vienen: separadas por ``;``, con la columna de índice
+sin nombre (numerada desde 1) delante y ``NA`` en los campos vacíos. En
+``stop_times`` se reproduce la rareza de ``shape_dist_traveled``: coma
+decimal, y unos viajes en metros y otros en kilómetros (los que no llegan a
+12 km), que es lo que corrige ``mobility.gtfs.normalize_stop_times``. Algunos
+viajes pasan de medianoche (horas de 24:00:00 en adelante).
+
+Rutas, viajes, paradas y puntos de shape se escalan por separado. Cada ruta
+tiene uno o dos shapes por sentido que pasan por una selección de paradas
+cercanas a una recta entre dos puntos de la ciudad (el área crece con el
+número de paradas para mantener su densidad), y el shape es la poligonal por
+esas paradas con puntos intermedios. Con la misma semilla los ficheros son
+idénticos.
+
+Uso (desde la raíz del repositorio)::
+
+    python benchmarks/synthetic_gtfs.py carpeta [--rutas N] [--viajes N] [--paradas N] [--puntos N]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mobility.gtfs import FICHEROS, UMBRAL_KILOMETROS
+
+# Forma del feed de Dbus
+RUTAS = 38
+VIAJES = 11178
+PARADAS = 536
+PUNTOS = 128
+PARADAS_POR_SHAPE = 30
+SEMILLA = 2025
+
+# Centro y semiejes (grados) del área de Donostia cubierta por el feed
+CENTRO = (43.30, -1.98)
+SEMIEJES = (0.025, 0.065)
+METROS_GRADO = 111_320
+# Servicios de Dbus: dos de laborables, uno de sábado y otro de domingo
+SERVICIOS = {1843: 'sunday', 1842: 'saturday', 1841: 'weekday', 1840: 'weekday'}
+DIAS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+def _distances(lat, lon):
+    """Distancia en metros entre puntos consecutivos (equirrectangular)."""
+    dlat = np.diff(lat) * METROS_GRADO
+    dlon = np.diff(lon) * METROS_GRADO * np.cos(np.radians(CENTRO[0]))
+    return np.hypot(dlat, dlon)
+
+
+def _save(df, ruta):
+    """Como las tablas de Dbus: índice desde 1 sin nombre, ``;`` y ``NA``."""
+    df.index = pd.RangeIndex(1, len(df) + 1)
+    df.to_csv(ruta, sep=';', na_rep='NA')
+
+
+def _clock(segundos):
+    """``HH:MM:SS`` (las horas pueden pasar de 24)."""
+    segundos = pd.Series(segundos)
+    return ((segundos // 3600).astype(str).str.zfill(2) + ":" + (segundos % 3600 // 60).astype(str).str.zfill(2)
+            + ":" + (segundos % 60).astype(str).str.zfill(2))
+
+
+def _calendar():
+    activos = {servicio: DIAS[:5] if tipo == 'weekday' else [tipo] for servicio, tipo in SERVICIOS.items()}
+    return pd.DataFrame({
+        'service_id': list(SERVICIOS),
+        **{dia: [int(dia in activos[servicio]) for servicio in SERVICIOS] for dia in DIAS},
+        'start_date': 20250121,
+        'end_date': 20250413,
+    })
+
+
+def _stops(paradas, rng):
+    escala = np.sqrt(paradas / PARADAS)
+    lat = CENTRO[0] + rng.uniform(-1, 1, paradas) * SEMIEJES[0] * escala
+    lon = CENTRO[1] + rng.uniform(-1, 1, paradas) * SEMIEJES[1] * escala
+    return pd.DataFrame({
+        'stop_id': np.arange(1, paradas + 1),
+        'stop_code': np.nan,
+        'stop_name': [f"Parada {i}" for i in range(1, paradas + 1)],
+        'stop_lat': lat.round(8),
+        'stop_lon': lon.round(8),
+        'zone_id': 1,
+        'location_type': 0,
+    })
+
+
+def _shape_stops(paradas, n, rng):
+    """Paradas (en orden de paso) de un recorrido entre dos puntos al azar."""
+    a, b = rng.choice(len(paradas), 2, replace=False)
+    origen = paradas[['stop_lat', 'stop_lon']].to_numpy()[a]
+    direccion = paradas[['stop_lat', 'stop_lon']].to_numpy()[b] - origen
+    relativas = paradas[['stop_lat', 'stop_lon']].to_numpy() - origen
+    avance = relativas @ direccion / (direccion @ direccion)
+    separacion = np.abs(relativas @ np.array([-direccion[1], direccion[0]])) / np.sqrt(direccion @ direccion)
+    # Las más cercanas a la recta (penalizando las que quedan fuera del tramo)
+    coste = separacion + np.maximum(0, np.abs(avance - 0.5) - 0.5) * np.sqrt(direccion @ direccion)
+    elegidas = np.argsort(coste)[:n]
+    return elegidas[np.argsort(avance[elegidas])]
+
+
+def _shape_points(lat, lon, puntos, rng):
+    """Poligonal por las paradas con ``puntos`` vértices en total; cada parada es un vértice."""
+    tramos = max(len(lat) - 1, 1)
+    intermedios = np.full(tramos, max(puntos - len(lat), 0) // tramos)
+    intermedios[:max(puntos - len(lat), 0) % tramos] += 1
+    filas_lat, filas_lon = [lat[:1]], [lon[:1]]
+    for i in range(len(lat) - 1):
+        t = np.arange(1, intermedios[i] + 2) / (intermedios[i] + 1)
+        ruido = rng.normal(0, 3e-5, (2, len(t)))
+        ruido[:, -1] = 0
+        filas_lat.append(lat[i] + (lat[i + 1] - lat[i]) * t + ruido[0])
+        filas_lon.append(lon[i] + (lon[i + 1] - lon[i]) * t + ruido[1])
+    return np.concatenate(filas_lat), np.concatenate(filas_lon), np.concatenate([[0], np.cumsum(intermedios + 1)])
+
+
+def generate_feed(carpeta, rutas=RUTAS, viajes=VIAJES, paradas=PARADAS, puntos=PUNTOS,
+                  paradas_por_shape=PARADAS_POR_SHAPE, semilla=SEMILLA):
+    """Escribe un feed sintético en ``carpeta``; devuelve el número de filas de cada tabla."""
+    os.makedirs(carpeta, exist_ok=True)
+    rng = np.random.default_rng(semilla)
+    paradas_por_shape = min(paradas_por_shape, paradas)
+    rutas_ids = np.arange(1, rutas + 1)
+
+    tablas = {
+        'agency': pd.DataFrame({
+            'agency_id': [100], 'agency_name': ["Dbus"], 'agency_url': ["http://www.dbus.es"],
+            'agency_timezone': ["Europe/Madrid"], 'agency_lang': ["es"], 'agency_phone': [34943000200],
+            'agency_fare_url': [np.nan],
+        }),
+        'calendar': _calendar(),
+        'routes': pd.DataFrame({
+            'route_id': rutas_ids, 'agency_id': 100, 'route_short_name': rutas_ids,
+            'route_long_name': [f"Linea {r}" for r in rutas_ids], 'route_desc': np.nan, 'route_type': 3,
+            'route_url': np.nan, 'route_color': "FFFFFF", 'route_text_color': "8DC63F",
+        }),
+        'stops': _stops(paradas, rng),
+    }
+    # Shapes: uno o dos por sentido y ruta; el sentido 1 recorre las paradas al revés
+    shapes, puntos_shape = [], []
+    for ruta in rutas_ids:
+        for variante in range(1, rng.integers(1, 3) + 1):
+            orden = _shape_stops(tablas['stops'], paradas_por_shape, rng)
+            for sentido in (0, 1):
+                paradas_shape = orden if sentido == 0 else orden[::-1]
+                lat, lon, vertices = _shape_points(
+                    tablas['stops']['stop_lat'].to_numpy()[paradas_shape],
+                    tablas['stops']['stop_lon'].to_numpy()[paradas_shape], puntos, rng)
+                recorrido = np.concatenate([[0], np.cumsum(_distances(lat, lon))])
+                shape_id = int(ruta) * 10000 + variante * 100 + sentido + 1
+                shapes.append((shape_id, int(ruta), sentido, tablas['stops']['stop_id'].to_numpy()[paradas_shape],
+                               recorrido[vertices]))
+                puntos_shape.append(pd.DataFrame({
+                    'shape_id': shape_id, 'shape_pt_lat': lat.round(8), 'shape_pt_lon': lon.round(8),
+                    'shape_pt_sequence': np.arange(1, len(lat) + 1), 'shape_dist_traveled': (recorrido / 1000).round(3),
+                }))
+    tablas['shapes'] = pd.concat(puntos_shape, ignore_index=True)
+
+    # Viajes repartidos entre shapes (las rutas con más viajes, más frecuentes)
+    peso = rng.lognormal(0, 0.6, len(shapes))
+    shape_de_viaje = rng.choice(len(shapes), viajes, p=peso / peso.sum())
+    servicio = rng.choice(list(SERVICIOS), viajes, p=[0.13, 0.17, 0.15, 0.55])
+    inicio = rng.integers(int(5.5 * 3600), int(24.5 * 3600), viajes)
+    tablas['trips'] = pd.DataFrame({
+        'route_id': [shapes[s][1] for s in shape_de_viaje],
+        'service_id': servicio,
+        # 20 cifras como los de Dbus (caben en uint64): servicio, ruta y número de viaje
+        'trip_id': [f"{servicio[i]}{shapes[s][1]:04d}{i:08d}0000" for i, s in enumerate(shape_de_viaje)],
+        'trip_headsign': np.nan, 'trip_short_name': np.nan,
+        'direction_id': [shapes[s][2] for s in shape_de_viaje],
+        'block_id': np.nan,
+        'shape_id': [shapes[s][0] for s in shape_de_viaje],
+        'wheelchair_accessible': 0, 'bikes_allowed': 0,
+    })
+
+    # Paradas de cada viaje: tiempos según la distancia de cada tramo y una velocidad por viaje
+    por_viaje = np.array([len(shapes[s][3]) for s in shape_de_viaje])
+    viaje = np.repeat(np.arange(viajes), por_viaje)
+    secuencia = np.arange(len(viaje)) - np.repeat(np.cumsum(por_viaje) - por_viaje, por_viaje)
+    parada = np.concatenate([shapes[s][3] for s in shape_de_viaje])
+    distancia = np.concatenate([shapes[s][4] for s in shape_de_viaje])
+    tramo = np.diff(distancia, prepend=0.0)
+    tramo[secuencia == 0] = 0
+    velocidad = rng.lognormal(np.log(5.5), 0.25, viajes)[viaje]
+    espera = rng.integers(0, 31, len(viaje))
+    llegada_relativa = np.cumsum(np.round(tramo / velocidad) + np.roll(espera, 1) * (secuencia > 0))
+    llegada_relativa -= np.repeat(llegada_relativa[np.cumsum(por_viaje) - por_viaje], por_viaje)
+    llegada = inicio[viaje] + llegada_relativa.astype(np.int64)
+
+    # Coma decimal; los viajes de menos de 12 km, a veces en kilómetros
+    en_km = (rng.random(viajes) < 0.5) & (np.array([shapes[s][4][-1] for s in shape_de_viaje]) < UMBRAL_KILOMETROS * 1000)
+    decimetros = np.round(distancia * 10).astype(np.int64)
+    metros_texto = pd.Series(decimetros // 10).astype(str) + "," + pd.Series(decimetros % 10).astype(str)
+    km_texto = pd.Series(distancia // 1000).astype(np.int64).astype(str) + "," \
+        + pd.Series(np.round(distancia % 1000).astype(np.int64).clip(max=999)).astype(str).str.zfill(3)
+    tablas['stop_times'] = pd.DataFrame({
+        'trip_id': tablas['trips']['trip_id'].to_numpy()[viaje],
+        'arrival_time': _clock(llegada),
+        'departure_time': _clock(llegada + espera),
+        'stop_id': parada,
+        'stop_sequence': secuencia + 1,
+        'shape_dist_traveled': np.where(en_km[viaje], km_texto, metros_texto),
+    })
+
+    for tabla, df in tablas.items():
+        _save(df, os.path.join(carpeta, FICHEROS[tabla]))
+    return {tabla: len(df) for tabla, df in tablas.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic Dbus-style GTFS feed.")
+    parser.add_argument("carpeta", help="output folder")
+    parser.add_argument("--rutas", type=int, default=RUTAS, help="number of routes")
+    parser.add_argument("--viajes", type=int, default=VIAJES, help="number of trips")
+    parser.add_argument("--paradas", type=int, default=PARADAS, help="number of stops")
+    parser.add_argument("--puntos", type=int, default=PUNTOS, help="points per shape")
+    parser.add_argument("--paradas-por-shape", type=int, default=PARADAS_POR_SHAPE, help="stops per shape")
+    parser.add_argument("--semilla", type=int, default=SEMILLA, help="random seed")
+    args = parser.parse_args(argv)
+
+    filas = generate_feed(args.carpeta, args.rutas, args.viajes, args.paradas, args.puntos,
+                          args.paradas_por_shape, args.semilla)
+    print(", ".join(f"{tabla} {n:,}" for tabla, n in filas.items()), "->", args.carpeta)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""Generador de históricos sintéticos con el formato de "Datos 2".
+
+Escribe ficheros semanales ``AAAAMMDD_datosvolumen.csv`` idénticos en forma a
+los publicados: la cabecera real (con los espacios finales de las columnas
+``ligeros``), campos de ancho fijo con ceros a la izquierda separados por
+`` ; ``, ``Hora`` de ``01:00`` a ``24:00`` y la fecha de cada día de la
+semana. Como en el histórico real, cada semana solo publica una parte de las
+estaciones, algunas con solo unas horas (estaciones que se dan de alta o de
+baja a mitad de semana), y hay carriles que siempre van a cero. También
+escribe un ``estaciones.csv`` en latin1 con el ``;`` final que sobra en cada
+fila.
+
+Los volúmenes siguen un perfil día x hora (dos puntas en laborables, una en
+fin de semana) escalado por estación y carril, con una pequeña tendencia
+anual, ruido de Poisson y algún corte (horas a cero). Con la misma semilla y
+los mismos parámetros los ficheros son idénticos byte a byte, así que las
+mediciones de ``bench_scaling.py`` son comparables entre commits.
+
+Uso (desde la raíz del repositorio)::
+
+    python benchmarks/synthetic_traffic.py carpeta [--estaciones N] [--semanas N] [--carriles N] [--semilla N]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mobility.stations import FICHERO_ESTACIONES
+from mobility.traffic_store import SUFIJO_SEMANAL
+
+# Forma del "Datos 2" actual
+ESTACIONES = 221
+SEMANAS = 60
+CARRILES = 6
+INICIO = "2020-01-06"
+# Fracción de estaciones que publica cada semana (unas 99 de 221)
+COBERTURA = 0.45
+# Fracción de las estaciones publicadas con solo unas horas (hasta dos días)
+PARCIALES = 0.5
+SEMILLA = 2020
+
+_ANCHO_CAMPO = 5
+_SEPARADOR = b" ; "
+
+# Perfil horario relativo (hora 0-23) de laborables y de fin de semana
+_LABORABLE = np.array([
+    0.12, 0.07, 0.05, 0.05, 0.08, 0.22, 0.62, 1.00, 0.95, 0.72, 0.66, 0.68,
+    0.72, 0.74, 0.70, 0.74, 0.82, 0.93, 0.90, 0.72, 0.50, 0.36, 0.26, 0.18,
+])
+_FIN_DE_SEMANA = np.array([
+    0.22, 0.16, 0.12, 0.09, 0.07, 0.08, 0.14, 0.24, 0.38, 0.52, 0.62, 0.68,
+    0.70, 0.66, 0.58, 0.56, 0.60, 0.64, 0.62, 0.52, 0.40, 0.32, 0.26, 0.20,
+])
+
+
+def scale_shape(escala):
+    """Estaciones y semanas de un histórico ``escala`` veces mayor que "Datos 2".
+
+    El tamaño crece a partes iguales en estaciones y en semanas (raíz cuadrada
+    de la escala en cada eje).
+    """
+    factor = np.sqrt(escala)
+    return int(round(ESTACIONES * factor)), int(round(SEMANAS * factor))
+
+
+def week_starts(semanas, inicio=INICIO):
+    """Lunes de cada semana publicada: una por mes, como en el histórico real."""
+    lunes = np.datetime64(inicio, 'D')
+    return lunes + 7 * np.round(np.arange(semanas) * 52 / 12).astype(np.int64)
+
+
+def header(carriles=CARRILES):
+    """Cabecera real, con el espacio final de las columnas de ligeros."""
+    columnas = ["Estacion", "Fecha", "Hora"]
+    for carril in range(1, carriles + 1):
+        columnas += [f"Carril {carril} ligeros ", f"Carril {carril} pesados"]
+    return ";".join(columnas).encode('ascii') + b"\n"
+
+
+def _digits(valores, ancho):
+    """Matriz ``filas x ancho`` de los dígitos ASCII de enteros no negativos."""
+    potencias = 10 ** np.arange(ancho - 1, -1, -1, dtype=np.int64)
+    return (np.asarray(valores, dtype=np.int64)[:, None] // potencias % 10 + ord('0')).astype(np.uint8)
+
+
+def _rows(estacion, fecha, hora, carriles):
+    """Líneas de ancho fijo (``00001 ; 06/01/2020 ; 01:00 ; 00012 ; ...``) como bytes."""
+    meses = fecha.astype('datetime64[M]')
+    dia = (fecha - meses.astype('datetime64[D]')).astype(np.int64) + 1
+    mes = meses.astype(np.int64) % 12 + 1
+    anio = meses.astype(np.int64) // 12 + 1970
+    barra, dos_puntos = np.full((len(estacion), 1), ord('/'), np.uint8), np.full((len(estacion), 1), ord(':'), np.uint8)
+    separador = np.tile(np.frombuffer(_SEPARADOR, np.uint8), (len(estacion), 1))
+
+    campos = [
+        _digits(estacion, _ANCHO_CAMPO),
+        _digits(dia, 2), barra, _digits(mes, 2), barra, _digits(anio, 4),
+        _digits(hora, 2), dos_puntos, _digits(np.zeros_like(hora), 2),
+    ] + [_digits(np.minimum(carriles[:, j], 10 ** _ANCHO_CAMPO - 1), _ANCHO_CAMPO) for j in range(carriles.shape[1])]
+    piezas = [campos[0], separador, *campos[1:6], separador, *campos[6:9]]
+    for carril in campos[9:]:
+        piezas += [separador, carril]
+    piezas.append(np.full((len(estacion), 1), ord('\n'), np.uint8))
+    return np.hstack(piezas).tobytes()
+
+
+class _Stations:
+    """Parámetros fijos de cada estación sintética."""
+
+    def __init__(self, n, carriles, rng):
+        self.codigos = np.sort(rng.choice(np.arange(1, 10 ** _ANCHO_CAMPO), size=n, replace=False))
+        self.nivel = rng.lognormal(np.log(250), 0.9, size=n)
+        self.tendencia = rng.normal(0.01, 0.03, size=n)
+        self.pesados = rng.uniform(0.04, 0.2, size=n)
+        # Reparto entre carriles: el primero es el principal; los demás pueden no existir
+        activos = np.arange(carriles)[None, :] < rng.integers(1, carriles + 1, size=n)[:, None]
+        self.reparto = activos * rng.dirichlet(np.linspace(3, 1, carriles), size=n)
+        self.reparto /= self.reparto.sum(axis=1, keepdims=True)
+
+
+def write_week(ruta, lunes, estaciones, elegidas, carriles, rng, dias_desde_inicio):
+    """Escribe el fichero semanal de ``lunes`` para las estaciones ``elegidas``."""
+    dias = np.arange(7)
+    horas = np.arange(24)
+    fin_de_semana = dias >= 5
+    perfil = np.where(fin_de_semana[:, None], _FIN_DE_SEMANA[None, :], _LABORABLE[None, :]).ravel()
+
+    anios = (dias_desde_inicio + dias) / 365.25
+    crecimiento = (1 + estaciones.tendencia[elegidas, None]) ** np.repeat(anios, 24)[None, :]
+    media = estaciones.nivel[elegidas, None] * perfil[None, :] * crecimiento
+
+    # Cortes: algunas estaciones pasan unas horas seguidas a cero
+    cortadas = rng.random(len(elegidas)) < 0.05
+    for i in np.flatnonzero(cortadas):
+        desde = rng.integers(0, 7 * 24)
+        media[i, desde:desde + rng.integers(2, 30)] = 0
+
+    # Vehículos por estación, hora y columna (ligeros y pesados de cada carril)
+    cuota_pesados = estaciones.pesados[elegidas, None, None]
+    reparto = estaciones.reparto[elegidas, None, :]
+    ligeros = rng.poisson(media[:, :, None] * reparto * (1 - cuota_pesados))
+    pesados = rng.poisson(media[:, :, None] * reparto * cuota_pesados)
+    conteos = np.stack([ligeros, pesados], axis=3).reshape(len(elegidas), 7 * 24, 2 * carriles)
+
+    # Estaciones con solo parte de la semana publicada
+    presentes = np.ones((len(elegidas), 7 * 24), dtype=bool)
+    for i in np.flatnonzero(rng.random(len(elegidas)) < PARCIALES):
+        presentes[i] = False
+        desde = rng.integers(0, 7 * 24)
+        presentes[i, desde:desde + rng.integers(1, 49)] = True
+
+    fila, hora = np.nonzero(presentes)
+    fecha = lunes + (hora // 24).astype('timedelta64[D]')
+    with open(ruta, 'wb') as f:
+        f.write(header(carriles))
+        f.write(_rows(estaciones.codigos[elegidas][fila], fecha, hora % 24 + 1, conteos[fila, hora]))
+    return len(fila)
+
+
+def write_stations(ruta, estaciones, rng):
+    """``estaciones.csv`` en latin1, con los campos rodeados de espacios y el ``;`` final."""
+    cabecera = ("System;ETD code;System code;Description;Country code;Country;Municipality code;"
+                "Municipality;Territory code;Territory;Postal code;GPSX;GPSY;X;Y\n")
+    carreteras = [f"GI-{n}" for n in rng.integers(11, 3999, size=max(len(estaciones.codigos) // 4, 1))]
+    lineas = [cabecera]
+    for codigo in estaciones.codigos:
+        carretera = carreteras[rng.integers(len(carreteras))]
+        lon, lat = rng.uniform(-2.6, -1.75), rng.uniform(42.95, 43.4)
+        pk = rng.uniform(0, 60)
+        campos = [
+            carretera, codigo, 1, f"[{carretera}] {codigo}-ETD DONOSTIA-SAN SEBASTIÁN, {carretera} pk {pk:.3f}".replace('.', ','),
+            108, "España", rng.integers(1, 90), "ORDIZIA", 20, "Gipuzkoa", 20000 + rng.integers(0, 999),
+            f"{500000 + (lon + 2.2) * 80000:.2f}", f"{4760000 + (lat - 43) * 111000:.2f}", f"{lon:.6f}", f"{lat:.6f}",
+        ]
+        lineas.append(" ; ".join(str(c) for c in campos) + " ; \n")
+    with open(ruta, 'w', encoding='latin1', newline='') as f:
+        f.writelines(lineas)
+
+
+def generate_archive(carpeta, estaciones=ESTACIONES, semanas=SEMANAS, carriles=CARRILES, semilla=SEMILLA):
+    """Escribe un histórico sintético completo en ``carpeta``; devuelve el número de filas."""
+    os.makedirs(carpeta, exist_ok=True)
+    rng = np.random.default_rng(semilla)
+    parametros = _Stations(estaciones, carriles, rng)
+    write_stations(os.path.join(carpeta, FICHERO_ESTACIONES), parametros, rng)
+
+    inicio = np.datetime64(INICIO, 'D')
+    filas = 0
+    for lunes in week_starts(semanas):
+        elegidas = np.flatnonzero(rng.random(estaciones) < COBERTURA)
+        nombre = str(lunes).replace('-', '') + SUFIJO_SEMANAL
+        filas += write_week(os.path.join(carpeta, nombre), lunes, parametros, elegidas, carriles, rng,
+                            int((lunes - inicio).astype(np.int64)))
+    return filas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic datosvolumen archive.")
+    parser.add_argument("carpeta", help="output folder")
+    parser.add_argument("--estaciones", type=int, default=ESTACIONES, help="number of stations")
+    parser.add_argument("--semanas", type=int, default=SEMANAS, help="number of weekly files")
+    parser.add_argument("--carriles", type=int, default=CARRILES, help="lanes per station")
+    parser.add_argument("--escala", type=float, default=None,
+                        help="size relative to Datos 2 (overrides --estaciones and --semanas)")
+    parser.add_argument("--semilla", type=int, default=SEMILLA, help="random seed")
+    args = parser.parse_args(argv)
+
+    estaciones, semanas = (args.estaciones, args.semanas) if args.escala is None else scale_shape(args.escala)
+    filas = generate_archive(args.carpeta, estaciones, semanas, args.carriles, args.semilla)
+    print(f"{semanas} weekly files, {estaciones} stations, {filas:,} rows -> {args.carpeta}")
+
+
+if __name__ == "__main__":
+    main()
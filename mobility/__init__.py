@@ -0,0 +1 @@
+"""Utilidades de datos compartidas por las páginas del dashboard."""
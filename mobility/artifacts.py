@@ -0,0 +1,266 @@
+"""Artefactos precalculados del dashboard.
+
+Todo lo que las páginas leen ya procesado se guarda bajo ``cache/artifacts``:
+
+- ``traffic/``: el almacén del histórico de tráfico (partes semanales,
+  histórico compacto, tensor, cubo, bocetos y resumen)
+- ``gtfs/<tabla>/``: las tablas del GTFS, con ``stop_times`` normalizado y las
+  derivadas ``stop_speeds`` (velocidades por tramo), ``snapping`` y la
+  geometría simplificada de cada tramo (``segments`` y ``segment_points``)
+- ``stations/stations/``: los metadatos de las estaciones de aforo
+
+Cada tabla se guarda columna a columna en ``.npy``. La carpeta de cada grupo
+es un enlace simbólico a su versión actual y se reconstruye con un cerrojo
+sobre ``cache/artifacts/.lock``, igual que el almacén de tráfico. ``manifest.json`` guarda
+la versión del formato y la firma de los ficheros de origen de cada grupo:
+ruta relativa a la carpeta de origen, tamaño y hash del contenido, así que los
+artefactos construidos en otra máquina o en otra copia del repositorio siguen
+valiendo. La fecha de modificación también se guarda, pero solo para no
+volver a leer los ficheros que no la han cambiado. Al cargar un grupo cuyo
+origen ha cambiado, o escrito con otra versión, se reconstruye; el comando
+solo adelanta ese trabajo para que al arrancar el servidor no quede más que
+leer ficheros.
+
+Uso (sin Streamlit, desde la raíz del repositorio)::
+
+    python -m mobility.artifacts [--procesos N] [--forzar]
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from mobility.gtfs import CARPETA_GTFS, feed_paths, prepare_feed, read_feed
+from mobility.stations import read_stations, stations_path
+from mobility.traffic_store import CARPETA_CACHE, CARPETA_DATOS, _new_version, _publish, _store_lock, sync_store
+
+CARPETA_ARTEFACTOS = os.path.dirname(CARPETA_CACHE)
+VERSION_ARTEFACTOS = 5
+
+
+def files_signature(rutas):
+    """Tupla (ruta, tamaño, mtime) de cada fichero; tamaño y mtime ``None`` si no existe."""
+    firma = []
+    for ruta in rutas:
+        try:
+            info = os.stat(ruta)
+        except FileNotFoundError:
+            firma.append((ruta, None, None))
+        else:
+            firma.append((ruta, info.st_size, info.st_mtime_ns))
+    return tuple(firma)
+
+
+# =============================================
+# TABLAS EN DISCO
+# =============================================
+def _save_frame(carpeta, df):
+    """Guarda un DataFrame columna a columna en ``carpeta`` (nueva); el texto
+    como unicode ('' para NaN)."""
+    os.makedirs(carpeta)
+    columnas = []
+    for i, (nombre, serie) in enumerate(df.items()):
+        es_texto = serie.dtype.kind in 'OSU' or isinstance(serie.dtype, pd.StringDtype)
+        valores = serie.fillna('').astype(str).to_numpy(dtype=str) if es_texto else serie.to_numpy()
+        np.save(os.path.join(carpeta, f"c{i}.npy"), valores)
+        columnas.append([str(nombre), 'texto' if es_texto else 'array'])
+    with open(os.path.join(carpeta, "columns.json"), 'w', encoding='utf-8') as f:
+        json.dump(columnas, f)
+
+
+def _load_frame(carpeta):
+    """Lee una tabla guardada con ``_save_frame``."""
+    with open(os.path.join(carpeta, "columns.json"), encoding='utf-8') as f:
+        columnas = json.load(f)
+    datos = {}
+    for i, (nombre, tipo) in enumerate(columnas):
+        ruta = os.path.join(carpeta, f"c{i}.npy")
+        if tipo == 'texto':
+            serie = pd.Series(np.load(ruta), dtype='str')
+            datos[nombre] = serie.mask(serie == '')
+        else:
+            datos[nombre] = np.load(ruta)
+    return pd.DataFrame(datos)
+
+
+# =============================================
+# GRUPOS DE ARTEFACTOS
+# =============================================
+def _read_manifest(destino):
+    ruta = os.path.join(destino, "manifest.json")
+    if os.path.exists(ruta):
+        with open(ruta, encoding='utf-8') as f:
+            manifiesto = json.load(f)
+        if manifiesto.get('version') == VERSION_ARTEFACTOS:
+            return manifiesto
+    return {'version': VERSION_ARTEFACTOS, 'grupos': {}}
+
+
+def _write_manifest(destino, manifiesto):
+    ruta = os.path.join(destino, "manifest.json")
+    temporal = ruta + ".tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=1)
+    os.replace(temporal, ruta)
+
+
+def _content_hash(ruta):
+    h = hashlib.blake2b(digest_size=16)
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _sources_signature(origen, fuentes, registrada=None):
+    """Firma de los ficheros de origen de un grupo (ruta relativa a ``origen``,
+    tamaño, mtime y hash del contenido). Los ficheros con el mismo tamaño y
+    mtime que en ``registrada`` conservan su hash sin volver a leerse."""
+    previas = {f['ruta']: f for f in registrada or []}
+    firma = []
+    for ruta, tamano, mtime in files_signature(fuentes):
+        relativa = os.path.relpath(ruta, origen).replace(os.sep, '/')
+        previa = previas.get(relativa)
+        if tamano is None:
+            contenido = None
+        elif previa is not None and (previa['size'], previa['mtime_ns']) == (tamano, mtime):
+            contenido = previa['hash']
+        else:
+            contenido = _content_hash(ruta)
+        firma.append({'ruta': relativa, 'size': tamano, 'mtime_ns': mtime, 'hash': contenido})
+    return firma
+
+
+def _same_sources(firma, registrada):
+    """Mismos ficheros con el mismo contenido (la fecha de modificación no cuenta)."""
+    def clave(f):
+        return [(d['ruta'], d['size'], d['hash']) for d in f]
+    return clave(firma) == clave(registrada)
+
+
+def _group_state(destino, grupo, origen, fuentes):
+    """Entrada del grupo en el manifiesto y firma actual de su origen."""
+    registrado = _read_manifest(destino)['grupos'].get(grupo)
+    firma = _sources_signature(origen, fuentes, registrado and registrado['firma'])
+    return registrado, firma
+
+
+def _load_group(carpeta, registrado):
+    return {nombre: _load_frame(os.path.join(carpeta, nombre)) for nombre in registrado['tablas']}
+
+
+def _remove_stale_versions(carpeta):
+    """Borra las versiones del grupo que ya no publica su enlace (escrituras interrumpidas)."""
+    actual = os.path.realpath(carpeta)
+    padre, prefijo = os.path.dirname(carpeta), os.path.basename(carpeta) + "."
+    for entrada in os.listdir(padre):
+        ruta = os.path.join(padre, entrada)
+        if not entrada.startswith(prefijo):
+            continue
+        if os.path.islink(ruta):
+            # Enlace que no llegó a publicarse
+            os.remove(ruta)
+        elif os.path.realpath(ruta) != actual:
+            shutil.rmtree(ruta, ignore_errors=True)
+
+
+def _sync_group(destino, grupo, origen, fuentes, construir, forzar=False):
+    """Reconstruye el grupo si su origen ha cambiado y devuelve sus tablas.
+
+    ``fuentes`` son los ficheros de los que sale el grupo, dentro de la
+    carpeta ``origen``. Como en el almacén de tráfico, la carpeta del grupo es
+    un enlace a su versión actual: se lee con el cerrojo de ``destino``
+    compartido, y la reconstrucción se hace con el cerrojo exclusivo en una
+    carpeta nueva que se publica cambiando el enlace.
+    """
+    carpeta = os.path.join(destino, grupo)
+    os.makedirs(destino, exist_ok=True)
+    if not forzar:
+        with _store_lock(destino, compartido=True):
+            registrado, firma = _group_state(destino, grupo, origen, fuentes)
+            if registrado is not None and firma == registrado['firma']:
+                return _load_group(carpeta, registrado)
+
+    with _store_lock(destino):
+        # Otro proceso puede haberlo reconstruido mientras se esperaba el cerrojo
+        registrado, firma = _group_state(destino, grupo, origen, fuentes)
+        if not forzar and registrado is not None and _same_sources(firma, registrado['firma']):
+            # Mismo contenido con otras fechas (copia o checkout): se guardan
+            # las nuevas para no volver a calcular los hashes
+            manifiesto = _read_manifest(destino)
+            manifiesto['grupos'][grupo] = registrado = dict(registrado, firma=firma)
+            _write_manifest(destino, manifiesto)
+            return _load_group(carpeta, registrado)
+
+        tablas = construir()
+        version = _new_version(carpeta)
+        for nombre, df in tablas.items():
+            _save_frame(os.path.join(version, nombre), df.reset_index(drop=True))
+        _publish(version, carpeta)
+        _remove_stale_versions(carpeta)
+        manifiesto = _read_manifest(destino)
+        manifiesto['grupos'][grupo] = registrado = {'firma': firma, 'tablas': sorted(tablas)}
+        _write_manifest(destino, manifiesto)
+        return _load_group(carpeta, registrado)
+
+
+def load_gtfs(destino=CARPETA_ARTEFACTOS, carpeta=CARPETA_GTFS, forzar=False):
+    """Tablas del GTFS procesadas (dict ``tabla -> DataFrame``)."""
+    return _sync_group(destino, "gtfs", carpeta, feed_paths(carpeta).values(),
+                       lambda: prepare_feed(read_feed(carpeta)), forzar)
+
+
+def load_stations(destino=CARPETA_ARTEFACTOS, carpeta=CARPETA_DATOS, forzar=False):
+    """Metadatos de las estaciones de aforo."""
+    return _sync_group(destino, "stations", carpeta, [stations_path(carpeta)],
+                       lambda: {'stations': read_stations(carpeta)}, forzar)['stations']
+
+
+def build_artifacts(destino=CARPETA_ARTEFACTOS, carpeta_trafico=CARPETA_DATOS, carpeta_gtfs=CARPETA_GTFS,
+                    procesos=None, forzar=False, informe=print):
+    """Construye (o actualiza) todos los artefactos. Devuelve la lista de avisos."""
+    avisos = []
+    os.makedirs(destino, exist_ok=True)
+    destino_trafico = os.path.join(destino, "traffic")
+    if forzar:
+        shutil.rmtree(destino_trafico, ignore_errors=True)
+
+    pasos = (
+        ("traffic", lambda: avisos.extend(sync_store(carpeta_trafico, destino_trafico, procesos))),
+        ("gtfs", lambda: load_gtfs(destino, carpeta_gtfs, forzar)),
+        ("stations", lambda: load_stations(destino, carpeta_trafico, forzar)),
+    )
+    for nombre, paso in pasos:
+        inicio = time.perf_counter()
+        try:
+            paso()
+        except Exception as e:
+            avisos.append(f"Error building {nombre} artifacts: {e}")
+            continue
+        informe(f"{nombre:<10}{time.perf_counter() - inicio:8.2f} s")
+    return avisos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the precomputed dashboard artifacts.")
+    parser.add_argument("--destino", default=CARPETA_ARTEFACTOS, help="artifact directory")
+    parser.add_argument("--trafico", default=CARPETA_DATOS, help="folder with the weekly traffic files")
+    parser.add_argument("--gtfs", default=CARPETA_GTFS, help="folder with the Dbus GTFS tables")
+    parser.add_argument("--procesos", type=int, default=None, help="parser processes (default: one per core)")
+    parser.add_argument("--forzar", action="store_true", help="rebuild everything even if sources are unchanged")
+    args = parser.parse_args(argv)
+
+    avisos = build_artifacts(args.destino, args.trafico, args.gtfs, args.procesos, args.forzar)
+    for aviso in avisos:
+        print(aviso, file=sys.stderr)
+    return 1 if avisos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Diagramas de caja resumidos en el servidor.
+
+``px.box`` manda al navegador todos los valores de cada caja y deja que
+Plotly calcule los cuartiles allí; con miles de horas por estación la figura
+pesa megas. Aquí se calculan en el servidor ``q1``, mediana, ``q3`` y los
+bigotes de cada caja, y solo se envía una muestra limitada de atípicos. Los
+cuartiles pueden venir ya calculados (de los bocetos de cuantiles del
+almacén), y entonces los valores solo se usan para bigotes y atípicos.
+
+Los cálculos siguen los de Plotly: cuartiles con su interpolación ``linear``
+(la de Hazen en NumPy), bigotes en el valor más extremo dentro de 1.5 veces el
+rango intercuartílico y atípicos fuera de ellos.
+"""
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+MAX_ATIPICOS = 100
+ANCHO_GRUPO = 0.8
+HUECO_CAJA = 0.3
+
+_CAMPOS = ('q1', 'median', 'q3', 'lowerfence', 'upperfence')
+
+
+def box_stats(valores, max_atipicos=MAX_ATIPICOS, cuartiles=None, error_relativo=0.0):
+    """Cuartiles, bigotes y muestra de atípicos de un array de valores.
+
+    Si hay más de ``max_atipicos`` atípicos se toman equiespaciados entre los
+    valores ordenados, conservando siempre el menor y el mayor.
+
+    ``cuartiles`` (q1, mediana y q3) permite dar los cuartiles ya calculados,
+    p. ej. de los bocetos de cuantiles, y entonces los valores solo se recorren
+    para los bigotes y los atípicos, que son valores concretos. Si esos
+    cuartiles son aproximados, ``error_relativo`` amplía en esa proporción los
+    límites de los bigotes para que nunca dejen fuera los valores de la caja.
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    valores = valores[~np.isnan(valores)]
+    if len(valores) == 0:
+        return dict(n=0, **{campo: np.nan for campo in _CAMPOS}, atipicos=np.empty(0))
+
+    if cuartiles is None or np.isnan(cuartiles).any():
+        q1, mediana, q3 = np.percentile(valores, [25, 50, 75], method='hazen')
+        error_relativo = 0.0
+    else:
+        q1, mediana, q3 = cuartiles
+    rango = q3 - q1
+    inferior = min(q1 - 1.5 * rango, q1 * (1 - error_relativo))
+    superior = max(q3 + 1.5 * rango, q3 * (1 + error_relativo))
+    dentro = (valores >= inferior) & (valores <= superior)
+    atipicos = np.sort(valores[~dentro])
+    if len(atipicos) > max_atipicos:
+        atipicos = atipicos[np.linspace(0, len(atipicos) - 1, max_atipicos).round().astype(np.int64)]
+    return dict(
+        n=len(valores), q1=q1, median=mediana, q3=q3,
+        lowerfence=valores[dentro].min(), upperfence=valores[dentro].max(),
+        atipicos=atipicos,
+    )
+
+
+def box_summary(df, x, y, color=None, max_atipicos=MAX_ATIPICOS):
+    """Una fila por caja (``x`` y, si se da, ``color``) con sus estadísticos.
+
+    Las cajas quedan en el orden de aparición, como en ``px.box``.
+    """
+    claves = [x] if color is None or color == x else [x, color]
+    filas = []
+    for grupo, datos in df.groupby(claves, sort=False, observed=True):
+        filas.append({**dict(zip(claves, grupo)), **box_stats(datos[y].to_numpy(), max_atipicos)})
+    return pd.DataFrame(filas, columns=claves + ['n', *_CAMPOS, 'atipicos'])
+
+
+def box_figure(resumen, x, y, color=None, title=None, labels=None, etiquetas_x=None):
+    """Figura de cajas precalculadas a partir de la salida de ``box_summary``.
+
+    ``etiquetas_x`` da el texto del eje para cada categoría de ``x`` (por
+    defecto, la propia categoría).
+
+    Con ``color`` distinto de ``x`` las cajas de cada categoría se agrupan
+    lado a lado, como ``px.box`` con ``boxmode='group'``. Las posiciones se
+    calculan aquí para que los atípicos (una traza de puntos aparte) caigan
+    sobre su caja.
+    """
+    labels = labels or {}
+    resumen = resumen[resumen['n'] > 0]
+    categorias = pd.Index(pd.unique(resumen[x]))
+    agrupado = color is not None and color != x
+    grupos = pd.unique(resumen[color]) if color is not None else [None]
+    paso = ANCHO_GRUPO / len(grupos) if agrupado else ANCHO_GRUPO
+    paleta = px.colors.qualitative.Plotly
+
+    fig = go.Figure()
+    for j, grupo in enumerate(grupos):
+        datos = resumen if grupo is None else resumen[resumen[color] == grupo]
+        desplazamiento = (j - (len(grupos) - 1) / 2) * paso if agrupado else 0.0
+        posiciones = categorias.get_indexer(datos[x]) + desplazamiento
+        nombre = str(grupo) if grupo is not None else y
+        tono = paleta[j % len(paleta)]
+
+        fig.add_trace(go.Box(
+            name=nombre, legendgroup=nombre, x=posiciones,
+            **{campo: datos[campo].to_numpy() for campo in _CAMPOS},
+            width=paso * (1 - HUECO_CAJA), marker_color=tono, boxpoints=False,
+            showlegend=grupo is not None,
+        ))
+        atipicos = datos['atipicos'].to_numpy()
+        if sum(len(a) for a in atipicos):
+            fig.add_trace(go.Scatter(
+                name=nombre, legendgroup=nombre, showlegend=False,
+                x=np.repeat(posiciones, [len(a) for a in atipicos]), y=np.concatenate(atipicos),
+                mode='markers', marker=dict(color=tono, size=4),
+                hovertemplate=f"{labels.get(y, y)}=%{{y}}<extra>{nombre}</extra>",
+            ))
+
+    fig.update_layout(
+        title=title, boxmode='overlay',
+        legend_title_text=labels.get(color, color) if color is not None else None,
+    )
+    fig.update_xaxes(
+        title_text=labels.get(x, x), range=[-0.5, len(categorias) - 0.5],
+        tickvals=list(range(len(categorias))), ticktext=[str((etiquetas_x or {}).get(c, c)) for c in categorias],
+    )
+    fig.update_yaxes(title_text=labels.get(y, y))
+    return fig
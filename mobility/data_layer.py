@@ -0,0 +1,185 @@
+"""Datos compartidos por todas las sesiones de Streamlit del proceso.
+
+El histórico de tráfico, el GTFS y las estaciones se leen de los artefactos
+precalculados (``mobility.artifacts``) una sola vez por proceso con
+``st.cache_resource``: todas las páginas y sesiones reciben el mismo objeto,
+sin copiarlo ni serializarlo como hace ``st.cache_data``. La clave de la caché
+es la firma (nombre, tamaño y fecha de modificación) de los ficheros de
+origen, así que basta con que cambie un fichero para que la siguiente
+ejecución vuelva a cargar; mientras no cambian, un cambio de página o un clic
+solo cuesta unos ``os.stat``.
+
+Los recursos son de solo lectura: los arrays del tráfico no admiten escritura
+y las tablas del GTFS se entregan como copias superficiales (con
+copy-on-write, modificarlas no altera la versión compartida).
+"""
+import os
+
+import numpy as np
+import streamlit as st
+
+from mobility.artifacts import CARPETA_ARTEFACTOS, files_signature, load_gtfs, load_stations
+from mobility.gtfs import CARPETA_GTFS, feed_paths
+from mobility.segment_geometry import SegmentStore
+from mobility.station_registry import StationRegistry
+from mobility.stations import stations_path
+from mobility.traffic_anomaly import TrafficAnomalies
+from mobility.traffic_correlation import StationCorrelation
+from mobility.traffic_forecast import SeasonalForecast
+from mobility.traffic_store import (
+    CARPETA_CACHE, CARPETA_DATOS, SUFIJO_SEMANAL, load_cube, load_sketches, load_summary,
+    load_traffic, open_tensor,
+)
+
+
+def _freeze(objeto):
+    """Marca como no escribibles los arrays de un objeto (y de sus atributos)."""
+    for valor in vars(objeto).values():
+        if isinstance(valor, np.ndarray):
+            valor.flags.writeable = False
+        elif hasattr(valor, '__dict__'):
+            _freeze(valor)
+    return objeto
+
+
+# =============================================
+# TRÁFICO
+# =============================================
+class TrafficData:
+    """Histórico de tráfico y sus agregados, tal como los deja el almacén."""
+
+    def __init__(self, archivo, tensor, cubo, bocetos, resumen, avisos):
+        self.archivo = archivo
+        self.tensor = tensor
+        self.cubo = cubo
+        self.bocetos = bocetos
+        self.resumen = resumen
+        self.avisos = avisos
+
+
+def traffic_signature(carpeta=CARPETA_DATOS):
+    ficheros = sorted(f for f in os.listdir(carpeta) if f.endswith(SUFIJO_SEMANAL))
+    return files_signature(os.path.join(carpeta, f) for f in ficheros)
+
+
+@st.cache_resource(max_entries=1, show_spinner="Loading traffic archive...")
+def _traffic_resource(carpeta, destino, firma):
+    archivo, avisos = load_traffic(carpeta, destino)
+    tensor, _ = open_tensor(carpeta, destino)
+    resumen, _ = load_summary(carpeta, destino)
+    return TrafficData(
+        archivo, tensor, _freeze(load_cube(carpeta, destino)), _freeze(load_sketches(carpeta, destino)),
+        resumen if resumen is None else _freeze(resumen), avisos,
+    )
+
+
+def traffic_data(carpeta=CARPETA_DATOS, destino=CARPETA_CACHE):
+    """``TrafficData`` compartido; se recarga si cambian los ficheros semanales."""
+    return _traffic_resource(carpeta, destino, traffic_signature(carpeta))
+
+
+@st.cache_resource(max_entries=1, show_spinner="Scoring traffic anomalies...")
+def _anomalies_resource(carpeta, destino, firma):
+    return _freeze(TrafficAnomalies.detect(_traffic_resource(carpeta, destino, firma).tensor))
+
+
+def traffic_anomalies(carpeta=CARPETA_DATOS, destino=CARPETA_CACHE):
+    """``TrafficAnomalies`` de todo el histórico, calculadas una vez por versión de los datos."""
+    return _anomalies_resource(carpeta, destino, traffic_signature(carpeta))
+
+
+@st.cache_resource(max_entries=1, show_spinner="Fitting traffic forecasts...")
+def _forecast_resource(carpeta, destino, firma):
+    # Las horas anómalas (cortes, fallos de sensor) no entran en el ajuste
+    anomalias = _anomalies_resource(carpeta, destino, firma)
+    return _freeze(SeasonalForecast.fit(_traffic_resource(carpeta, destino, firma).tensor, anomalias.flags()))
+
+
+def traffic_forecast(carpeta=CARPETA_DATOS, destino=CARPETA_CACHE):
+    """``SeasonalForecast`` de todas las estaciones, ajustado una vez por versión de los datos."""
+    return _forecast_resource(carpeta, destino, traffic_signature(carpeta))
+
+
+@st.cache_resource(max_entries=8, show_spinner="Correlating stations...")
+def _correlation_resource(carpeta, destino, firma, inicio, fin, sin_perfil):
+    tensor = _traffic_resource(carpeta, destino, firma).tensor
+    perfil = _anomalies_resource(carpeta, destino, firma).mediana if sin_perfil else None
+    return _freeze(StationCorrelation.compute(tensor, tensor.time_slice(inicio, fin), perfil))
+
+
+def station_correlation(inicio=None, fin=None, sin_perfil=False, carpeta=CARPETA_DATOS, destino=CARPETA_CACHE):
+    """``StationCorrelation`` de la ventana ``[inicio, fin)``, calculada una vez por ventana.
+
+    Con ``sin_perfil`` se correlacionan las desviaciones respecto al perfil
+    día x hora de cada estación.
+    """
+    return _correlation_resource(carpeta, destino, traffic_signature(carpeta), inicio, fin, sin_perfil)
+
+
+# =============================================
+# GTFS
+# =============================================
+class GtfsFeed:
+    """Tablas del GTFS procesadas; ``feed['stop_times']`` devuelve una copia superficial.
+
+    Además de las tablas del feed incluye ``stop_speeds``, ``snapping``,
+    ``segments`` y ``segment_points`` (véase ``mobility.gtfs``).
+    """
+
+    def __init__(self, tablas, firma):
+        self._tablas = tablas
+        self.firma = firma
+
+    def __getitem__(self, tabla):
+        return self._tablas[tabla].copy(deep=False)
+
+
+def gtfs_signature(carpeta=CARPETA_GTFS):
+    return files_signature(feed_paths(carpeta).values())
+
+
+@st.cache_resource(max_entries=1, show_spinner="Loading GTFS feed...")
+def _gtfs_resource(destino, carpeta, firma):
+    return GtfsFeed(load_gtfs(destino, carpeta), firma)
+
+
+def gtfs_feed(carpeta=CARPETA_GTFS, destino=CARPETA_ARTEFACTOS):
+    """``GtfsFeed`` compartido; se recarga si cambia alguno de sus ficheros."""
+    return _gtfs_resource(destino, carpeta, gtfs_signature(carpeta))
+
+
+@st.cache_resource(max_entries=1)
+def _segments_resource(_gtfs, firma):
+    return SegmentStore(_gtfs['segments'], _gtfs['segment_points'])
+
+
+def segment_store(carpeta=CARPETA_GTFS, destino=CARPETA_ARTEFACTOS):
+    """``SegmentStore`` compartido con la geometría de los tramos del feed."""
+    gtfs = gtfs_feed(carpeta, destino)
+    return _segments_resource(gtfs, gtfs.firma)
+
+
+# =============================================
+# ESTACIONES
+# =============================================
+@st.cache_resource(max_entries=1)
+def _stations_resource(destino, carpeta, firma):
+    return load_stations(destino, carpeta)
+
+
+def station_metadata(carpeta=CARPETA_DATOS, destino=CARPETA_ARTEFACTOS):
+    """Metadatos de las estaciones de aforo (copia superficial de la tabla compartida)."""
+    firma = files_signature([stations_path(carpeta)])
+    return _stations_resource(destino, carpeta, firma).copy(deep=False)
+
+
+@st.cache_resource(max_entries=1)
+def _registry_resource(carpeta, destino, firma_estaciones, firma_trafico):
+    metadatos = _stations_resource(destino, carpeta, firma_estaciones)
+    tensor = _traffic_resource(carpeta, os.path.join(destino, "traffic"), firma_trafico).tensor
+    return StationRegistry.build(metadatos, tensor.estaciones)
+
+
+def station_registry(carpeta=CARPETA_DATOS, destino=CARPETA_ARTEFACTOS):
+    """``StationRegistry`` que cruza ``estaciones.csv`` con las estaciones del histórico."""
+    return _registry_resource(carpeta, destino, files_signature([stations_path(carpeta)]), traffic_signature(carpeta))
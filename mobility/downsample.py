@@ -0,0 +1,71 @@
+"""Reducción de series largas para dibujarlas (Largest-Triangle-Three-Buckets).
+
+Una serie horaria de varios años tiene decenas de miles de puntos por
+estación, muchos más que píxeles tiene el gráfico. LTTB divide la serie en
+tantos tramos como puntos se quieren y en cada tramo se queda con el punto
+que forma el triángulo de mayor área con el punto elegido en el tramo anterior
+y la media del siguiente, de modo que se conservan picos y valles.
+
+El histórico solo tiene las semanas publicadas, así que la serie se corta en
+los huecos: cada tramo continuo se reduce por separado y entre tramos se
+inserta un NaN para que la línea no una semanas distintas.
+"""
+import numpy as np
+
+ANCHO_PIXELES = 1200
+
+
+def lttb(x, y, n):
+    """Posiciones de los ``n`` puntos que LTTB conserva de la serie ``(x, y)``."""
+    total = len(x)
+    if n >= total or total <= 2:
+        return np.arange(total)
+    if n < 3:
+        return np.array([0, total - 1])[:max(n, 0)]
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Límites de los n-2 tramos interiores (el primer y el último punto se conservan)
+    bordes = (np.arange(n - 1) * (total - 2) / (n - 2)).astype(np.int64) + 1
+    bordes[-1] = total - 1
+
+    elegidos = np.empty(n, dtype=np.int64)
+    elegidos[0], elegidos[-1] = 0, total - 1
+    a = 0
+    for i in range(n - 2):
+        inicio, fin = bordes[i], bordes[i + 1]
+        # Media del tramo siguiente (el último punto para el último tramo)
+        if i + 2 < len(bordes):
+            siguiente = slice(fin, bordes[i + 2])
+            cx, cy = x[siguiente].mean(), y[siguiente].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        areas = np.abs((x[a] - cx) * (y[inicio:fin] - y[a]) - (x[a] - x[inicio:fin]) * (cy - y[a]))
+        a = inicio + int(np.argmax(areas))
+        elegidos[i + 1] = a
+    return elegidos
+
+
+def downsample_series(x, y, n=ANCHO_PIXELES, paso=1):
+    """Reduce la serie a unos ``n`` puntos respetando los huecos.
+
+    ``x`` debe ser creciente; dos puntos separados más de ``paso`` pertenecen a
+    tramos distintos. Los puntos se reparten entre tramos según su longitud y
+    entre tramos se repite el último ``x`` con ``y`` NaN. ``x`` conserva su tipo.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    if len(x) == 0:
+        return x, y
+
+    cortes = np.flatnonzero(np.diff(x) > paso) + 1
+    inicios = np.concatenate([[0], cortes])
+    finales = np.concatenate([cortes, [len(x)]])
+
+    partes_x, partes_y = [], []
+    for inicio, fin in zip(inicios, finales):
+        cupo = max(2, int(round(n * (fin - inicio) / len(x))))
+        elegidos = inicio + lttb(x[inicio:fin], y[inicio:fin], cupo)
+        partes_x += [x[elegidos], x[elegidos[-1:]]]
+        partes_y += [y[elegidos], [np.nan]]
+    return np.concatenate(partes_x[:-1]), np.concatenate(partes_y[:-1])
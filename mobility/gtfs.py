@@ -0,0 +1,226 @@
+"""Lectura y preparación del GTFS de Dbus ("Datos 1").
+
+Las tablas se leen tal como vienen (separadas por ``;``) salvo ``stop_times``,
+que se normaliza igual que hacían todas las páginas: ``shape_dist_traveled``
+con coma decimal pasa a float y los valores menores de 12 (en kilómetros) se
+pasan a metros; ``arrival_time`` y ``departure_time`` pasan a segundos desde el
+inicio del día de servicio (int32, ``parse_gtfs_times``), de modo que los
+viajes que pasan de medianoche (``25:10:00``) siguen ordenados y las
+diferencias y los filtros por hora son aritmética entera.
+
+A partir de ellas se derivan las tablas que usan las páginas de autobuses:
+``stop_speeds`` (cada parada con su viaje y el tiempo, la distancia y la
+velocidad desde la anterior) y ``snapping`` (el punto de cada shape más
+cercano a cada una de sus paradas y la distancia a lo largo del shape hasta
+él), que se busca con el haversine vectorizado sobre los puntos de cada
+shape.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from mobility.segment_geometry import build_segments
+
+CARPETA_GTFS = "Datos 1"
+
+# Nombre de cada tabla y su fichero en la carpeta del GTFS
+FICHEROS = {
+    'agency': "agency_dbus.csv",
+    'calendar': "calendar_dbus.csv",
+    'routes': "routes_dbus.csv",
+    'stop_times': "stop_times_dbus.csv",
+    'stops': "stops_dbus.csv",
+    'trips': "trips_dbus.csv",
+    'shapes': "sha_dbus.csv",
+}
+
+# Por debajo de este valor shape_dist_traveled está en kilómetros
+UMBRAL_KILOMETROS = 12
+
+RADIO_TIERRA = 6_371_008.8
+# Pares parada-shape por bloque al buscar el punto más cercano
+BLOQUE_SNAPPING = 4096
+
+SEGUNDOS_DIA = 24 * 3600
+# Hora vacía o ilegible en stop_times
+SIN_HORA = -1
+_CERO = ord('0')
+
+
+def feed_paths(carpeta=CARPETA_GTFS):
+    return {tabla: os.path.join(carpeta, fichero) for tabla, fichero in FICHEROS.items()}
+
+
+def parse_gtfs_times(valores):
+    """Horas GTFS ``H:MM:SS``/``HH:MM:SS`` en segundos desde el inicio del día
+    de servicio (int32). Las horas pueden pasar de 24; los valores vacíos o mal
+    formados quedan como ``SIN_HORA``.
+
+    El texto se ve como una matriz ``filas x ancho`` de bytes y se decodifica
+    desde el final de cada valor: segundos y minutos tienen posición fija
+    respecto a él y las horas son las cifras que quedan delante.
+    """
+    texto = np.asarray(pd.Series(valores).to_numpy(), dtype='S')
+    if texto.itemsize == 0 or len(texto) == 0:
+        return np.full(len(texto), SIN_HORA, dtype=np.int32)
+    bytes_ = texto.view(np.uint8).reshape(len(texto), texto.itemsize)
+    largo = (bytes_ != 0).sum(axis=1)
+    filas = np.arange(len(texto))
+
+    def desde_el_final(k):
+        return bytes_[filas, np.maximum(largo - k, 0)].astype(np.int32)
+
+    cifras = [desde_el_final(k) - _CERO for k in (1, 2, 4, 5)]
+    validos = (largo >= 7) & (desde_el_final(3) == ord(':')) & (desde_el_final(6) == ord(':'))
+    validos &= np.all([(c >= 0) & (c <= 9) for c in cifras], axis=0) & (cifras[1] <= 5) & (cifras[3] <= 5)
+
+    # Horas: las cifras delante de los minutos (se admiten espacios delante)
+    horas = np.zeros(len(texto), dtype=np.int32)
+    for j in range(texto.itemsize - 6):
+        en_horas = j < largo - 6
+        cifra = bytes_[:, j].astype(np.int32) - _CERO
+        es_cifra = (cifra >= 0) & (cifra <= 9)
+        validos &= ~en_horas | es_cifra | (bytes_[:, j] == ord(' '))
+        horas = np.where(en_horas & es_cifra, horas * 10 + cifra, horas)
+
+    segundos = horas * 3600 + (cifras[3] * 10 + cifras[2]) * 60 + cifras[1] * 10 + cifras[0]
+    return np.where(validos, segundos, SIN_HORA).astype(np.int32)
+
+
+def normalize_stop_times(stop_times):
+    """Distancias en metros (float) y horas en segundos (int32, ``parse_gtfs_times``)."""
+    stop_times = stop_times.copy()
+    distancia = stop_times['shape_dist_traveled'].astype(str).str.replace(',', '.').astype(float)
+    stop_times['shape_dist_traveled'] = distancia.where(distancia >= UMBRAL_KILOMETROS, distancia * 1000)
+    stop_times['arrival_time'] = parse_gtfs_times(stop_times['arrival_time'])
+    stop_times['departure_time'] = parse_gtfs_times(stop_times['departure_time'])
+    return stop_times
+
+
+def read_feed(carpeta=CARPETA_GTFS):
+    """Lee todas las tablas del GTFS; devuelve un dict ``tabla -> DataFrame``."""
+    tablas = {tabla: pd.read_csv(ruta, sep=';') for tabla, ruta in feed_paths(carpeta).items()}
+    tablas['stop_times'] = normalize_stop_times(tablas['stop_times'])
+    return tablas
+
+
+def enrich_stop_times(stop_times, trips):
+    """Paradas con ruta, servicio, sentido y shape de su viaje, y tiempo (s),
+    distancia (m) y velocidad (m/s) desde la parada anterior del viaje.
+
+    ``time_between_stops`` va de la salida de la parada anterior a la llegada
+    (0 si falta alguna hora); ``time_between_arrivals`` va de llegada a llegada
+    y ``speed_kmh`` es la velocidad con ese tiempo, ambas NaN en la primera
+    parada del viaje o si falta alguna hora."""
+    viajes = trips[['trip_id', 'route_id', 'service_id', 'direction_id', 'shape_id']]
+    df = stop_times.merge(viajes, on='trip_id', how='left').drop_duplicates()
+    por_viaje = df.groupby('trip_id')
+
+    df['prev_stop_id'] = por_viaje['stop_id'].shift(1)
+    salida_anterior = por_viaje['departure_time'].shift(1)
+    tiempo = (df['arrival_time'] - salida_anterior).astype(np.float64)
+    tiempo[(df['arrival_time'] == SIN_HORA) | (salida_anterior == SIN_HORA)] = np.nan
+    df['time_between_stops'] = tiempo.fillna(0)
+    distancia = df['shape_dist_traveled'] - por_viaje['shape_dist_traveled'].shift(1)
+    df['distance_between_stops'] = distancia.fillna(0)
+    llegada = df['arrival_time'].where(df['arrival_time'] != SIN_HORA)
+    df['time_between_arrivals'] = llegada.groupby(df['trip_id']).diff()
+    df['speed_kmh'] = (distancia / 1000) / (df['time_between_arrivals'] / 3600)
+    df['avg_speed'] = (df['distance_between_stops'] / df['time_between_stops']).fillna(0)
+    df.loc[df['time_between_stops'] == 0, ['avg_speed', 'distance_between_stops']] = 0
+    return df
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Distancia en metros por la fórmula del haversine (admite arrays)."""
+    lat1, lon1, lat2, lon2 = (np.radians(x) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RADIO_TIERRA * np.arcsin(np.sqrt(a))
+
+
+class ShapeIndex:
+    """Puntos de todos los shapes ordenados por ``shape_id`` y ``shape_pt_sequence``.
+
+    Los puntos de cada shape son un tramo contiguo de ``lat``/``lon``
+    (``inicio[i]`` a ``inicio[i] + puntos[i]``), y ``recorrido`` es la
+    distancia acumulada (m) desde el primer punto de su shape.
+    """
+
+    def __init__(self, shapes):
+        puntos = shapes.sort_values(['shape_id', 'shape_pt_sequence'], kind='stable')
+        self.shape_ids, self.inicio, self.puntos = np.unique(
+            puntos['shape_id'].to_numpy(), return_index=True, return_counts=True)
+        self.lat = puntos['shape_pt_lat'].to_numpy(dtype=np.float64)
+        self.lon = puntos['shape_pt_lon'].to_numpy(dtype=np.float64)
+        tramos = np.concatenate([[0.0], haversine(self.lat[:-1], self.lon[:-1], self.lat[1:], self.lon[1:])])
+        tramos[self.inicio] = 0.0
+        acumulado = np.cumsum(tramos)
+        self.recorrido = acumulado - np.repeat(acumulado[self.inicio], self.puntos)
+
+    def position(self, shape_id):
+        """Posición de cada ``shape_id`` en el índice (-1 si no tiene puntos)."""
+        if len(self.shape_ids) == 0:
+            return np.full(np.shape(shape_id), -1)
+        posicion = np.minimum(np.searchsorted(self.shape_ids, shape_id), len(self.shape_ids) - 1)
+        return np.where(self.shape_ids[posicion] == shape_id, posicion, -1)
+
+    def nearest(self, shape_id, lat, lon, bloque=BLOQUE_SNAPPING):
+        """Índice (dentro de su shape) del punto más cercano a cada coordenada.
+
+        Por bloques de pares, cada uno contra los puntos de su shape en una
+        matriz ``pares x puntos`` rellenada con infinito.
+        """
+        posicion = self.position(np.asarray(shape_id))
+        if (posicion < 0).any():
+            raise KeyError("shape without points")
+        mas_cercano = np.empty(len(posicion), dtype=np.int64)
+        for desde in range(0, len(posicion), bloque):
+            tramo = slice(desde, desde + bloque)
+            inicio, puntos = self.inicio[posicion[tramo]], self.puntos[posicion[tramo]]
+            columnas = np.arange(puntos.max())
+            validos = columnas[None, :] < puntos[:, None]
+            indices = np.where(validos, inicio[:, None] + columnas[None, :], 0)
+            distancias = haversine(np.asarray(lat)[tramo, None], np.asarray(lon)[tramo, None],
+                                   self.lat[indices], self.lon[indices])
+            mas_cercano[tramo] = np.argmin(np.where(validos, distancias, np.inf), axis=1)
+        return mas_cercano
+
+
+def snap_stops(stop_speeds, stops, shapes):
+    """Punto de cada shape más cercano a cada una de sus paradas (haversine).
+
+    Devuelve un DataFrame ``shape_id, stop_id, shape_index, shape_offset``:
+    ``shape_index`` es la posición del punto en el shape ordenado por
+    ``shape_pt_sequence`` y ``shape_offset`` la distancia (m) a lo largo del
+    shape hasta él. Las paradas sin coordenadas y los shapes sin puntos no
+    aparecen.
+    """
+    pares = stop_speeds[['shape_id', 'stop_id']].dropna().drop_duplicates()
+    coordenadas = stops[['stop_id', 'stop_lat', 'stop_lon']].drop_duplicates('stop_id')
+    pares = pares.merge(coordenadas, on='stop_id', how='inner').sort_values(['shape_id', 'stop_id'], kind='stable')
+    pares = pares.dropna(subset=['stop_lat', 'stop_lon'])
+
+    indice = ShapeIndex(shapes)
+    pares = pares[indice.position(pares['shape_id'].to_numpy()) >= 0]
+    shape_id = pares['shape_id'].to_numpy()
+    mas_cercano = indice.nearest(shape_id, pares['stop_lat'].to_numpy(), pares['stop_lon'].to_numpy())
+    punto = indice.inicio[indice.position(shape_id)] + mas_cercano
+    return pd.DataFrame({
+        'shape_id': shape_id,
+        'stop_id': pares['stop_id'].to_numpy(),
+        'shape_index': mas_cercano,
+        'shape_offset': indice.recorrido[punto],
+    })
+
+
+def prepare_feed(tablas):
+    """Añade a las tablas leídas las derivadas ``stop_speeds``, ``snapping`` y la
+    geometría de los tramos (``segments`` y ``segment_points``, véase
+    ``mobility.segment_geometry``)."""
+    tablas = dict(tablas)
+    tablas['stop_speeds'] = enrich_stop_times(tablas['stop_times'], tablas['trips'])
+    tablas['snapping'] = snap_stops(tablas['stop_speeds'], tablas['stops'], tablas['shapes'])
+    tablas['segments'], tablas['segment_points'] = build_segments(
+        tablas['stop_speeds'], tablas['snapping'], ShapeIndex(tablas['shapes']))
+    return tablas
@@ -0,0 +1,111 @@
+"""Geometría de los tramos entre paradas, precalculada una vez por feed.
+
+Un tramo es la parte de un shape entre los puntos más cercanos a dos paradas
+consecutivas de un viaje (``snapping``), identificada por
+``(shape_id, prev_stop_id, stop_id)``. Cada tramo se guarda una sola vez,
+simplificado con Douglas–Peucker (los puntos que se apartan menos de
+``TOLERANCIA_METROS`` de la recta entre los que se conservan sobran para
+dibujar) y con las coordenadas en millonésimas de grado en ``int32``: todos
+los puntos van seguidos en ``segment_points`` y cada tramo de ``segments``
+apunta a los suyos con ``inicio`` y ``puntos``.
+
+``SegmentStore.route`` devuelve de una vez los tramos de una ruta con sus
+coordenadas listas para ``PolyLine``, así que el mapa se dibuja uniendo las
+velocidades por tramo con esa tabla.
+"""
+import numpy as np
+import pandas as pd
+
+TOLERANCIA_METROS = 2.0
+ESCALA_COORDENADAS = 1_000_000
+METROS_GRADO = 111_320
+
+CLAVE = ['shape_id', 'prev_stop_id', 'stop_id']
+
+
+def douglas_peucker(lat, lon, tolerancia=TOLERANCIA_METROS):
+    """Máscara de los puntos de la poligonal que conserva Douglas–Peucker."""
+    y = np.asarray(lat, dtype=np.float64) * METROS_GRADO
+    x = np.asarray(lon, dtype=np.float64) * METROS_GRADO * np.cos(np.radians(np.mean(lat)))
+    conservar = np.zeros(len(x), dtype=bool)
+    conservar[[0, -1]] = True
+    pendientes = [(0, len(x) - 1)]
+    while pendientes:
+        a, b = pendientes.pop()
+        if b - a < 2:
+            continue
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        px, py = x[a + 1:b] - x[a], y[a + 1:b] - y[a]
+        largo = np.hypot(dx, dy)
+        # Distancia a la recta entre los extremos (al extremo si coinciden)
+        distancia = np.abs(px * dy - py * dx) / largo if largo > 0 else np.hypot(px, py)
+        k = int(np.argmax(distancia))
+        if distancia[k] > tolerancia:
+            conservar[a + 1 + k] = True
+            pendientes += [(a, a + 1 + k), (a + 1 + k, b)]
+    return conservar
+
+
+def build_segments(stop_speeds, snapping, indice, tolerancia=TOLERANCIA_METROS):
+    """Tablas ``segments`` y ``segment_points`` de todos los tramos del feed.
+
+    ``indice`` es el ``ShapeIndex`` de los shapes. Los tramos cuyas paradas
+    caen en el mismo punto del shape no tienen geometría y no aparecen; los
+    de un shape usado por varias rutas se guardan una vez y aparecen en cada
+    una.
+    """
+    usados = stop_speeds[['route_id'] + CLAVE].dropna().drop_duplicates()
+    extremos = snapping[['shape_id', 'stop_id', 'shape_index']]
+    usados = usados.merge(extremos.rename(columns={'stop_id': 'prev_stop_id', 'shape_index': 'desde'}),
+                          on=['shape_id', 'prev_stop_id'])
+    usados = usados.merge(extremos.rename(columns={'shape_index': 'hasta'}), on=['shape_id', 'stop_id'])
+    usados = usados[usados['desde'] != usados['hasta']]
+
+    tramos = usados.drop_duplicates(CLAVE).reset_index(drop=True)
+    base = indice.inicio[indice.position(tramos['shape_id'].to_numpy())]
+    desde = base + np.minimum(tramos['desde'], tramos['hasta']).to_numpy()
+    hasta = base + np.maximum(tramos['desde'], tramos['hasta']).to_numpy()
+
+    seleccion, puntos = [], np.zeros(len(tramos), dtype=np.int64)
+    for i, (a, b) in enumerate(zip(desde, hasta)):
+        posiciones = np.arange(a, b + 1)
+        if len(posiciones) > 2:
+            posiciones = posiciones[douglas_peucker(indice.lat[posiciones], indice.lon[posiciones], tolerancia)]
+        seleccion.append(posiciones)
+        puntos[i] = len(posiciones)
+    seleccion = np.concatenate(seleccion) if seleccion else np.zeros(0, dtype=np.int64)
+
+    tramos['inicio'] = np.cumsum(puntos) - puntos
+    tramos['puntos'] = puntos
+    # Los identificadores conservan el tipo con el que se leyó el feed
+    segmentos = usados[['route_id'] + CLAVE].merge(tramos[CLAVE + ['inicio', 'puntos']], on=CLAVE)
+    coordenadas = pd.DataFrame({
+        'lat_e6': np.round(indice.lat[seleccion] * ESCALA_COORDENADAS).astype(np.int32),
+        'lon_e6': np.round(indice.lon[seleccion] * ESCALA_COORDENADAS).astype(np.int32),
+    })
+    return segmentos, coordenadas
+
+
+class SegmentStore:
+    """Tramos del feed con su geometría (tablas ``segments`` y ``segment_points``)."""
+
+    def __init__(self, segmentos, coordenadas):
+        self.segmentos = segmentos
+        self.lat = coordenadas['lat_e6'].to_numpy()
+        self.lon = coordenadas['lon_e6'].to_numpy()
+        # Por texto: la ruta puede llegar como número o como en un selectbox
+        self._por_ruta = segmentos.groupby(segmentos['route_id'].astype(str)).indices
+
+    def __len__(self):
+        return len(self.segmentos)
+
+    def route(self, route_id):
+        """Tramos de ``route_id`` (``shape_id, prev_stop_id, stop_id, locations``);
+        ``locations`` es la lista ``[lat, lon]`` de cada tramo."""
+        filas = self.segmentos.iloc[self._por_ruta.get(str(route_id), [])]
+        inicio, puntos = filas['inicio'].to_numpy(), filas['puntos'].to_numpy()
+        posiciones = np.repeat(inicio - np.cumsum(puntos) + puntos, puntos) + np.arange(puntos.sum())
+        coordenadas = np.column_stack([self.lat[posiciones], self.lon[posiciones]]) / ESCALA_COORDENADAS
+        tramos = filas[CLAVE].reset_index(drop=True)
+        tramos['locations'] = [c.tolist() for c in np.split(coordenadas, np.cumsum(puntos)[:-1])] if len(tramos) else []
+        return tramos
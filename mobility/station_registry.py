@@ -0,0 +1,129 @@
+"""Registro de estaciones de aforo: código del histórico <-> metadatos.
+
+En los ficheros semanales la estación viene como texto con ceros a la
+izquierda (``00001``) y el histórico la guarda como entero; ``estaciones.csv``
+la llama ``ETD code`` (`` 1 ``, con espacios) y añade la carretera
+(``System``) y las coordenadas. El registro normaliza ambas claves al mismo
+entero una sola vez y guarda diccionarios por código y por carretera, de modo
+que mapa, gráficos y filtros resuelven una estación sin recorrer la tabla.
+
+Los códigos que no casan (estaciones con tráfico sin metadatos, filas de
+``estaciones.csv`` sin tráfico, códigos inválidos o repetidos y filas sin
+coordenadas) se recogen en ``report()``.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+ANCHO_CODIGO = 5
+
+Station = namedtuple('Station', ['estacion', 'codigo', 'sistema', 'descripcion', 'municipio', 'lat', 'lon'])
+
+
+def station_code(valor):
+    """Código entero de una estación (``'00001 '``, ``' 1 '`` o ``1``); ``None`` si no es válido."""
+    try:
+        codigo = int(str(valor).strip())
+    except ValueError:
+        return None
+    return codigo if codigo >= 0 else None
+
+
+def padded_code(estacion):
+    """Código con ceros a la izquierda, como en los ficheros semanales."""
+    return f"{int(estacion):0{ANCHO_CODIGO}d}"
+
+
+def _text(valor):
+    return valor.strip() if isinstance(valor, str) else ''
+
+
+class StationRegistry:
+    """Estaciones con tráfico y/o metadatos, indexadas por código y por carretera."""
+
+    def __init__(self, registros, incidencias):
+        self._por_codigo = {r.estacion: r for r in registros}
+        self._por_sistema = {}
+        for r in registros:
+            if r.sistema:
+                self._por_sistema.setdefault(r.sistema, []).append(r.estacion)
+        self._incidencias = incidencias
+
+    @classmethod
+    def build(cls, metadatos, estaciones_trafico):
+        """Cruza la tabla de ``estaciones.csv`` con los códigos del histórico."""
+        con_trafico = {int(e) for e in np.asarray(estaciones_trafico)}
+        registros, incidencias = {}, []
+
+        for fila in metadatos.to_dict('records'):
+            estacion = station_code(fila.get('ETD code'))
+            if estacion is None:
+                incidencias.append((str(fila.get('ETD code')).strip(), "Invalid ETD code"))
+                continue
+            if estacion in registros:
+                incidencias.append((padded_code(estacion), "Duplicate ETD code (first row kept)"))
+                continue
+            lat, lon = pd.to_numeric(fila.get('Y'), errors='coerce'), pd.to_numeric(fila.get('X'), errors='coerce')
+            if pd.isna(lat) or pd.isna(lon):
+                incidencias.append((padded_code(estacion), "Missing coordinates"))
+                lat = lon = None
+            else:
+                lat, lon = float(lat), float(lon)
+            if estacion not in con_trafico:
+                incidencias.append((padded_code(estacion), "No traffic records"))
+            registros[estacion] = Station(
+                estacion, padded_code(estacion), _text(fila.get('System')), _text(fila.get('Description')),
+                _text(fila.get('Municipality')), lat, lon,
+            )
+
+        for estacion in sorted(con_trafico - registros.keys()):
+            incidencias.append((padded_code(estacion), "No metadata in estaciones.csv"))
+            registros[estacion] = Station(estacion, padded_code(estacion), '', '', '', None, None)
+
+        return cls([registros[e] for e in sorted(registros)], incidencias)
+
+    # -----------------------------------------
+    # Consultas
+    # -----------------------------------------
+    def __contains__(self, estacion):
+        return estacion in self._por_codigo
+
+    def __len__(self):
+        return len(self._por_codigo)
+
+    def get(self, estacion):
+        """``Station`` de un código (entero o texto con ceros); ``None`` si no existe."""
+        if not isinstance(estacion, (int, np.integer)):
+            estacion = station_code(estacion)
+        return self._por_codigo.get(int(estacion)) if estacion is not None else None
+
+    def coordinates(self, estacion):
+        """``(lat, lon)`` de una estación, o ``None`` si no tiene."""
+        registro = self.get(estacion)
+        return None if registro is None or registro.lat is None else (registro.lat, registro.lon)
+
+    def label(self, estacion):
+        """Etiqueta para selectores: ``00001 · GI-2132``."""
+        registro = self.get(estacion)
+        if registro is None:
+            return str(estacion)
+        return f"{registro.codigo} · {registro.sistema}" if registro.sistema else registro.codigo
+
+    def systems(self):
+        """Carreteras con al menos una estación, ordenadas."""
+        return sorted(self._por_sistema)
+
+    def stations(self, sistema=None):
+        """Códigos de todas las estaciones o de las de una carretera."""
+        if sistema is None:
+            return list(self._por_codigo)
+        return list(self._por_sistema.get(sistema, []))
+
+    def located(self):
+        """Estaciones con coordenadas (``Station``), en orden de código."""
+        return [r for r in self._por_codigo.values() if r.lat is not None]
+
+    def report(self):
+        """Códigos que no casan entre el histórico y ``estaciones.csv``."""
+        return pd.DataFrame(self._incidencias, columns=['Estacion', 'Motivo'])
@@ -0,0 +1,15 @@
+"""Metadatos de las estaciones de aforo ("Datos 2/estaciones.csv")."""
+import os
+
+import pandas as pd
+
+FICHERO_ESTACIONES = "estaciones.csv"
+
+
+def stations_path(carpeta):
+    return os.path.join(carpeta, FICHERO_ESTACIONES)
+
+
+def read_stations(carpeta):
+    """Tabla de estaciones tal como la publica la Diputación (latin1, ``;``)."""
+    return pd.read_csv(stations_path(carpeta), encoding='latin1', delimiter=';', index_col=False)
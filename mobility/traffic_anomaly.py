@@ -0,0 +1,106 @@
+"""Detección de horas anómalas (cortes, fallos de sensor, incidentes).
+
+Se trabaja sobre la matriz estación x hora del tensor (total de vehículos,
+NaN donde la estación no tiene registro). La línea base de cada estación es
+estacional: mediana y MAD de cada franja día de la semana x hora (168
+franjas). Cada hora se puntúa con la z robusta de Iglewicz y Hoaglin,
+``0.6745 * (x - mediana) / MAD``, y se marca como anómala si supera el
+umbral en valor absoluto.
+
+No hay bucles por estación: las columnas de la matriz se reordenan por franja
+y se rellenan con NaN hasta formar un cubo estación x franja x semana, de modo
+que medianas y MAD de todas las estaciones salen de dos ``nanmedian``.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+FRANJAS = 7 * 24
+UMBRAL_Z = 3.5
+MIN_MUESTRAS = 4
+# Una franja con MAD 0 (p. ej. siempre 0 vehículos de madrugada) usaría este valor
+MAD_MINIMA = 1.0
+_K = 0.6745
+
+
+def slot_of(horas):
+    """Franja (lunes 00:00 = 0 ... domingo 23:00 = 167) de horas absolutas desde 1970."""
+    horas = np.asarray(horas, dtype=np.int64)
+    # El 1 de enero de 1970 fue jueves
+    return ((horas // 24 + 3) % 7) * 24 + horas % 24
+
+
+def _slot_cube(matriz, franjas):
+    """Reordena las columnas por franja en un cubo filas x franja x muestra (NaN de relleno)."""
+    orden = np.argsort(franjas, kind='stable')
+    por_franja = np.bincount(franjas, minlength=FRANJAS)
+    inicios = np.concatenate([[0], np.cumsum(por_franja)[:-1]])
+    muestra = np.arange(len(orden)) - inicios[franjas[orden]]
+
+    cubo = np.full((matriz.shape[0], FRANJAS, max(int(por_franja.max(initial=0)), 1)), np.nan, dtype=np.float32)
+    cubo[:, franjas[orden], muestra] = matriz[:, orden]
+    return cubo
+
+
+class TrafficAnomalies:
+    """Líneas base por estación y franja y z robusta de cada hora registrada."""
+
+    def __init__(self, estaciones, horas, totales, mediana, mad, z):
+        self.estaciones = estaciones
+        self.horas = horas
+        self.totales = totales
+        self.mediana = mediana
+        self.mad = mad
+        self.z = z
+
+    @classmethod
+    def detect(cls, tensor):
+        """Puntúa todas las horas de todas las estaciones del ``TrafficTensor``."""
+        totales = np.where(tensor.presente, tensor.conteos.sum(axis=2, dtype=np.int32), np.nan).astype(np.float32)
+        franjas = slot_of(tensor.horas)
+        cubo = _slot_cube(totales, franjas)
+
+        with warnings.catch_warnings():
+            # Franjas sin ningún registro: su mediana queda en NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mediana = np.nanmedian(cubo, axis=2)
+            mad = np.nanmedian(np.abs(cubo - mediana[:, :, None]), axis=2)
+        mediana[(~np.isnan(cubo)).sum(axis=2) < MIN_MUESTRAS] = np.nan
+        mad = np.maximum(mad, MAD_MINIMA)
+
+        z = _K * (totales - mediana[:, franjas]) / mad[:, franjas]
+        return cls(np.asarray(tensor.estaciones), np.asarray(tensor.horas), totales, mediana, mad, z)
+
+    # -----------------------------------------
+    # Consultas
+    # -----------------------------------------
+    def expected(self, estacion, horas):
+        """Valor esperado (mediana de su franja) de una estación en horas absolutas desde 1970."""
+        return self.mediana[int(np.searchsorted(self.estaciones, estacion)), slot_of(horas)]
+
+    def flags(self, umbral=UMBRAL_Z):
+        """Máscara estación x hora de las horas anómalas."""
+        with np.errstate(invalid='ignore'):
+            return np.abs(self.z) > umbral
+
+    def counts_by_station(self, umbral=UMBRAL_Z):
+        """Número de horas anómalas por estación, de mayor a menor."""
+        conteo = pd.Series(self.flags(umbral).sum(axis=1), name='Anomalias',
+                           index=pd.Index(self.estaciones, name='Estacion'))
+        return conteo.sort_values(ascending=False)
+
+    def flagged(self, umbral=UMBRAL_Z, estacion=None):
+        """Horas anómalas (de todas las estaciones o de una), de mayor a menor |z|."""
+        filas, columnas = np.nonzero(self.flags(umbral))
+        if estacion is not None:
+            elegidas = self.estaciones[filas] == estacion
+            filas, columnas = filas[elegidas], columnas[elegidas]
+        df = pd.DataFrame({
+            'Estacion': self.estaciones[filas],
+            'Fecha_Hora': self.horas[columnas].astype('datetime64[h]'),
+            'Total_Vehiculos': self.totales[filas, columnas],
+            'Esperado': self.mediana[filas, slot_of(self.horas[columnas])],
+            'z': self.z[filas, columnas],
+        })
+        return df.iloc[np.argsort(-np.abs(df['z'].to_numpy()), kind='stable')].reset_index(drop=True)
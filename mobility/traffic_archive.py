@@ -0,0 +1,202 @@
+"""Histórico de tráfico en memoria con tipos compactos.
+
+En lugar de un DataFrame con estaciones, horas y días de la semana como
+cadenas y carriles en int64, cada fila ocupa:
+
+- ``codigo``: código de estación (uint8 o uint16) sobre la tabla ``estaciones``
+- ``dia``: número de día desde 1970-01-01 (int32)
+- ``hora``: hora 1-24 (uint8)
+- ``carriles``: matriz contigua ``filas x carriles`` (uint16)
+
+El día de la semana, el mes, la estación del año o el total de vehículos se
+calculan al pedirlos, y solo para las filas pedidas.
+
+Las filas están ordenadas por (estación, día, hora) y ``offsets`` guarda dónde
+empieza cada estación, así que filtrar por estación y ventana de tiempo es una
+búsqueda binaria que devuelve un ``slice`` (una vista, sin copiar filas).
+"""
+import numpy as np
+import pandas as pd
+
+from mobility.traffic_cube import date_parts, period_bounds
+
+COLUMNAS = ('estaciones', 'offsets', 'codigo', 'dia', 'hora', 'carriles')
+
+# Estación del año de cada mes (el índice 0 no se usa)
+ESTACIONES_DEL_ANIO = np.array(
+    ['', 'Winter', 'Winter', 'Spring', 'Spring', 'Spring', 'Summer',
+     'Summer', 'Summer', 'Autumn', 'Autumn', 'Autumn', 'Winter'],
+    dtype=object,
+)
+
+
+def _smallest_uint(maximo):
+    """Tipo entero sin signo más pequeño en el que cabe ``maximo``."""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if maximo <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
+
+
+class TrafficArchive:
+    """Filas horarias del histórico en columnas NumPy compactas."""
+
+    def __init__(self, estaciones, offsets, codigo, dia, hora, carriles, columnas_carriles):
+        self.estaciones = estaciones
+        self.offsets = offsets
+        self.codigo = codigo
+        self.dia = dia
+        self.hora = hora
+        self.carriles = carriles
+        self.columnas_carriles = list(columnas_carriles)
+
+    # -----------------------------------------
+    # Construcción y persistencia
+    # -----------------------------------------
+    @classmethod
+    def from_columns(cls, estacion, fecha, hora, carriles, columnas_carriles):
+        """Convierte las columnas del lector a la representación compacta y ordenada."""
+        estaciones, codigo = np.unique(estacion, return_inverse=True)
+        dia = fecha.astype('datetime64[D]').astype(np.int32)
+        orden = np.lexsort((hora, dia, codigo))
+        codigo = codigo[orden]
+        maximo = int(carriles.max()) if carriles.size else 0
+        return cls(
+            estaciones.astype(np.int32),
+            np.searchsorted(codigo, np.arange(len(estaciones) + 1)).astype(np.int64),
+            codigo.astype(_smallest_uint(max(len(estaciones) - 1, 0))),
+            dia[orden],
+            hora[orden].astype(np.uint8),
+            np.ascontiguousarray(carriles[orden], dtype=_smallest_uint(max(maximo, np.iinfo(np.uint16).max))),
+            columnas_carriles,
+        )
+
+    def columns(self):
+        """Columnas a guardar en disco, por nombre."""
+        return {nombre: getattr(self, nombre) for nombre in COLUMNAS}
+
+    @classmethod
+    def from_arrays(cls, arrays, columnas_carriles):
+        return cls(*(arrays[nombre] for nombre in COLUMNAS), columnas_carriles)
+
+    def __len__(self):
+        return len(self.codigo)
+
+    # -----------------------------------------
+    # Filtros
+    # -----------------------------------------
+    def station_rows(self, estacion):
+        """Filas de una estación como ``slice`` (vacío si no existe)."""
+        i = int(np.searchsorted(self.estaciones, estacion))
+        if i == len(self.estaciones) or self.estaciones[i] != estacion:
+            return slice(0, 0)
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    def window(self, estacion, inicio=None, fin=None):
+        """Filas de una estación entre ``inicio`` (incluido) y ``fin`` (excluido).
+
+        Los límites son fechas u horas (``datetime64``, ``str``...) y se buscan
+        por bisección dentro del tramo de la estación.
+        """
+        tramo = self.station_rows(estacion)
+        desde = tramo.start if inicio is None else self._position(tramo, inicio)
+        hasta = tramo.stop if fin is None else self._position(tramo, fin)
+        return slice(desde, max(desde, hasta))
+
+    def _position(self, tramo, instante):
+        """Primera fila del tramo en o después de ``instante``."""
+        dia, hora = divmod(int(np.datetime64(instante, 'h').astype(np.int64)), 24)
+        dias = self.dia[tramo]
+        i = tramo.start + int(np.searchsorted(dias, dia, side='left'))
+        j = tramo.start + int(np.searchsorted(dias, dia, side='right'))
+        # Dentro del día, la hora h cubre el intervalo que empieza a las h-1
+        return i + int(np.searchsorted(self.hora[i:j], hora + 1, side='left'))
+
+    def rows(self, estacion=None, anio=None, mes=None):
+        """Filas que cumplen los filtros (valor o lista de valores).
+
+        Con estación se resuelve con el índice: un ``slice`` si el resultado es
+        una única ventana o un array de posiciones si son varias. Sin estación
+        se devuelve una máscara booleana.
+        """
+        if estacion is not None:
+            return self._indexed_rows(np.atleast_1d(estacion), anio, mes)
+
+        filas = np.ones(len(self), dtype=bool)
+        if anio is not None or mes is not None:
+            anios, meses, _ = date_parts(self.fecha())
+            if anio is not None:
+                filas &= np.isin(anios, np.atleast_1d(anio))
+            if mes is not None:
+                filas &= np.isin(meses, np.atleast_1d(mes))
+        return filas
+
+    def _indexed_rows(self, estaciones, anio, mes):
+        ventanas = []
+        for estacion in estaciones:
+            tramo = self.station_rows(estacion)
+            if tramo.stop == tramo.start:
+                continue
+            if anio is None and mes is None:
+                ventanas.append(tramo)
+                continue
+            anios = np.atleast_1d(anio) if anio is not None else np.arange(
+                self.anio(tramo.start), self.anio(tramo.stop - 1) + 1)
+            meses = np.atleast_1d(mes) if mes is not None else [None]
+            for a in anios:
+                for m in meses:
+                    inicio, fin = period_bounds(int(a), m)
+                    ventana = self.window(estacion, inicio, fin)
+                    if ventana.stop > ventana.start:
+                        ventanas.append(ventana)
+
+        if len(ventanas) == 1:
+            return ventanas[0]
+        if not ventanas:
+            return slice(0, 0)
+        return np.concatenate([np.arange(v.start, v.stop) for v in ventanas])
+
+    # -----------------------------------------
+    # Campos derivados (bajo demanda)
+    # -----------------------------------------
+    def estacion(self, filas=slice(None)):
+        return self.estaciones[self.codigo[filas]]
+
+    def fecha(self, filas=slice(None)):
+        return self.dia[filas].astype('datetime64[D]')
+
+    def anio(self, filas=slice(None)):
+        return date_parts(self.fecha(filas))[0]
+
+    def mes(self, filas=slice(None)):
+        return date_parts(self.fecha(filas))[1]
+
+    def dia_semana(self, filas=slice(None)):
+        """Día de la semana, lunes=0."""
+        return date_parts(self.fecha(filas))[2]
+
+    def total(self, filas=slice(None)):
+        """Vehículos por fila (suma de todos los carriles)."""
+        return self.carriles[filas].sum(axis=1, dtype=np.int32)
+
+    def to_frame(self, filas=slice(None)):
+        """DataFrame de las filas pedidas, conservando los tipos compactos."""
+        df = pd.DataFrame({
+            'Estacion': pd.Categorical.from_codes(self.codigo[filas], categories=self.estaciones),
+            'Fecha': self.fecha(filas),
+            'Hora': self.hora[filas],
+        })
+        carriles = pd.DataFrame(self.carriles[filas], columns=self.columnas_carriles)
+        return pd.concat([df, carriles], axis=1)
+
+    # -----------------------------------------
+    # Memoria
+    # -----------------------------------------
+    def memory_usage(self):
+        """Bytes ocupados por cada columna, como ``DataFrame.memory_usage``."""
+        return pd.Series({nombre: getattr(self, nombre).nbytes for nombre in COLUMNAS})
+
+    @property
+    def nbytes(self):
+        return int(self.memory_usage().sum())
+
@@ -0,0 +1,131 @@
+"""Correlación entre estaciones del total horario de vehículos.
+
+Se calcula la correlación de Pearson de cada par de estaciones sobre las
+horas que ambas tienen registradas (``presente``), sin rellenar huecos. Todas
+las sumas que necesita cada par salen de productos de matrices estación x
+hora con la máscara de registro:
+
+- ``n = M @ M.T``: horas comunes
+- ``sx = X @ M.T``, ``sxx = X² @ M.T``: sumas de la estación fila en esas horas
+- ``sxy = X @ X.T``
+
+y el eje temporal se recorre por bloques, así que la memoria no depende de la
+longitud de la ventana (el tensor se lee del mapa en memoria bloque a bloque).
+Opcionalmente se resta antes a cada hora el perfil día x hora de su estación,
+para que la correlación mida si las estaciones se desvían juntas (corredores,
+desvíos) y no solo que todas tienen hora punta.
+
+``cluster_order`` ordena las estaciones por agrupamiento jerárquico (enlace
+medio sobre ``1 - r``) para dibujar el mapa de calor por bloques.
+"""
+import numpy as np
+import pandas as pd
+
+from mobility.traffic_anomaly import slot_of
+
+BLOQUE_HORAS = 2048
+# Pares con menos horas comunes quedan en NaN
+MIN_COMUNES = 168
+
+
+class StationCorrelation:
+    """Matriz de correlación estación x estación y horas comunes de cada par."""
+
+    def __init__(self, estaciones, r, n):
+        self.estaciones = estaciones
+        self.r = r
+        self.n = n
+
+    @classmethod
+    def compute(cls, tensor, horas=slice(None), perfil=None, bloque=BLOQUE_HORAS, min_comunes=MIN_COMUNES):
+        """Correlaciones del ``TrafficTensor`` en el rango ``horas`` del eje temporal.
+
+        ``perfil`` (estación x franja, p. ej. la mediana de ``TrafficAnomalies``)
+        se resta a cada hora antes de correlacionar; las franjas sin perfil
+        cuentan como hora no registrada.
+        """
+        rango = range(len(tensor.horas))[horas]
+        estaciones = len(tensor.estaciones)
+        n, sx, sxx, sxy = (np.zeros((estaciones, estaciones)) for _ in range(4))
+        desplazamiento = None
+
+        for inicio in range(rango.start, rango.stop, bloque):
+            tramo = slice(inicio, min(inicio + bloque, rango.stop))
+            mascara = np.array(tensor.presente[:, tramo])
+            x = tensor.conteos[:, tramo].sum(axis=2, dtype=np.int64).astype(np.float64)
+            if perfil is not None:
+                esperado = perfil[:, slot_of(tensor.horas[tramo])]
+                mascara &= ~np.isnan(esperado)
+                x -= np.nan_to_num(esperado)
+            # Restar una constante por estación no cambia r y evita perder
+            # precisión en las sumas de cuadrados
+            if desplazamiento is None:
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    desplazamiento = np.nan_to_num((x * mascara).sum(axis=1) / mascara.sum(axis=1))
+            m = mascara.astype(np.float64)
+            x = (x - desplazamiento[:, None]) * m
+
+            n += m @ m.T
+            sx += x @ m.T
+            sxx += (x * x) @ m.T
+            sxy += x @ x.T
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            covarianza = n * sxy - sx * sx.T
+            varianzas = (n * sxx - sx * sx) * (n * sxx - sx * sx).T
+            r = covarianza / np.sqrt(varianzas)
+        r[(n < min_comunes) | ~(varianzas > 0)] = np.nan
+        r = np.clip(r, -1, 1)
+        np.fill_diagonal(r, np.where(np.diag(n) >= min_comunes, 1.0, np.nan))
+        return cls(np.asarray(tensor.estaciones), r.astype(np.float32), n.astype(np.int64))
+
+    # -----------------------------------------
+    # Consultas
+    # -----------------------------------------
+    def valid(self):
+        """Índices de las estaciones con correlación con al menos otra estación."""
+        validas = np.isfinite(self.r)
+        np.fill_diagonal(validas, False)
+        return np.flatnonzero(validas.any(axis=1))
+
+    def cluster_order(self, indices=None):
+        """Orden de ``indices`` (por defecto ``valid()``) por agrupamiento jerárquico."""
+        indices = self.valid() if indices is None else np.asarray(indices)
+        distancia = 1.0 - np.nan_to_num(self.r[np.ix_(indices, indices)].astype(np.float64), nan=0.0)
+        return indices[_average_linkage_order(distancia)]
+
+    def top_pairs(self, k=20):
+        """Los ``k`` pares de estaciones más correlacionados."""
+        filas, columnas = np.triu_indices(len(self.estaciones), 1)
+        r = self.r[filas, columnas]
+        validos = np.isfinite(r)
+        filas, columnas, r = filas[validos], columnas[validos], r[validos]
+        orden = np.argsort(-r, kind='stable')[:k]
+        return pd.DataFrame({
+            'Estacion_A': self.estaciones[filas[orden]],
+            'Estacion_B': self.estaciones[columnas[orden]],
+            'r': r[orden],
+            'Horas_comunes': self.n[filas[orden], columnas[orden]],
+        })
+
+
+def _average_linkage_order(distancia):
+    """Orden de las hojas del dendrograma de enlace medio (UPGMA)."""
+    distancia = distancia.copy()
+    np.fill_diagonal(distancia, np.inf)
+    grupos = [[i] for i in range(len(distancia))]
+    tamanos = np.ones(len(distancia))
+    activos = np.ones(len(distancia), dtype=bool)
+
+    for _ in range(len(distancia) - 1):
+        a, b = np.unravel_index(np.argmin(distancia), distancia.shape)
+        a, b = min(a, b), max(a, b)
+        # Distancia media del grupo unido a los demás, ponderada por tamaño
+        nueva = (distancia[a] * tamanos[a] + distancia[b] * tamanos[b]) / (tamanos[a] + tamanos[b])
+        distancia[a], distancia[:, a] = nueva, nueva
+        distancia[a, a] = np.inf
+        distancia[b], distancia[:, b] = np.inf, np.inf
+        grupos[a] = grupos[a] + grupos[b]
+        tamanos[a] += tamanos[b]
+        activos[b] = False
+    return np.array(grupos[int(np.flatnonzero(activos)[0])] if len(distancia) else [], dtype=np.int64)
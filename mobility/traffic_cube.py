@@ -0,0 +1,198 @@
+"""Cubo preagregado de tráfico: estación x año x mes x día de la semana x hora.
+
+Cada celda guarda el número de registros horarios, la suma y la suma de
+cuadrados de ``Total_Vehiculos`` y la suma de vehículos pesados. Con esos
+estadísticos suficientes cualquier gráfico de la página de tráfico se obtiene
+recortando el cubo y sumando ejes, sin volver a agrupar las filas originales.
+"""
+import calendar
+
+import numpy as np
+import pandas as pd
+
+EJES = ('estacion', 'anio', 'mes', 'dia_semana', 'hora')
+ETIQUETAS_HORA = np.array([f"{h:02d}:00" for h in range(25)], dtype=object)
+NOMBRES_DIA = list(calendar.day_name)
+
+_CAMPOS = ('conteo', 'suma', 'suma_cuadrados', 'pesados')
+
+# Atributo con las coordenadas de cada eje
+_COORDENADAS = {
+    'estacion': 'estaciones', 'anio': 'anios', 'mes': 'meses',
+    'dia_semana': 'dias_semana', 'hora': 'horas',
+}
+
+
+def date_parts(fecha):
+    """Año, mes (1-12) y día de la semana (lunes=0) de un array datetime64[D]."""
+    meses = fecha.astype('datetime64[M]').astype(np.int64)
+    dias = fecha.astype('datetime64[D]').astype(np.int64)
+    # El 1 de enero de 1970 fue jueves
+    return meses // 12 + 1970, meses % 12 + 1, (dias + 3) % 7
+
+
+def period_bounds(anio, mes=None):
+    """Inicio y fin (excluido) de un año o de un mes concreto, como datetime64[D]."""
+    if mes is None:
+        return np.datetime64(f"{anio:04d}-01-01"), np.datetime64(f"{anio + 1:04d}-01-01")
+    inicio = np.datetime64(f"{anio:04d}-{int(mes):02d}", 'M')
+    return inicio.astype('datetime64[D]'), (inicio + 1).astype('datetime64[D]')
+
+
+class TrafficCube:
+    """Estadísticos suficientes de ``Total_Vehiculos`` por celda del cubo."""
+
+    def __init__(self, estaciones, anios, conteo, suma, suma_cuadrados, pesados):
+        self.estaciones = np.asarray(estaciones)
+        self.anios = np.asarray(anios)
+        self.meses = np.arange(1, 13)
+        self.dias_semana = np.arange(7)
+        self.horas = np.arange(1, 25)
+        self.conteo = conteo
+        self.suma = suma
+        self.suma_cuadrados = suma_cuadrados
+        self.pesados = pesados
+
+    # -----------------------------------------
+    # Construcción y persistencia
+    # -----------------------------------------
+    @classmethod
+    def build(cls, estacion, fecha, hora, carriles, columnas_carriles):
+        """Construye el cubo a partir de las columnas del almacén."""
+        estaciones, i_estacion = np.unique(estacion, return_inverse=True)
+        anio, mes, dia_semana = date_parts(fecha)
+        anios, i_anio = np.unique(anio, return_inverse=True)
+
+        total = carriles.sum(axis=1, dtype=np.int64)
+        es_pesado = np.array(['pesados' in c.lower() for c in columnas_carriles], dtype=bool)
+        pesados = carriles[:, es_pesado].sum(axis=1, dtype=np.int64)
+
+        forma = (len(estaciones), len(anios), 12, 7, 24)
+        celda = np.ravel_multi_index((i_estacion, i_anio, mes - 1, dia_semana, hora.astype(np.int64) - 1), forma)
+        tamano = int(np.prod(forma))
+
+        def acumular(pesos, dtype):
+            # bincount suma en float64, exacto para enteros por debajo de 2**53
+            return np.bincount(celda, weights=pesos, minlength=tamano).astype(dtype).reshape(forma)
+
+        return cls(
+            estaciones,
+            anios,
+            np.bincount(celda, minlength=tamano).astype(np.uint16).reshape(forma),
+            acumular(total, np.int32),
+            acumular(total.astype(np.float64) ** 2, np.int64),
+            acumular(pesados, np.int32),
+        )
+
+    def save(self, ruta):
+        np.savez(
+            ruta,
+            estaciones=self.estaciones, anios=self.anios, conteo=self.conteo,
+            suma=self.suma, suma_cuadrados=self.suma_cuadrados, pesados=self.pesados,
+        )
+
+    def merge(self, otro, signo=1):
+        """Suma las celdas de ``otro`` (o las resta con ``signo=-1``) alineando ejes.
+
+        Las estaciones y años que se quedan sin registros desaparecen del cubo.
+        """
+        estaciones = np.union1d(self.estaciones, otro.estaciones)
+        anios = np.union1d(self.anios, otro.anios)
+        forma = (len(estaciones), len(anios), 12, 7, 24)
+
+        campos = {}
+        for campo in _CAMPOS:
+            acumulado = np.zeros(forma, dtype=np.int64)
+            for cubo, factor in ((self, 1), (otro, signo)):
+                celdas = np.ix_(np.searchsorted(estaciones, cubo.estaciones), np.searchsorted(anios, cubo.anios))
+                acumulado[celdas] += factor * getattr(cubo, campo).astype(np.int64)
+            campos[campo] = acumulado
+        if (campos['conteo'] < 0).any():
+            raise ValueError("cannot subtract cells that were never added")
+
+        conteo = campos['conteo']
+        con_estacion = conteo.any(axis=(1, 2, 3, 4))
+        con_anio = conteo.any(axis=(0, 2, 3, 4))
+        return TrafficCube(estaciones[con_estacion], anios[con_anio], *(
+            campos[campo][con_estacion][:, con_anio].astype(getattr(self, campo).dtype) for campo in _CAMPOS
+        ))
+
+    def subtract(self, otro):
+        """Retira la contribución de ``otro``."""
+        return self.merge(otro, signo=-1)
+
+    @classmethod
+    def load(cls, ruta):
+        with np.load(ruta) as datos:
+            return cls(
+                datos['estaciones'], datos['anios'], datos['conteo'],
+                datos['suma'], datos['suma_cuadrados'], datos['pesados'],
+            )
+
+    # -----------------------------------------
+    # Consultas
+    # -----------------------------------------
+    def coords(self, eje):
+        return getattr(self, _COORDENADAS[eje])
+
+    def select(self, **filtros):
+        """Recorta el cubo; cada filtro es un valor o una lista de valores del eje."""
+        cubo = self
+        for eje, valores in filtros.items():
+            if valores is None:
+                continue
+            coordenadas = cubo.coords(eje)
+            valores = np.atleast_1d(np.asarray(valores))
+            indices = np.flatnonzero(np.isin(coordenadas, valores))
+            cubo = cubo._take(EJES.index(eje), indices)
+        return cubo
+
+    def _take(self, eje, indices):
+        nuevo = TrafficCube.__new__(TrafficCube)
+        nuevo.__dict__.update(self.__dict__)
+        nombre = EJES[eje]
+        setattr(nuevo, _COORDENADAS[nombre], self.coords(nombre)[indices])
+        for campo in _CAMPOS:
+            setattr(nuevo, campo, np.take(getattr(self, campo), indices, axis=eje))
+        return nuevo
+
+    def reduce(self, por=()):
+        """Agrega sobre los ejes que no están en ``por``.
+
+        Devuelve un DataFrame con una fila por combinación con datos y las
+        columnas ``count``, ``sum``, ``mean``, ``std`` (muestral, como pandas)
+        y ``pesados``.
+        """
+        por = tuple(por)
+        resto = tuple(i for i, eje in enumerate(EJES) if eje not in por)
+        orden = [EJES.index(eje) for eje in por]
+
+        def agregar(valores):
+            return np.transpose(valores.sum(axis=resto, dtype=np.int64), np.argsort(np.argsort(orden)))
+
+        conteo = agregar(self.conteo)
+        suma = agregar(self.suma)
+        suma_cuadrados = agregar(self.suma_cuadrados)
+        pesados = agregar(self.pesados)
+
+        if not por:
+            conteo, suma, suma_cuadrados, pesados = (np.reshape(a, 1) for a in (conteo, suma, suma_cuadrados, pesados))
+        hay_datos = conteo > 0
+        indices = np.nonzero(hay_datos)
+        tabla = pd.DataFrame({eje: self.coords(eje)[idx] for eje, idx in zip(por, indices)})
+
+        n = conteo[hay_datos].astype(np.float64)
+        s = suma[hay_datos].astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            varianza = (suma_cuadrados[hay_datos] - s * s / n) / (n - 1)
+        tabla['count'] = conteo[hay_datos]
+        tabla['sum'] = suma[hay_datos]
+        tabla['mean'] = s / n
+        tabla['std'] = np.sqrt(np.maximum(varianza, 0))
+        tabla.loc[n < 2, 'std'] = np.nan
+        tabla['pesados'] = pesados[hay_datos]
+        return tabla
+
+    def total(self):
+        """Número total de vehículos del recorte."""
+        return int(self.suma.sum(dtype=np.int64))
@@ -0,0 +1,117 @@
+"""Previsión horaria de tráfico para todas las estaciones a la vez.
+
+Modelo por estación: ``y = perfil[franja] + pendiente * t``, con un nivel
+propio para cada franja día de la semana x hora (168 franjas) y una tendencia
+lineal común (``t`` en años). Es una regresión con efectos fijos por franja,
+así que no hace falta resolver un sistema de 169 incógnitas por estación: la
+pendiente sale de las sumas dentro de cada franja y el perfil, de las medias
+corregidas por la tendencia.
+
+Esas sumas se obtienen para todas las estaciones con productos de matrices
+sobre la matriz estación x hora del tensor (pesos 0 donde no hay registro o
+la hora se excluye, p. ej. por anómala). Los intervalos usan la desviación
+típica de los residuos de cada estación y franja más la incertidumbre de la
+pendiente.
+"""
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from mobility.traffic_anomaly import FRANJAS, slot_of
+
+HORAS_ANIO = 24 * 365.25
+NIVEL = 0.95
+
+
+def _design(horas, origen):
+    """Tiempo en años desde ``origen`` y matriz indicadora hora x franja."""
+    t = (np.asarray(horas, dtype=np.float64) - origen) / HORAS_ANIO
+    indicadora = np.zeros((len(horas), FRANJAS))
+    indicadora[np.arange(len(horas)), slot_of(horas)] = 1.0
+    return t, indicadora
+
+
+class SeasonalForecast:
+    """Parámetros ajustados (estación x franja) y su evaluación en horas futuras."""
+
+    def __init__(self, estaciones, origen, ultima_hora, perfil, pendiente, sigma, t_medio, var_pendiente):
+        self.estaciones = np.asarray(estaciones)
+        self.origen = float(origen)
+        self.ultima_hora = int(ultima_hora)
+        self.perfil = perfil
+        self.pendiente = pendiente
+        self.sigma = sigma
+        self.t_medio = t_medio
+        self.var_pendiente = var_pendiente
+
+    @classmethod
+    def fit(cls, tensor, excluir=None):
+        """Ajusta el modelo de todas las estaciones del ``TrafficTensor``.
+
+        ``excluir`` es una máscara estación x hora opcional de horas que no
+        deben entrar en el ajuste.
+        """
+        horas = np.asarray(tensor.horas)
+        origen = float(horas.mean()) if len(horas) else 0.0
+        t, indicadora = _design(horas, origen)
+
+        pesos = np.asarray(tensor.presente, dtype=np.float64)
+        if excluir is not None:
+            pesos = pesos * ~np.asarray(excluir)
+        y = pesos * tensor.conteos.sum(axis=2, dtype=np.int64)
+
+        # Sumas por estación y franja
+        n = pesos @ indicadora
+        suma_t = (pesos * t) @ indicadora
+        suma_y = y @ indicadora
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t_medio = suma_t / n
+            sxx = (pesos * t * t).sum(axis=1) - np.nansum(suma_t * t_medio, axis=1)
+            sxy = (y * t).sum(axis=1) - np.nansum(t_medio * suma_y, axis=1)
+            pendiente = np.where(sxx > 1e-12, sxy / sxx, 0.0)
+            perfil = (suma_y - pendiente[:, None] * suma_t) / n
+
+            # Residuos: desviación por franja y varianza conjunta para la pendiente
+            residuo = pesos * (y - np.nan_to_num(perfil)[:, slot_of(horas)] - pendiente[:, None] * t)
+            cuadrados = (residuo * residuo) @ indicadora
+            sigma = np.sqrt(cuadrados / (n - 1))
+            sigma[n < 2] = np.nan
+            libertad = pesos.sum(axis=1) - (n > 0).sum(axis=1) - 1
+            var_pendiente = np.where((libertad > 0) & (sxx > 1e-12), cuadrados.sum(axis=1) / libertad / sxx, np.nan)
+
+        return cls(tensor.estaciones, origen, horas[-1] if len(horas) else 0, perfil, pendiente, sigma,
+                   t_medio, var_pendiente)
+
+    # -----------------------------------------
+    # Previsiones
+    # -----------------------------------------
+    def future_hours(self, semanas=1):
+        """Horas absolutas (desde 1970) de las ``semanas`` siguientes al histórico."""
+        return self.ultima_hora + 1 + np.arange(int(semanas) * FRANJAS)
+
+    def predict(self, estacion, horas, nivel=NIVEL):
+        """Previsión e intervalo de una estación en horas absolutas (no negativos)."""
+        fila = int(np.searchsorted(self.estaciones, estacion))
+        horas = np.asarray(horas, dtype=np.int64)
+        franjas = slot_of(horas)
+        t = (horas - self.origen) / HORAS_ANIO
+
+        prevision = self.perfil[fila, franjas] + self.pendiente[fila] * t
+        varianza = self.sigma[fila, franjas] ** 2 \
+            + (t - self.t_medio[fila, franjas]) ** 2 * np.nan_to_num(self.var_pendiente[fila])
+        margen = NormalDist().inv_cdf(0.5 + nivel / 2) * np.sqrt(varianza)
+        return pd.DataFrame({
+            'Fecha_Hora': horas.astype('datetime64[h]'),
+            'Prevision': np.maximum(prevision, 0),
+            'Inferior': np.maximum(prevision - margen, 0),
+            'Superior': np.maximum(prevision + margen, 0),
+        })
+
+    def weekly_totals(self, semanas=1):
+        """Vehículos previstos por estación en las ``semanas`` siguientes (todas a la vez)."""
+        horas = self.future_hours(semanas)
+        t = (horas - self.origen) / HORAS_ANIO
+        prevision = self.perfil[:, slot_of(horas)] + self.pendiente[:, None] * t
+        return pd.Series(np.maximum(prevision, 0).sum(axis=1, where=~np.isnan(prevision)),
+                         index=pd.Index(self.estaciones, name='Estacion'), name='Prevision')
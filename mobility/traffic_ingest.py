@@ -0,0 +1,58 @@
+"""Lectura en paralelo de los ficheros semanales de tráfico.
+
+Los ficheros se reparten entre varios procesos, pero nunca hay más de
+``procesos`` ficheros en vuelo a la vez, y los resultados se entregan en el
+mismo orden en que se pidieron. Así la memoria depende del número de
+procesos y no del número de semanas, y el resultado es idéntico al de la
+lectura secuencial.
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from mobility.traffic_parser import parse_datosvolumen
+
+
+def _parse_safe(ruta):
+    """Lee un fichero devolviendo ``(datos, None)`` o ``(None, mensaje)``."""
+    try:
+        return parse_datosvolumen(ruta), None
+    except Exception as e:
+        return None, str(e)
+
+
+def default_workers():
+    """Número de procesos por defecto: los núcleos disponibles."""
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return max(1, os.cpu_count() or 1)
+
+
+def iter_parsed(rutas, procesos=None):
+    """Genera ``(ruta, datos, error)`` para cada fichero, en el orden de ``rutas``."""
+    rutas = list(rutas)
+    procesos = default_workers() if procesos is None else procesos
+    procesos = min(procesos, len(rutas))
+
+    if procesos <= 1:
+        for ruta in rutas:
+            yield (ruta, *_parse_safe(ruta))
+        return
+
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        pendientes = deque()
+        siguientes = iter(rutas)
+        for ruta in siguientes:
+            pendientes.append((ruta, pool.submit(_parse_safe, ruta)))
+            if len(pendientes) >= procesos:
+                break
+
+        while pendientes:
+            ruta, futuro = pendientes.popleft()
+            datos, error = futuro.result()
+            # Se lanza el siguiente fichero antes de entregar este resultado
+            for nueva in siguientes:
+                pendientes.append((nueva, pool.submit(_parse_safe, nueva)))
+                break
+            yield ruta, datos, error
@@ -0,0 +1,243 @@
+"""Lector específico de los ficheros semanales ``*_datosvolumen.csv``.
+
+Todas las filas de datos tienen el mismo ancho
+(``00001 ; 03/05/2021 ; 01:00 ; 00008 ; ...``), así que el fichero se lee
+como bytes, se ve como una matriz ``filas x ancho`` y cada campo se decodifica
+con aritmética de dígitos en NumPy, sin pasar por ``pd.read_csv``. Si algún
+fichero no respeta ese formato se usa el lector genérico de pandas.
+"""
+import numpy as np
+import pandas as pd
+
+SEPARADOR = ord(';')
+CERO = ord('0')
+FIN_LINEA = ord('\n')
+BOM_UTF8 = b'\xef\xbb\xbf'
+
+COLUMNAS_BASE = ['Estacion', 'Fecha', 'Hora']
+
+
+def parse_datosvolumen(ruta):
+    """Devuelve las columnas de un fichero semanal como arrays tipados.
+
+    El resultado es un diccionario con ``estacion`` (int32), ``fecha``
+    (datetime64[D]), ``hora`` (int8, 1-24), ``carriles`` (int32, filas x
+    carriles) y ``columnas_carriles`` (nombres de la cabecera).
+    """
+    with open(ruta, 'rb') as f:
+        crudo = f.read()
+
+    cabecera, cuerpo = _split_header(crudo)
+    nombres = _decode_header(cabecera)
+    if not all(col in nombres for col in COLUMNAS_BASE):
+        raise ValueError("missing columns 'Estacion', 'Fecha' or 'Hora'")
+
+    bloque = _fixed_width_block(cuerpo)
+    if bloque is None or bloque.shape[0] == 0:
+        return _parse_generic(ruta)
+
+    separadores = np.flatnonzero(bloque[0] == SEPARADOR)
+    if len(separadores) != len(nombres) - 1 or not (bloque[:, separadores] == SEPARADOR).all():
+        return _parse_generic(ruta)
+
+    # Límites [inicio, fin) de cada campo dentro de la línea
+    inicios = np.concatenate([[0], separadores + 1])
+    finales = np.concatenate([separadores, [bloque.shape[1] - 1]])
+    rangos = {nombre: (int(i), int(j)) for nombre, i, j in zip(nombres, inicios, finales)}
+
+    # Fecha y hora se dividen en subcampos numéricos de posición fija
+    try:
+        rangos.update(_split_subfields(bloque, 'dia', 'mes', 'anio', rangos.pop('Fecha'), ord('/')))
+        rangos.update(_split_subfields(bloque, 'hora', 'minuto', None, rangos.pop('Hora'), ord(':')))
+    except ValueError:
+        return _parse_generic(ruta)
+
+    valores, validos = _decode_integers(bloque, rangos)
+
+    columnas_carriles = [n for n in nombres if 'ligeros' in n.lower() or 'pesados' in n.lower()]
+    carriles = np.empty((bloque.shape[0], len(columnas_carriles)), dtype=np.int32)
+    for j, nombre in enumerate(columnas_carriles):
+        # Igual que pd.to_numeric(errors='coerce').fillna(0)
+        carriles[:, j] = np.where(validos[nombre], valores[nombre], 0)
+
+    dia, mes, anio = valores['dia'], valores['mes'], valores['anio']
+    fecha_ok = validos['dia'] & validos['mes'] & validos['anio'] & (mes >= 1) & (mes <= 12) & (dia >= 1) & (dia <= 31)
+    meses = np.where(fecha_ok, (anio - 1970) * 12 + (mes - 1), 0)
+    fecha = meses.astype('datetime64[M]').astype('datetime64[D]') + np.where(fecha_ok, dia - 1, 0)
+
+    estacion, hora = valores['Estacion'], valores['hora']
+
+    # Las filas sin estación, fecha u hora válidas se descartan (equivale al dropna)
+    filas_ok = validos['Estacion'] & fecha_ok & validos['hora']
+    if not filas_ok.all():
+        estacion, fecha, hora, carriles = estacion[filas_ok], fecha[filas_ok], hora[filas_ok], carriles[filas_ok]
+
+    return {
+        'estacion': estacion.astype(np.int32),
+        'fecha': fecha,
+        'hora': hora.astype(np.int8),
+        'carriles': carriles,
+        'columnas_carriles': columnas_carriles,
+    }
+
+
+# =============================================
+# CABECERA Y BLOQUE DE ANCHO FIJO
+# =============================================
+def _split_header(crudo):
+    """Separa la línea de cabecera del resto, quitando BOM y retornos de carro.
+
+    El cuerpo se devuelve como array de bytes que comparte memoria con ``crudo``.
+    """
+    if crudo.startswith(BOM_UTF8):
+        crudo = crudo[len(BOM_UTF8):]
+    if b'\r' in crudo:
+        crudo = crudo.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+
+    fin = crudo.find(b'\n')
+    if fin < 0:
+        return crudo, np.empty(0, dtype=np.uint8)
+    return crudo[:fin], np.frombuffer(crudo, dtype=np.uint8, offset=fin + 1)
+
+
+def _decode_header(cabecera):
+    """Nombres de columna; la cabecera puede venir en UTF-8 o en latin1."""
+    try:
+        texto = cabecera.decode('utf-8')
+    except UnicodeDecodeError:
+        texto = cabecera.decode('latin1')
+    return [nombre.strip() for nombre in texto.split(';')]
+
+
+def _fixed_width_block(cuerpo):
+    """Vista ``filas x ancho`` de los bytes, o ``None`` si el ancho no es fijo."""
+    fin = len(cuerpo)
+    while fin > 0 and cuerpo[fin - 1] == FIN_LINEA:
+        fin -= 1
+    if fin == 0:
+        return np.empty((0, 0), dtype=np.uint8)
+
+    # Se conserva un único salto de línea final (se añade si falta)
+    if fin < len(cuerpo):
+        cuerpo = cuerpo[:fin + 1]
+    else:
+        cuerpo = np.append(cuerpo, np.uint8(FIN_LINEA))
+
+    saltos = np.flatnonzero(cuerpo[:4096] == FIN_LINEA)
+    ancho = int(saltos[0]) + 1 if len(saltos) else int(np.argmax(cuerpo == FIN_LINEA)) + 1
+    if len(cuerpo) % ancho != 0:
+        return None
+
+    bloque = cuerpo.reshape(-1, ancho)
+    if not (bloque[:, -1] == FIN_LINEA).all():
+        return None
+    return bloque
+
+
+# =============================================
+# DECODIFICACIÓN DE CAMPOS
+# =============================================
+def _split_subfields(bloque, primero, segundo, tercero, rango, marca):
+    """Divide un campo por ``marca`` (``/`` o ``:``) en subcampos numéricos."""
+    inicio, fin = rango
+    posiciones = inicio + np.flatnonzero(bloque[0, inicio:fin] == marca)
+    nombres = [n for n in (primero, segundo, tercero) if n is not None]
+    if len(posiciones) != len(nombres) - 1 or not (bloque[:, posiciones] == marca).all():
+        raise ValueError("unexpected field layout")
+
+    cortes = [inicio] + [int(p) for p in posiciones] + [fin]
+    return {
+        nombre: (cortes[k] + (1 if k > 0 else 0), cortes[k + 1])
+        for k, nombre in enumerate(nombres)
+    }
+
+
+def _decode_integers(bloque, rangos):
+    """Decodifica de una vez todos los campos enteros rodeados de espacios.
+
+    Cada dígito se multiplica por la potencia de diez que le corresponde según
+    los dígitos que tiene a su derecha dentro del campo. Devuelve dos
+    diccionarios ``nombre -> array``: valores y máscara de valores válidos.
+    """
+    digitos = bloque - np.uint8(CERO)   # los bytes no numéricos quedan > 9
+    potencias = 10 ** np.arange(10, dtype=np.int64)
+
+    # Caso habitual: todas las líneas tienen los dígitos en las mismas posiciones
+    # (campos con ceros a la izquierda). Entonces cada campo es un producto
+    # escalar fijo y todos se resuelven con una sola multiplicación de matrices.
+    digito_fila0 = digitos[0] <= 9
+    columnas = np.flatnonzero(digito_fila0)
+    otras = np.flatnonzero(~digito_fila0)
+    trozo = digitos[:, columnas]
+    if (trozo <= 9).all() and (bloque[:, otras] == bloque[0, otras]).all():
+        pesos = np.zeros((bloque.shape[1], len(rangos)), dtype=np.float32)
+        validos_fila = {}
+        for k, (nombre, (inicio, fin)) in enumerate(rangos.items()):
+            posiciones = inicio + np.flatnonzero(digito_fila0[inicio:fin])
+            pesos[posiciones, k] = potencias[len(posiciones) - 1::-1] if len(posiciones) else []
+            resto = bloque[0, inicio:fin][~digito_fila0[inicio:fin]]
+            validos_fila[nombre] = len(posiciones) > 0 and (resto == ord(' ')).all()
+
+        # float32 es exacto hasta 2**24; con campos más largos se pasa a float64
+        if pesos.max(initial=0) >= 1e7:
+            pesos = pesos.astype(np.float64)
+        suma = (trozo.astype(pesos.dtype) @ pesos[columnas]).astype(np.int64)
+        n = bloque.shape[0]
+        return (
+            {nombre: suma[:, k] for k, nombre in enumerate(rangos)},
+            {nombre: np.full(n, validos_fila[nombre]) for nombre in rangos},
+        )
+
+    # Caso general: los campos del mismo ancho se apilan y se decodifican juntos
+    valores, validos = {}, {}
+    por_ancho = {}
+    for nombre, (inicio, fin) in rangos.items():
+        por_ancho.setdefault(fin - inicio, []).append(nombre)
+
+    for ancho, nombres in por_ancho.items():
+        indices = np.array([np.arange(rangos[n][0], rangos[n][0] + ancho) for n in nombres])
+        trozo = digitos[:, indices]
+        es_digito = trozo <= 9
+        es_espacio = bloque[:, indices] == ord(' ')
+
+        a_la_derecha = np.cumsum(es_digito[..., ::-1], axis=-1, dtype=np.int8)[..., ::-1] - 1
+        suma = (np.where(es_digito, trozo, 0) * potencias[np.maximum(a_la_derecha, 0)]).sum(axis=-1)
+        ok = (es_digito | es_espacio).all(axis=-1) & es_digito.any(axis=-1)
+
+        for k, nombre in enumerate(nombres):
+            valores[nombre] = suma[:, k]
+            validos[nombre] = ok[:, k]
+    return valores, validos
+
+
+# =============================================
+# LECTOR GENÉRICO (FICHEROS FUERA DE FORMATO)
+# =============================================
+def _parse_generic(ruta):
+    """Lectura con pandas para ficheros que no tienen ancho fijo."""
+    try:
+        df = pd.read_csv(ruta, delimiter=";", encoding='utf-8')
+    except UnicodeDecodeError:
+        df = pd.read_csv(ruta, delimiter=";", encoding='latin1')
+    df.columns = [str(col).strip() for col in df.columns]
+
+    if not all(col in df.columns for col in COLUMNAS_BASE):
+        raise ValueError("missing columns 'Estacion', 'Fecha' or 'Hora'")
+
+    columnas_carriles = [col for col in df.columns if 'ligeros' in col.lower() or 'pesados' in col.lower()]
+    estacion = pd.to_numeric(df['Estacion'], errors='coerce')
+    fecha = pd.to_datetime(df['Fecha'].astype(str).str.strip(), dayfirst=True, errors='coerce')
+    hora = pd.to_numeric(df['Hora'].astype(str).str.split(':').str[0], errors='coerce')
+    df = df[estacion.notna() & fecha.notna() & hora.notna()]
+
+    carriles = np.empty((len(df), len(columnas_carriles)), dtype=np.int32)
+    for j, col in enumerate(columnas_carriles):
+        carriles[:, j] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(np.int32)
+
+    return {
+        'estacion': estacion[df.index].to_numpy(dtype=np.int32),
+        'fecha': fecha[df.index].to_numpy().astype('datetime64[D]'),
+        'hora': hora[df.index].to_numpy(dtype=np.int8),
+        'carriles': carriles,
+        'columnas_carriles': columnas_carriles,
+    }
@@ -0,0 +1,149 @@
+"""Bocetos de cuantiles de ``Total_Vehiculos`` por estación y mes.
+
+Cada boceto es un histograma con cubetas de tamaño geométrico (como
+DDSketch): la cubeta ``i`` recoge los valores de ``(GAMMA**(i-1), GAMMA**i]``
+y se representa por un valor con error relativo menor que ``ALFA``. La cubeta
+0 se reserva para las horas sin vehículos. Como los bocetos son conteos,
+combinar meses o estaciones es sumar, y retirar una semana es restar, igual
+que en el cubo.
+
+Se guardan en forma dispersa, ordenados por (estación, mes, cubeta), de modo
+que los bocetos de una estación son un tramo contiguo que se localiza por
+bisección.
+"""
+import numpy as np
+import pandas as pd
+
+from mobility.traffic_cube import date_parts
+
+ALFA = 0.01
+GAMMA = (1 + ALFA) / (1 - ALFA)
+_LOG_GAMMA = np.log(GAMMA)
+
+_CAMPOS = ('estacion', 'mes', 'cubeta', 'conteo')
+
+
+def bucket_of(valores):
+    """Cubeta de cada valor (0 para los ceros)."""
+    valores = np.asarray(valores, dtype=np.float64)
+    cubetas = np.zeros(valores.shape, dtype=np.int16)
+    positivos = valores > 0
+    cubetas[positivos] = 1 + np.ceil(np.log(valores[positivos]) / _LOG_GAMMA - 1e-9).astype(np.int16)
+    return cubetas
+
+
+def bucket_value(cubetas):
+    """Valor representativo de cada cubeta."""
+    cubetas = np.asarray(cubetas, dtype=np.float64)
+    return np.where(cubetas > 0, 2 * GAMMA ** (cubetas - 1) / (GAMMA + 1), 0.0)
+
+
+class QuantileSketches:
+    """Histogramas geométricos por (estación, mes absoluto)."""
+
+    def __init__(self, estacion, mes, cubeta, conteo):
+        self.estacion = estacion
+        self.mes = mes
+        self.cubeta = cubeta
+        self.conteo = conteo
+
+    # -----------------------------------------
+    # Construcción, combinación y persistencia
+    # -----------------------------------------
+    @classmethod
+    def build(cls, estacion, fecha, hora, carriles, columnas_carriles):
+        """Bocetos a partir de las columnas del almacén (misma firma que el cubo)."""
+        anio, mes, _ = date_parts(fecha)
+        total = carriles.sum(axis=1, dtype=np.int64)
+        return cls._aggregate(
+            np.asarray(estacion, dtype=np.int32),
+            ((anio - 1970) * 12 + mes - 1).astype(np.int32),
+            bucket_of(total),
+            np.ones(len(total), dtype=np.int64),
+        )
+
+    @classmethod
+    def _aggregate(cls, estacion, mes, cubeta, conteo):
+        """Suma los conteos de las entradas repetidas y quita las que quedan a cero."""
+        orden = np.lexsort((cubeta, mes, estacion))
+        estacion, mes, cubeta, conteo = estacion[orden], mes[orden], cubeta[orden], conteo[orden]
+        nueva = np.ones(len(orden), dtype=bool)
+        nueva[1:] = (np.diff(estacion) != 0) | (np.diff(mes) != 0) | (np.diff(cubeta) != 0)
+        inicios = np.flatnonzero(nueva)
+        conteo = np.add.reduceat(conteo, inicios) if len(inicios) else conteo
+        if (conteo < 0).any():
+            raise ValueError("cannot subtract sketch counts that were never added")
+        quedan = conteo > 0
+        return cls(estacion[inicios][quedan], mes[inicios][quedan], cubeta[inicios][quedan], conteo[quedan])
+
+    def merge(self, otro, signo=1):
+        """Suma (o resta con ``signo=-1``) los bocetos de ``otro``."""
+        return QuantileSketches._aggregate(
+            np.concatenate([self.estacion, otro.estacion]),
+            np.concatenate([self.mes, otro.mes]),
+            np.concatenate([self.cubeta, otro.cubeta]),
+            np.concatenate([self.conteo, signo * otro.conteo]),
+        )
+
+    def subtract(self, otro):
+        return self.merge(otro, signo=-1)
+
+    def save(self, ruta):
+        np.savez(ruta, **{campo: getattr(self, campo) for campo in _CAMPOS})
+
+    @classmethod
+    def load(cls, ruta):
+        with np.load(ruta) as datos:
+            return cls(*(datos[campo] for campo in _CAMPOS))
+
+    # -----------------------------------------
+    # Consultas
+    # -----------------------------------------
+    def stations(self):
+        return np.unique(self.estacion)
+
+    def histogram(self, estacion, anio=None, mes=None):
+        """Conteo por cubeta de una estación, combinando los meses pedidos.
+
+        ``anio`` y ``mes`` (1-12) aceptan un valor o una lista de valores.
+        """
+        inicio, fin = np.searchsorted(self.estacion, [estacion, estacion + 1])
+        meses, cubetas, conteos = self.mes[inicio:fin], self.cubeta[inicio:fin], self.conteo[inicio:fin]
+        if anio is not None or mes is not None:
+            elegidos = np.ones(len(meses), dtype=bool)
+            if anio is not None:
+                elegidos &= np.isin(meses // 12 + 1970, np.atleast_1d(anio))
+            if mes is not None:
+                elegidos &= np.isin(meses % 12 + 1, np.atleast_1d(mes))
+            cubetas, conteos = cubetas[elegidos], conteos[elegidos]
+        return np.bincount(cubetas, weights=conteos).astype(np.int64) if len(cubetas) else np.zeros(0, dtype=np.int64)
+
+    def quantiles(self, estacion, q, anio=None, mes=None):
+        """Cuantiles aproximados (error relativo < ``ALFA``); NaN si no hay datos."""
+        return _histogram_quantiles(self.histogram(estacion, anio, mes), q)
+
+    def station_quantiles(self, q, estaciones=None, anio=None, mes=None):
+        """DataFrame estación x cuantil, p. ej. para ordenar estaciones por mediana."""
+        estaciones = self.stations() if estaciones is None else np.atleast_1d(estaciones)
+        q = np.atleast_1d(q)
+        filas = [self.quantiles(e, q, anio, mes) for e in estaciones]
+        return pd.DataFrame(filas, index=pd.Index(estaciones, name='Estacion'), columns=q)
+
+
+def _histogram_quantiles(histograma, q):
+    """Cuantiles de un histograma de cubetas, interpolando entre rangos como pandas."""
+    q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+    n = int(histograma.sum())
+    if n == 0:
+        return np.full(len(q), np.nan)
+    acumulado = np.cumsum(histograma)
+    valores = bucket_value(np.arange(len(histograma)))
+
+    # Posición (base 0) de cada cuantil entre los valores ordenados
+    posicion = q * (n - 1)
+    abajo = np.floor(posicion).astype(np.int64)
+    arriba = np.minimum(abajo + 1, n - 1)
+    peso = posicion - abajo
+    v_abajo = valores[np.searchsorted(acumulado, abajo, side='right')]
+    v_arriba = valores[np.searchsorted(acumulado, arriba, side='right')]
+    return v_abajo + (v_arriba - v_abajo) * peso
@@ -0,0 +1,445 @@
+"""Almacén columnar en disco del histórico de tráfico de "Datos 2".
+
+Cada fichero semanal ``*_datosvolumen.csv`` se convierte una sola vez a
+columnas ``.npy``. Un manifiesto con nombre, tamaño y fecha de modificación
+de cada fichero permite reconstruir únicamente las semanas nuevas o
+modificadas; el resto se lee directamente del almacén. El histórico
+consolidado se guarda ya en la representación compacta de ``TrafficArchive``
+y, además, como tensor estación x hora x carril para mapearlo en memoria.
+
+Cada carpeta del almacén (``parts/<semana>``, ``archive`` y ``tensor``) es un
+enlace simbólico a su versión actual: la nueva se escribe en una carpeta única
+junto a ella y se publica cambiando el enlace de una vez, así que quien lee
+nunca ve una carpeta a medias o desaparecida. Las actualizaciones se hacen con
+un cerrojo exclusivo sobre ``.lock`` y las lecturas con uno compartido, de
+modo que varios procesos pueden sincronizar y leer el mismo almacén.
+
+``summarize_files`` resume los ficheros semanales en streaming sin pasar por
+el almacén; también como comando (desde la raíz del repositorio)::
+
+    python -m mobility.traffic_store [carpeta] [--procesos N]
+"""
+import argparse
+import fcntl
+import json
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+
+from mobility.traffic_archive import COLUMNAS, TrafficArchive
+from mobility.traffic_cube import TrafficCube
+from mobility.traffic_ingest import iter_parsed
+from mobility.traffic_sketch import QuantileSketches
+from mobility.traffic_stream import TrafficSummary, iter_chunks, iter_files, summarize
+from mobility.traffic_tensor import TrafficTensor, write_tensor
+
+CARPETA_DATOS = "Datos 2"
+CARPETA_CACHE = os.path.join("cache", "artifacts", "traffic")
+SUFIJO_SEMANAL = "_datosvolumen.csv"
+VERSION_FORMATO = 6
+
+
+# =============================================
+# MANIFIESTO Y PARTES
+# =============================================
+def _weekly_files(carpeta):
+    """Ficheros semanales de la carpeta, en orden cronológico."""
+    return sorted(f for f in os.listdir(carpeta) if f.endswith(SUFIJO_SEMANAL))
+
+
+def _file_signature(ruta):
+    info = os.stat(ruta)
+    return {'size': info.st_size, 'mtime_ns': info.st_mtime_ns}
+
+
+def _read_manifest(destino):
+    ruta = os.path.join(destino, "manifest.json")
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding='utf-8') as f:
+        manifiesto = json.load(f)
+    if manifiesto.get('version') != VERSION_FORMATO:
+        return None
+    return manifiesto
+
+
+def _write_manifest(destino, manifiesto):
+    ruta = os.path.join(destino, "manifest.json")
+    temporal = ruta + ".tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=1)
+    os.replace(temporal, ruta)
+
+
+@contextmanager
+def _store_lock(destino, compartido=False):
+    """Cerrojo del almacén: exclusivo para actualizarlo, compartido para leerlo."""
+    os.makedirs(destino, exist_ok=True)
+    with open(os.path.join(destino, ".lock"), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_SH if compartido else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _new_version(carpeta):
+    """Carpeta vacía y única, junto a ``carpeta``, para escribir su próxima versión."""
+    version = tempfile.mkdtemp(prefix=os.path.basename(carpeta) + ".", dir=os.path.dirname(carpeta))
+    # mkdtemp la crea solo para el propietario; el almacén lo leen otros procesos
+    os.chmod(version, 0o755)
+    return version
+
+
+def _publish(version, carpeta):
+    """Apunta el enlace ``carpeta`` a ``version`` de forma atómica y borra la versión anterior."""
+    anterior = os.path.realpath(carpeta) if os.path.islink(carpeta) else None
+    if os.path.isdir(carpeta) and anterior is None:
+        # Carpeta de un almacén anterior a las versiones
+        shutil.rmtree(carpeta)
+    enlace = version + ".link"
+    os.symlink(os.path.basename(version), enlace)
+    os.replace(enlace, carpeta)
+    if anterior is not None:
+        shutil.rmtree(anterior, ignore_errors=True)
+
+
+def _unpublish(carpeta):
+    """Retira el enlace ``carpeta`` y la versión a la que apunta."""
+    if os.path.islink(carpeta):
+        version = os.path.realpath(carpeta)
+        os.remove(carpeta)
+        shutil.rmtree(version, ignore_errors=True)
+    else:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+
+def _remove_orphans(carpeta):
+    """Borra las versiones a las que no apunta ningún enlace (escrituras interrumpidas)."""
+    entradas = [os.path.join(carpeta, e) for e in os.listdir(carpeta)]
+    for entrada in entradas:
+        # Enlaces sin publicar o que ya no apuntan a nada
+        if os.path.islink(entrada) and (entrada.endswith(".link") or not os.path.exists(entrada)):
+            os.remove(entrada)
+    entradas = [e for e in entradas if os.path.lexists(e)]
+    enlazadas = {os.path.realpath(e) for e in entradas if os.path.islink(e)}
+    for entrada in entradas:
+        if os.path.islink(entrada):
+            continue
+        if os.path.isdir(entrada) and os.path.basename(entrada) != "parts" and os.path.realpath(entrada) not in enlazadas:
+            shutil.rmtree(entrada, ignore_errors=True)
+
+
+def _save_arrays(carpeta_partes, arrays):
+    """Guarda cada columna como ``.npy`` en una versión nueva y la publica."""
+    version = _new_version(carpeta_partes)
+    for nombre, valores in arrays.items():
+        np.save(os.path.join(version, f"{nombre}.npy"), valores)
+    _publish(version, carpeta_partes)
+
+
+def _load_arrays(carpeta_partes, nombres=('estacion', 'fecha', 'hora', 'carriles'), mmap_mode=None):
+    return {
+        nombre: np.load(os.path.join(carpeta_partes, f"{nombre}.npy"), mmap_mode=mmap_mode)
+        for nombre in nombres
+    }
+
+
+# =============================================
+# SINCRONIZACIÓN DEL ALMACÉN
+# =============================================
+def sync_store(carpeta=CARPETA_DATOS, destino=CARPETA_CACHE, procesos=None):
+    """Actualiza el almacén con las semanas nuevas, modificadas o eliminadas.
+
+    Las semanas pendientes se leen en ``procesos`` procesos (por defecto, uno
+    por núcleo). El cubo, los bocetos de cuantiles y el resumen se mantienen
+    de forma incremental: se suma la contribución de cada semana nueva y se
+    resta la de cada semana modificada o eliminada. Devuelve la lista de
+    avisos de los ficheros que no se han podido leer.
+    """
+    os.makedirs(os.path.join(destino, "parts"), exist_ok=True)
+    with _store_lock(destino):
+        return _sync(carpeta, destino, procesos)
+
+
+def _sync(carpeta, destino, procesos):
+    previo = _read_manifest(destino)
+    manifiesto = previo or {'version': VERSION_FORMATO, 'files': {}, 'columnas_carriles': None}
+    anteriores = manifiesto['files']
+    ficheros = _weekly_files(carpeta)
+
+    avisos = []
+    actuales = {}
+    firmas = {}
+    for nombre in ficheros:
+        firma = _file_signature(os.path.join(carpeta, nombre))
+        registrada = anteriores.get(nombre)
+        if registrada is not None and registrada['size'] == firma['size'] and registrada['mtime_ns'] == firma['mtime_ns']:
+            actuales[nombre] = registrada
+        else:
+            firmas[nombre] = firma
+    desaparecidas = sorted(set(anteriores) - set(actuales) - set(firmas))
+    cambios = bool(firmas or desaparecidas)
+
+    totales = _load_totals(destino) if previo is not None and cambios else None
+    retiradas = False
+
+    # Solo se leen las semanas nuevas o modificadas, repartidas entre procesos
+    rutas = [os.path.join(carpeta, nombre) for nombre in firmas]
+    for ruta, datos, error in iter_parsed(rutas, procesos):
+        nombre = os.path.basename(ruta)
+        if nombre in anteriores:
+            # Se resta lo que aportaba la versión anterior antes de sobrescribirla
+            totales = _retract(totales, destino, nombre, manifiesto['columnas_carriles'])
+            retiradas = True
+        if error is not None:
+            avisos.append(f"Error processing {nombre}: {error}")
+            _unpublish(os.path.join(destino, "parts", nombre))
+            continue
+
+        columnas_carriles = datos.pop('columnas_carriles')
+        manifiesto['columnas_carriles'] = manifiesto['columnas_carriles'] or columnas_carriles
+        _save_arrays(os.path.join(destino, "parts", nombre), datos)
+        actuales[nombre] = dict(firmas[nombre], rows=int(len(datos['estacion'])))
+        if totales is not None:
+            totales = _fold(totales, _part_aggregates(destino, nombre, manifiesto['columnas_carriles']))
+
+    # Semanas que han desaparecido de la carpeta
+    for nombre in desaparecidas:
+        totales = _retract(totales, destino, nombre, manifiesto['columnas_carriles'])
+        retiradas = True
+        _unpublish(os.path.join(destino, "parts", nombre))
+
+    if cambios or _load_totals(destino, comprobar=True) is None:
+        nombres = [n for n in ficheros if n in actuales]
+        columnas_carriles = manifiesto['columnas_carriles'] or []
+        archivo = _consolidate(destino, nombres, columnas_carriles)
+        if totales is None:
+            # Sin agregados previos (o inservibles) se calculan sobre todo el histórico
+            totales = _build_totals(archivo, columnas_carriles)
+        elif retiradas:
+            totales = _refresh_extrema(totales, destino, nombres, columnas_carriles)
+        _save_totals(destino, totales)
+        manifiesto['files'] = actuales
+        _write_manifest(destino, manifiesto)
+        _remove_orphans(destino)
+        _remove_orphans(os.path.join(destino, "parts"))
+
+    return avisos
+
+
+def _consolidate(destino, nombres, columnas_carriles):
+    """Concatena las partes semanales en un único histórico compacto y
+    regenera a partir de él el tensor mapeable. Devuelve las columnas
+    concatenadas."""
+    partes = [_load_arrays(os.path.join(destino, "parts", n), mmap_mode='r') for n in nombres]
+    if partes:
+        archivo = {
+            clave: np.concatenate([p[clave] for p in partes])
+            for clave in ('estacion', 'fecha', 'hora', 'carriles')
+        }
+    else:
+        archivo = _empty_columns(columnas_carriles)
+    compacto = TrafficArchive.from_columns(**archivo, columnas_carriles=columnas_carriles)
+    _save_arrays(os.path.join(destino, "archive"), compacto.columns())
+    version = _new_version(os.path.join(destino, "tensor"))
+    write_tensor(compacto, version)
+    _publish(version, os.path.join(destino, "tensor"))
+    return archivo
+
+
+def _empty_columns(columnas_carriles):
+    return {
+        'estacion': np.empty(0, dtype=np.int32),
+        'fecha': np.empty(0, dtype='datetime64[D]'),
+        'hora': np.empty(0, dtype=np.int8),
+        'carriles': np.empty((0, len(columnas_carriles)), dtype=np.int32),
+    }
+
+
+# =============================================
+# AGREGADOS INCREMENTALES (CUBO, BOCETOS Y RESUMEN)
+# =============================================
+# Agregados aditivos que se construyen a partir de las columnas del almacén
+_TABLAS = (("cube.npz", TrafficCube), ("sketches.npz", QuantileSketches))
+_RESUMEN = "summary.npz"
+
+
+def _build_totals(archivo, columnas_carriles):
+    """Agregados calculados de una vez sobre unas columnas (una semana o todo el histórico)."""
+    tablas = [clase.build(**archivo, columnas_carriles=columnas_carriles) for _, clase in _TABLAS]
+    resumen = summarize(iter_chunks([dict(archivo, columnas_carriles=columnas_carriles)]))
+    return (*tablas, resumen)
+
+
+def _part_aggregates(destino, nombre, columnas_carriles):
+    """Agregados de una semana, calculados a partir de su parte."""
+    return _build_totals(_load_arrays(os.path.join(destino, "parts", nombre), mmap_mode='r'), columnas_carriles)
+
+
+def _part_summary(destino, nombre, columnas_carriles):
+    parte = _load_arrays(os.path.join(destino, "parts", nombre), mmap_mode='r')
+    parte['columnas_carriles'] = columnas_carriles
+    return summarize(iter_chunks([parte]))
+
+
+def _fold(totales, parcial):
+    if parcial[-1] is None:
+        return totales
+    *tablas, resumen = totales
+    *partes, parte_resumen = parcial
+    return (
+        *(tabla.merge(parte) for tabla, parte in zip(tablas, partes)),
+        parte_resumen if resumen is None else resumen.merge(parte_resumen),
+    )
+
+
+def _retract(totales, destino, nombre, columnas_carriles):
+    """Resta la contribución de una semana; sin su parte, obliga a reconstruir."""
+    if totales is None or not os.path.isdir(os.path.join(destino, "parts", nombre)):
+        return None
+    parcial = _part_aggregates(destino, nombre, columnas_carriles)
+    if parcial[-1] is None:
+        return totales
+    *tablas, resumen = totales
+    *partes, parte_resumen = parcial
+    return (*(tabla.subtract(parte) for tabla, parte in zip(tablas, partes)), resumen.subtract(parte_resumen))
+
+
+def _refresh_extrema(totales, destino, nombres, columnas_carriles):
+    """Mínimos y máximos no se pueden restar: se recalculan semana a semana."""
+    *tablas, resumen = totales
+    if resumen is None:
+        return totales
+    extremos = None
+    for nombre in nombres:
+        parte_resumen = _part_summary(destino, nombre, columnas_carriles)
+        if parte_resumen is not None:
+            extremos = parte_resumen if extremos is None else extremos.merge(parte_resumen)
+    return (*tablas, None if extremos is None else resumen.with_extrema(extremos))
+
+
+def _load_totals(destino, comprobar=False):
+    """Agregados totales guardados, o ``None`` si falta alguno.
+
+    Con ``comprobar`` solo se mira si existen y se devuelven las rutas.
+    """
+    rutas = [os.path.join(destino, fichero) for fichero, _ in _TABLAS] + [os.path.join(destino, _RESUMEN)]
+    if not all(os.path.exists(ruta) for ruta in rutas):
+        return None
+    if comprobar:
+        return rutas
+    return (*(clase.load(ruta) for (_, clase), ruta in zip(_TABLAS, rutas)), TrafficSummary.load(rutas[-1]))
+
+
+def _save_totals(destino, totales):
+    *tablas, resumen = totales
+    for (fichero, _), tabla in zip(_TABLAS, tablas):
+        _save_table(tabla, os.path.join(destino, fichero))
+    ruta_resumen = os.path.join(destino, _RESUMEN)
+    if resumen is None:
+        if os.path.exists(ruta_resumen):
+            os.remove(ruta_resumen)
+    else:
+        _save_table(resumen, ruta_resumen)
+
+
+def _save_table(tabla, ruta):
+    """Guarda un agregado en un fichero temporal y lo sustituye de una vez."""
+    descriptor, temporal = tempfile.mkstemp(suffix=".npz", dir=os.path.dirname(ruta))
+    os.close(descriptor)
+    os.chmod(temporal, 0o644)
+    tabla.save(temporal)
+    os.replace(temporal, ruta)
+
+
+# =============================================
+# CARGA DEL HISTÓRICO
+# =============================================
+def load_traffic(carpeta=CARPETA_DATOS, destino=CARPETA_CACHE, procesos=None):
+    """Devuelve ``(archivo, avisos)`` con el histórico compacto (``TrafficArchive``).
+
+    Las columnas se abren mapeadas en memoria y en solo lectura, de modo que
+    todas las sesiones comparten las mismas páginas.
+    """
+    avisos = sync_store(carpeta, destino, procesos)
+    with _store_lock(destino, compartido=True):
+        manifiesto = _read_manifest(destino)
+        columnas = _load_arrays(os.path.join(destino, "archive"), COLUMNAS, mmap_mode='r')
+    return TrafficArchive.from_arrays(columnas, manifiesto['columnas_carriles'] or []), avisos
+
+
+def load_cube(carpeta=CARPETA_DATOS, destino=CARPETA_CACHE, procesos=None):
+    """Devuelve el cubo preagregado del histórico, actualizando antes el almacén."""
+    sync_store(carpeta, destino, procesos)
+    with _store_lock(destino, compartido=True):
+        return TrafficCube.load(os.path.join(destino, "cube.npz"))
+
+
+def open_tensor(carpeta=CARPETA_DATOS, destino=CARPETA_CACHE, procesos=None):
+    """Devuelve ``(tensor, avisos)`` con el ``TrafficTensor`` mapeado en memoria."""
+    avisos = sync_store(carpeta, destino, procesos)
+    with _store_lock(destino, compartido=True):
+        manifiesto = _read_manifest(destino)
+        tensor = TrafficTensor.open(os.path.join(destino, "tensor"), manifiesto['columnas_carriles'] or [])
+    return tensor, avisos
+
+
+def load_summary(carpeta=CARPETA_DATOS, destino=CARPETA_CACHE, procesos=None):
+    """Devuelve ``(resumen, avisos)`` con el ``TrafficSummary`` que mantiene el almacén.
+
+    El resumen se actualiza semana a semana en ``sync_store``; para calcularlo
+    desde cero a partir de los ficheros, ``summarize_files``.
+    """
+    avisos = sync_store(carpeta, destino, procesos)
+    ruta = os.path.join(destino, "summary.npz")
+    with _store_lock(destino, compartido=True):
+        resumen = TrafficSummary.load(ruta) if os.path.exists(ruta) else None
+    return resumen, avisos
+
+
+def summarize_files(carpeta=CARPETA_DATOS, procesos=None):
+    """Devuelve ``(resumen, avisos)`` leyendo los ficheros semanales en streaming.
+
+    No pasa por el almacén ni escribe nada: los ficheros se leen en
+    ``procesos`` procesos y se resumen bloque a bloque, así que la memoria no
+    depende del tamaño del histórico. Sirve para resumir una carpeta
+    cualquiera o para comprobar el resumen que mantiene ``sync_store``.
+    """
+    avisos = []
+    rutas = [os.path.join(carpeta, nombre) for nombre in _weekly_files(carpeta)]
+    resumen = summarize(iter_chunks(iter_files(rutas, procesos, avisos)))
+    return resumen, avisos
+
+
+def load_sketches(carpeta=CARPETA_DATOS, destino=CARPETA_CACHE, procesos=None):
+    """Devuelve los ``QuantileSketches`` por estación y mes, actualizando antes el almacén."""
+    sync_store(carpeta, destino, procesos)
+    with _store_lock(destino, compartido=True):
+        return QuantileSketches.load(os.path.join(destino, "sketches.npz"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize the weekly traffic files without using the store.")
+    parser.add_argument("carpeta", nargs="?", default=CARPETA_DATOS, help="folder with the weekly traffic files")
+    parser.add_argument("--procesos", type=int, default=None, help="parser processes (default: one per core)")
+    args = parser.parse_args(argv)
+
+    resumen, avisos = summarize_files(args.carpeta, args.procesos)
+    for aviso in avisos:
+        print(aviso, file=sys.stderr)
+    if resumen is None:
+        print("No traffic data", file=sys.stderr)
+        return 1
+    for titulo, tabla in (("Peak hours", resumen.peak_hours()), ("Heavy vehicles (%)", resumen.heavy_share()),
+                          ("Monthly trend", resumen.monthly_trend())):
+        print(f"\n{titulo}\n{tabla.to_string()}")
+    return 1 if avisos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+"""Agregación en streaming del histórico de tráfico.
+
+Los ficheros semanales (o las partes del almacén) se recorren bloque a bloque
+con generadores. Cada bloque produce un ``TrafficSummary`` parcial con
+conteos, sumas, sumas de cuadrados, mínimos y máximos por clave, y los
+parciales se combinan con ``merge``. La memoria depende del tamaño del bloque
+y del número de claves (estaciones, horas, meses), no del número de filas.
+
+Los agregados se pueden guardar (``save``/``load``) y retirar (``subtract``),
+de modo que el almacén mantiene el resumen total sumando o restando el de la
+semana que cambia. Mínimo y máximo no se pueden restar: tras una retirada se
+recalculan con ``with_extrema`` a partir de los resúmenes semanales.
+"""
+import numpy as np
+import pandas as pd
+
+from mobility.traffic_cube import ETIQUETAS_HORA, date_parts
+from mobility.traffic_ingest import iter_parsed
+
+FILAS_POR_BLOQUE = 200_000
+
+
+# =============================================
+# GENERADORES DE BLOQUES
+# =============================================
+def iter_files(rutas, procesos=None, avisos=None):
+    """Lee los ficheros semanales uno a uno (sin pasar por el almacén).
+
+    Los errores de lectura se añaden a ``avisos`` si se pasa una lista.
+    """
+    for ruta, datos, error in iter_parsed(rutas, procesos):
+        if error is not None:
+            if avisos is not None:
+                avisos.append(f"Error processing {ruta}: {error}")
+            continue
+        yield datos
+
+
+def iter_chunks(partes, filas=FILAS_POR_BLOQUE):
+    """Divide cada parte (dict de columnas) en bloques de como mucho ``filas`` filas."""
+    for parte in partes:
+        n = len(parte['estacion'])
+        for inicio in range(0, n, filas):
+            yield {
+                clave: (valores if clave == 'columnas_carriles' else valores[inicio:inicio + filas])
+                for clave, valores in parte.items()
+            }
+
+
+def summarize(bloques):
+    """Consume un flujo de bloques y devuelve el ``TrafficSummary`` combinado."""
+    resumen = None
+    for parcial in (TrafficSummary.from_chunk(bloque) for bloque in bloques):
+        resumen = parcial if resumen is None else resumen.merge(parcial)
+    return resumen
+
+
+# =============================================
+# AGREGADOS COMBINABLES
+# =============================================
+class GroupStats:
+    """Conteo, suma, suma de cuadrados, mínimo y máximo de varias columnas por clave."""
+
+    def __init__(self, claves, conteo, suma, suma_cuadrados, minimo, maximo):
+        self.claves = claves
+        self.conteo = conteo
+        self.suma = suma
+        self.suma_cuadrados = suma_cuadrados
+        self.minimo = minimo
+        self.maximo = maximo
+
+    @classmethod
+    def from_values(cls, claves, valores, validos=None):
+        """Agrega ``valores`` (filas x columnas) por ``claves``."""
+        valores = valores.reshape(len(valores), -1)
+        if validos is not None:
+            claves, valores = claves[validos], valores[validos]
+
+        acumulador = np.float64 if valores.dtype.kind == 'f' else np.int64
+        orden = np.argsort(claves, kind='stable')
+        claves, valores = claves[orden], valores[orden].astype(acumulador)
+        unicas, inicios, conteo = np.unique(claves, return_index=True, return_counts=True)
+        if len(unicas) == 0:
+            vacio = np.zeros((0, valores.shape[1]), dtype=acumulador)
+            return cls(unicas, conteo.astype(np.int64), vacio, vacio, vacio, vacio)
+
+        return cls(
+            unicas,
+            conteo.astype(np.int64),
+            np.add.reduceat(valores, inicios, axis=0),
+            np.add.reduceat(valores * valores, inicios, axis=0),
+            np.minimum.reduceat(valores, inicios, axis=0),
+            np.maximum.reduceat(valores, inicios, axis=0),
+        )
+
+    def merge(self, otro):
+        """Combina dos agregados; las claves pueden no coincidir."""
+        claves = np.union1d(self.claves, otro.claves)
+        i_propio = np.searchsorted(claves, self.claves)
+        i_otro = np.searchsorted(claves, otro.claves)
+        columnas = self.suma.shape[1]
+        dtype = np.result_type(self.suma, otro.suma)
+
+        conteo = np.zeros(len(claves), dtype=np.int64)
+        suma = np.zeros((len(claves), columnas), dtype=dtype)
+        suma_cuadrados = np.zeros_like(suma)
+        conteo[i_propio] += self.conteo
+        conteo[i_otro] += otro.conteo
+        suma[i_propio] += self.suma
+        suma[i_otro] += otro.suma
+        suma_cuadrados[i_propio] += self.suma_cuadrados
+        suma_cuadrados[i_otro] += otro.suma_cuadrados
+
+        minimo = np.zeros_like(suma)
+        maximo = np.zeros_like(suma)
+        minimo[i_propio] = self.minimo
+        maximo[i_propio] = self.maximo
+        comun = np.isin(otro.claves, self.claves)[:, None]
+        minimo[i_otro] = np.where(comun, np.minimum(minimo[i_otro], otro.minimo), otro.minimo)
+        maximo[i_otro] = np.where(comun, np.maximum(maximo[i_otro], otro.maximo), otro.maximo)
+        return GroupStats(claves, conteo, suma, suma_cuadrados, minimo, maximo)
+
+    def subtract(self, otro):
+        """Retira la contribución de ``otro`` (cuyas claves deben estar en ``self``).
+
+        Las claves que se quedan sin valores desaparecen; mínimo y máximo se
+        conservan tal cual y hay que recalcularlos aparte.
+        """
+        if not np.isin(otro.claves, self.claves).all():
+            raise ValueError("cannot subtract statistics for keys that were never added")
+        i_otro = np.searchsorted(self.claves, otro.claves)
+
+        conteo = self.conteo.copy()
+        suma = self.suma.copy()
+        suma_cuadrados = self.suma_cuadrados.copy()
+        conteo[i_otro] -= otro.conteo
+        suma[i_otro] -= otro.suma
+        suma_cuadrados[i_otro] -= otro.suma_cuadrados
+
+        quedan = conteo > 0
+        return GroupStats(
+            self.claves[quedan], conteo[quedan], suma[quedan], suma_cuadrados[quedan],
+            self.minimo[quedan], self.maximo[quedan],
+        )
+
+    def with_extrema(self, otro):
+        """Copia con el mínimo y el máximo de ``otro`` (mismas claves)."""
+        i_otro = np.searchsorted(otro.claves, self.claves)
+        return GroupStats(
+            self.claves, self.conteo, self.suma, self.suma_cuadrados,
+            otro.minimo[i_otro], otro.maximo[i_otro],
+        )
+
+    def arrays(self, prefijo):
+        return {f"{prefijo}_{campo}": getattr(self, campo) for campo in _CAMPOS_GRUPO}
+
+    @classmethod
+    def from_arrays(cls, datos, prefijo):
+        return cls(*(datos[f"{prefijo}_{campo}"] for campo in _CAMPOS_GRUPO))
+
+    def mean(self):
+        return self.suma / self.conteo[:, None]
+
+    def std(self):
+        """Desviación típica muestral (NaN con menos de dos valores), como pandas."""
+        n = self.conteo[:, None].astype(np.float64)
+        s = self.suma.astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            varianza = (self.suma_cuadrados - s * s / n) / (n - 1)
+        return np.where(n >= 2, np.sqrt(np.maximum(varianza, 0)), np.nan)
+
+
+_CAMPOS_GRUPO = ('claves', 'conteo', 'suma', 'suma_cuadrados', 'minimo', 'maximo')
+_GRUPOS = ('por_estacion', 'por_hora', 'pesados_por_estacion', 'total_por_mes')
+
+
+class TrafficSummary:
+    """Agregados parciales con los que se construyen las tablas de nuevo.py."""
+
+    def __init__(self, columnas_carriles, por_estacion, por_hora, pesados_por_estacion, total_por_mes):
+        self.columnas_carriles = list(columnas_carriles)
+        self.por_estacion = por_estacion
+        self.por_hora = por_hora
+        self.pesados_por_estacion = pesados_por_estacion
+        self.total_por_mes = total_por_mes
+
+    @classmethod
+    def from_chunk(cls, bloque):
+        columnas_carriles = bloque['columnas_carriles']
+        carriles = np.asarray(bloque['carriles'])
+        es_pesado = np.array(['pesados' in c.lower() for c in columnas_carriles], dtype=bool)
+
+        total = carriles.sum(axis=1, dtype=np.int64)
+        pesados = carriles[:, es_pesado].sum(axis=1, dtype=np.int64)
+        # Los carriles y el total se agregan juntos: la última columna es el total
+        con_total = np.column_stack([carriles, total])
+        estacion = np.asarray(bloque['estacion'])
+        _, mes, _ = date_parts(np.asarray(bloque['fecha']))
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            porcentaje = pesados / total * 100
+
+        return cls(
+            columnas_carriles,
+            GroupStats.from_values(estacion, carriles),
+            GroupStats.from_values(np.asarray(bloque['hora']), con_total),
+            # Las horas sin vehículos dan 0/0 y pandas las ignora en la media
+            GroupStats.from_values(estacion, porcentaje, validos=~np.isnan(porcentaje)),
+            GroupStats.from_values(mes, total),
+        )
+
+    def merge(self, otro):
+        return TrafficSummary(self.columnas_carriles, *(
+            getattr(self, grupo).merge(getattr(otro, grupo)) for grupo in _GRUPOS
+        ))
+
+    def subtract(self, otro):
+        """Retira la contribución de ``otro`` (mínimos y máximos quedan sin actualizar)."""
+        return TrafficSummary(self.columnas_carriles, *(
+            getattr(self, grupo).subtract(getattr(otro, grupo)) for grupo in _GRUPOS
+        ))
+
+    def with_extrema(self, otro):
+        """Copia con mínimos y máximos tomados de ``otro``."""
+        return TrafficSummary(self.columnas_carriles, *(
+            getattr(self, grupo).with_extrema(getattr(otro, grupo)) for grupo in _GRUPOS
+        ))
+
+    # -----------------------------------------
+    # Persistencia
+    # -----------------------------------------
+    def save(self, ruta):
+        arrays = {'columnas_carriles': np.array(self.columnas_carriles, dtype=str)}
+        for grupo in _GRUPOS:
+            arrays.update(getattr(self, grupo).arrays(grupo))
+        np.savez(ruta, **arrays)
+
+    @classmethod
+    def load(cls, ruta):
+        with np.load(ruta) as datos:
+            return cls([str(c) for c in datos['columnas_carriles']], *(
+                GroupStats.from_arrays(datos, grupo) for grupo in _GRUPOS
+            ))
+
+    # -----------------------------------------
+    # Tablas
+    # -----------------------------------------
+    def mean_by_station(self):
+        return pd.DataFrame(self.por_estacion.mean(), columns=self.columnas_carriles,
+                            index=pd.Index(self.por_estacion.claves, name='Estacion'))
+
+    def std_by_station(self):
+        return pd.DataFrame(self.por_estacion.std(), columns=self.columnas_carriles,
+                            index=pd.Index(self.por_estacion.claves, name='Estacion'))
+
+    def mean_by_hour(self):
+        return pd.DataFrame(self.por_hora.mean()[:, :-1], columns=self.columnas_carriles,
+                            index=self._hour_index())
+
+    def peak_hours(self):
+        """Media de vehículos por hora, de mayor a menor."""
+        media = pd.Series(self.por_hora.mean()[:, -1], index=self._hour_index(), name='Total_Vehiculos')
+        return media.sort_values(ascending=False)
+
+    def heavy_share(self):
+        """Porcentaje medio de vehículos pesados por estación."""
+        return pd.Series(self.pesados_por_estacion.mean()[:, 0], name='Porcentaje_Pesados',
+                         index=pd.Index(self.pesados_por_estacion.claves, name='Estacion'))
+
+    def monthly_trend(self):
+        return pd.Series(self.total_por_mes.mean()[:, 0], name='Total_Vehiculos',
+                         index=pd.Index(self.total_por_mes.claves, name='Mes'))
+
+    def _hour_index(self):
+        return pd.Index(ETIQUETAS_HORA[self.por_hora.claves], name='Hora')
@@ -0,0 +1,107 @@
+"""Tensor de conteos estación x hora del histórico x carril, mapeado en memoria.
+
+El almacén lo escribe una sola vez como ``.npy`` y cada sesión de Streamlit (o
+cada proceso del servidor) lo abre en solo lectura con ``mmap_mode='r'``: las
+páginas del fichero las comparte el sistema operativo y ninguna sesión guarda
+su propia copia.
+
+El eje temporal solo contiene las horas que aparecen en el histórico (las
+semanas publicadas), cada una identificada por el inicio de su intervalo: la
+fila ``Hora = 01:00`` de un día corresponde a la hora ``00:00`` de ese día.
+``presente`` indica qué celdas estación x hora tienen registro.
+"""
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+COLUMNAS = ('estaciones', 'horas', 'presente', 'conteos')
+
+
+def write_tensor(archivo, carpeta):
+    """Escribe el tensor de un ``TrafficArchive`` en ``carpeta``, que ya existe
+    y está vacía (el almacén la publica cuando está completa)."""
+    hora_absoluta = archivo.dia.astype(np.int64) * 24 + archivo.hora.astype(np.int64) - 1
+    horas, i_hora = np.unique(hora_absoluta, return_inverse=True)
+    forma = (len(archivo.estaciones), len(horas))
+
+    np.save(os.path.join(carpeta, "estaciones.npy"), archivo.estaciones)
+    np.save(os.path.join(carpeta, "horas.npy"), horas)
+
+    presente = np.zeros(forma, dtype=bool)
+    presente[archivo.codigo, i_hora] = True
+    np.save(os.path.join(carpeta, "presente.npy"), presente)
+
+    # Se rellena directamente sobre el fichero; las filas repetidas se suman
+    conteos = open_memmap(
+        os.path.join(carpeta, "conteos.npy"), mode='w+',
+        dtype=archivo.carriles.dtype, shape=forma + (archivo.carriles.shape[1],),
+    )
+    conteos[:] = 0
+    np.add.at(conteos, (archivo.codigo, i_hora), archivo.carriles)
+    conteos.flush()
+    del conteos
+
+
+class TrafficTensor:
+    """Acceso de solo lectura al tensor mapeado en memoria."""
+
+    def __init__(self, estaciones, horas, presente, conteos, columnas_carriles):
+        self.estaciones = estaciones
+        self.horas = horas
+        self.presente = presente
+        self.conteos = conteos
+        self.columnas_carriles = list(columnas_carriles)
+        self._posicion = {int(e): i for i, e in enumerate(estaciones)}
+
+    @classmethod
+    def open(cls, carpeta, columnas_carriles):
+        """Abre el tensor sin copiarlo a memoria."""
+        arrays = {
+            nombre: np.load(os.path.join(carpeta, f"{nombre}.npy"), mmap_mode='r')
+            for nombre in COLUMNAS
+        }
+        return cls(*(arrays[nombre] for nombre in COLUMNAS), columnas_carriles)
+
+    @property
+    def shape(self):
+        return self.conteos.shape
+
+    # -----------------------------------------
+    # Índices
+    # -----------------------------------------
+    def __contains__(self, estacion):
+        return estacion in self._posicion
+
+    def station_index(self, estacion):
+        """Posición de una estación en el eje 0 (``KeyError`` si no existe)."""
+        return self._posicion[estacion]
+
+    def time_slice(self, inicio=None, fin=None):
+        """Rango de horas ``[inicio, fin)`` como ``slice`` del eje 1."""
+        desde = 0 if inicio is None else int(np.searchsorted(self.horas, _to_hours(inicio)))
+        hasta = len(self.horas) if fin is None else int(np.searchsorted(self.horas, _to_hours(fin)))
+        return slice(desde, hasta)
+
+    def timestamps(self, horas=slice(None)):
+        """Inicio de cada hora del eje temporal como datetime64[h]."""
+        return self.horas[horas].astype('datetime64[h]')
+
+    # -----------------------------------------
+    # Lecturas
+    # -----------------------------------------
+    def totals(self, estacion, horas=slice(None)):
+        """Total de vehículos de cada hora registrada de una estación."""
+        i = self.station_index(estacion)
+        registrada = self.presente[i, horas]
+        return self.conteos[i, horas][registrada].sum(axis=1, dtype=np.int32)
+
+    def series(self, estacion, horas=slice(None)):
+        """Horas registradas de una estación (horas desde 1970) y su total de vehículos."""
+        i = self.station_index(estacion)
+        registrada = self.presente[i, horas]
+        return self.horas[horas][registrada], self.conteos[i, horas][registrada].sum(axis=1, dtype=np.int32)
+
+
+def _to_hours(instante):
+    return np.datetime64(instante, 'h').astype(np.int64)
@@ -0,0 +1,47 @@
+"""Duración de viajes equivalentes en distintos servicios (laborables y fines de semana).
+
+Dos viajes se consideran el mismo recorrido si son de la misma ruta y llegan
+a la misma distancia acumulada (``max_shape_dist_traveled``). Un viaje entra
+en la comparación si en su recorrido hay viajes de otro servicio. Antes se
+buscaban esos viajes fila a fila (cuadrático en el número de viajes); aquí
+basta con agrupar por recorrido, que pandas resuelve con una tabla hash, y
+contar los servicios de cada grupo. El resultado son las mismas filas y las
+mismas estadísticas por recorrido y servicio.
+"""
+SERVICIOS_LABORABLES = (1840, 1841)
+SERVICIOS_FIN_DE_SEMANA = (1842, 1843)
+
+RECORRIDO = ['route_id', 'max_shape_dist_traveled']
+
+
+def trip_summary(stop_speeds, servicios=SERVICIOS_LABORABLES + SERVICIOS_FIN_DE_SEMANA):
+    """Un viaje por fila: tiempo total entre paradas, ruta, servicio y distancia recorrida."""
+    paradas = stop_speeds[stop_speeds['service_id'].isin(servicios)]
+    resumen = paradas.groupby(['trip_id', 'route_id', 'service_id'], sort=False).agg(
+        total_time_between_stops=('time_between_stops', 'sum'),
+        max_shape_dist_traveled=('shape_dist_traveled', 'max'),
+    ).reset_index()
+    return resumen[['trip_id', 'total_time_between_stops', 'route_id', 'service_id', 'max_shape_dist_traveled']]
+
+
+def comparable_trips(resumen):
+    """Viajes cuyo recorrido también hacen viajes de otro servicio."""
+    servicios = resumen.groupby(RECORRIDO, sort=False)['service_id'].transform('nunique')
+    return resumen[servicios > 1].drop_duplicates()
+
+
+def service_durations(resumen):
+    """Estadísticas de la duración de cada recorrido en cada servicio, solo para
+    los recorridos que hacen viajes de más de un servicio."""
+    agregado = comparable_trips(resumen).groupby(RECORRIDO + ['service_id']).agg(
+        duracion_media=('total_time_between_stops', 'mean'),
+        variance=('total_time_between_stops', 'var'),
+        std_dev=('total_time_between_stops', 'std'),
+        min_time=('total_time_between_stops', 'min'),
+        max_time=('total_time_between_stops', 'max'),
+        median_time=('total_time_between_stops', 'median')
+    ).reset_index()
+    # Con un solo viaje no hay dispersión
+    agregado['variance'] = agregado['variance'].fillna(0)
+    agregado['std_dev'] = agregado['std_dev'].fillna(0)
+    return agregado
@@ -6,6 +6,11 @@ import seaborn as sns
 import plotly.express as px
 import os
 
+from mobility.boxplot import box_figure, box_stats
+from mobility.data_layer import traffic_data
+from mobility.traffic_cube import ETIQUETAS_HORA, NOMBRES_DIA
+from mobility.traffic_sketch import ALFA
+
 # Configuración de la página para usar todo el ancho
 st.set_page_config(layout="wide")
 
@@ -41,50 +46,19 @@ st.markdown(
 # Carpeta donde están los archivos CSV
 carpeta = "Datos 2"
 
-# Lista para almacenar los DataFrames
-lista_df = []
-
-# Iterar sobre los archivos en la carpeta
-for i, Datos in enumerate(os.listdir(carpeta)):
-    base_datos = os.path.join(carpeta, Datos)
-    
-    # Solo leer archivos CSV
-    if base_datos.endswith('.csv'):
-        try:
-            df = pd.read_csv(base_datos, delimiter=";")
-            
-            # Verificar si las columnas necesarias están presentes
-            if 'Fecha' not in df.columns or 'Hora' not in df.columns:
-                print(f"Advertencia: El archivo {base_datos} no tiene las columnas 'Fecha' o 'Hora'. Se omitirá este archivo.")
-                continue  
-            
-            # Si no es el primer archivo, eliminar la primera fila
-            if i > 0:
-                df = df.iloc[1:].reset_index(drop=True)
-            
-            df['Fecha'] = pd.to_datetime(df['Fecha'], dayfirst=True)
-            df['Hora'] = df['Hora'].astype(str)
-            
-            # Convertir columnas de carriles a enteros
-            for col in df.columns:
-                if 'ligeros' in col or 'pesados' in col:
-                    df[col] = df[col].astype(int)
-            
-            lista_df.append(df)
-        except Exception as e:
-            print(f"Error al leer el archivo {base_datos}: {e}")
-
-# Concatenar DataFrames
-if lista_df:
-    df_final = pd.concat(lista_df, ignore_index=True)
-    
-    # Limpiar los datos NaN: eliminar filas con NaN
-    df_final = df_final.dropna()  
+# Histórico compacto y agregados del almacén columnar, compartidos por todas las
+# sesiones del proceso (se recargan solo si cambian los ficheros semanales)
+datos_trafico = traffic_data(carpeta)
+archivo = datos_trafico.archivo
+for aviso in datos_trafico.avisos:
+    print(aviso)
 
-    df_final['DiaSemana'] = df_final['Fecha'].dt.day_name()
-    df_final['Mes'] = df_final['Fecha'].dt.month
+# Tablas resumen agregadas en streaming, bloque a bloque, sin juntar todas las filas
+resumen = datos_trafico.resumen
 
-    columnas_carriles = df_final.columns[3:15]
+if len(archivo) > 0:
+    # Los campos derivados (total, día, mes...) se calculan al usarlos sobre los arrays compactos
+    columnas_carriles = archivo.columnas_carriles
     
     ############################################################# 0. Show data frame
     st.markdown(
@@ -95,7 +69,7 @@ if lista_df:
     """,
     unsafe_allow_html=True
     )
-    st.dataframe(df_final.head(50))   
+    st.dataframe(archivo.to_frame(slice(0, 50)))   
 
     ############################################################ 1. Media por estación
     st.markdown(
@@ -107,7 +81,7 @@ if lista_df:
     unsafe_allow_html=True
     )
 
-    media_por_estacion = df_final.groupby('Estacion')[columnas_carriles].mean()
+    media_por_estacion = resumen.mean_by_station()
 
    # Crear columnas vacías a los lados para centrar el DataFrame
     col1, col2, col3 = st.columns([1, 7, 1])  # Ajusta los valores para cambiar el ancho
@@ -125,7 +99,7 @@ if lista_df:
     unsafe_allow_html=True
     )
 
-    media_por_hora = df_final.groupby("Hora")[columnas_carriles].mean()
+    media_por_hora = resumen.mean_by_hour()
 
     # Crear columnas vacías a los lados para centrar el DataFrame
     col1, col2, col3 = st.columns([1, 7, 1])  # Ajusta los valores para cambiar el ancho
@@ -143,7 +117,7 @@ if lista_df:
     unsafe_allow_html=True
     )
 
-    std_por_estacion = df_final.groupby('Estacion')[columnas_carriles].std()
+    std_por_estacion = resumen.std_by_station()
     
     # Crear columnas vacías a los lados para centrar el DataFrame
     col1, col2, col3 = st.columns([1, 7, 1])  # Ajusta los valores para cambiar el ancho
@@ -162,14 +136,9 @@ if lista_df:
     unsafe_allow_html=True
     )
 
-    df_final['Total_Vehiculos'] = df_final[columnas_carriles].sum(axis=1)
-    horas_punta = df_final.groupby("Hora")['Total_Vehiculos'].mean().sort_values(ascending=False)
-
-    columnas_pesados = [col for col in columnas_carriles if 'pesados' in col]
-    df_final['Porcentaje_Pesados'] = df_final[columnas_pesados].sum(axis=1) / df_final['Total_Vehiculos'] * 100
-    porcentaje_pesados = df_final.groupby("Estacion")["Porcentaje_Pesados"].mean()
-
-    tendencia_mensual = df_final.groupby("Mes")['Total_Vehiculos'].mean()
+    horas_punta = resumen.peak_hours()
+    porcentaje_pesados = resumen.heavy_share()
+    tendencia_mensual = resumen.monthly_trend()
 
     # Crear columnas vacías a los lados para centrar el DataFrame
     col1, col2, col3, col4, col5, col6, col7, col8, col9= st.columns([3.8, 3, 1, 1, 3, 1, 1.4, 5, 1])
@@ -210,12 +179,10 @@ if lista_df:
         unsafe_allow_html=True
     )
 
-    # Verificar que las columnas necesarias existen en df_final
-    if 'Estacion' in df_final.columns and 'Total_Vehiculos' in df_final.columns:
-        df_final['Total_Vehiculos'] = pd.to_numeric(df_final['Total_Vehiculos'], errors='coerce')
-
-        # Calcular la mediana del tráfico por estación para ordenar
-        trafico_median = df_final.groupby('Estacion')['Total_Vehiculos'].median().sort_values(ascending=False)
+    # Verificar que hay columnas de carriles con las que calcular el total
+    if len(columnas_carriles) > 0:
+        # Mediana del tráfico por estación (de los bocetos de cuantiles) para ordenar
+        trafico_median = datos_trafico.bocetos.station_quantiles(0.5)[0.5].sort_values(ascending=False)
 
         # Tomar las 10 estaciones con mayor mediana de tráfico
         top_estaciones = trafico_median.head(10).index.tolist()
@@ -223,14 +190,21 @@ if lista_df:
         # Selección de estaciones con opción de cambiar
         estaciones_seleccionadas = st.multiselect("Select Stations", trafico_median.index, default=top_estaciones)
 
-        # Filtrar el DataFrame según las estaciones seleccionadas
-        df_filtrado = df_final[df_final['Estacion'].isin(estaciones_seleccionadas)]
-
-        if not df_filtrado.empty:
+        # Cuartiles de los bocetos de cuantiles; las filas de cada estación solo
+        # se recorren para los bigotes y una muestra de atípicos
+        resumen_cajas = pd.DataFrame([
+            {'Estacion': estacion, **box_stats(
+                archivo.total(archivo.station_rows(estacion)),
+                cuartiles=datos_trafico.bocetos.quantiles(estacion, [0.25, 0.5, 0.75]), error_relativo=ALFA,
+            )}
+            for estacion in estaciones_seleccionadas
+        ])
+
+        if len(resumen_cajas) and resumen_cajas['n'].sum() > 0:
             # Crear boxplot con Plotly
-            fig = px.box(df_filtrado, x='Estacion', y='Total_Vehiculos', 
-                         labels={"Estacion": "Station", "Total_Vehiculos": "Total Vehicles"},
-                         color='Estacion')
+            fig = box_figure(resumen_cajas, x='Estacion', y='Total_Vehiculos',
+                             labels={"Estacion": "Station", "Total_Vehiculos": "Total Vehicles"},
+                             color='Estacion')
 
             fig.update_layout(
                 xaxis_title_font_size=22,  # Tamaño de la fuente del título del eje X
@@ -247,19 +221,24 @@ if lista_df:
         st.error("The necessary columns are missing in the dataset.")
 
     ############################################################# 9. Filtros interactivos en Streamlit
-    años_disponibles = df_final['Fecha'].dt.year.unique()
+    años_disponibles = pd.unique(archivo.anio())
     año_seleccionado = st.selectbox("Select Year", años_disponibles, index=0)
 
     # Filtrar datos por el año seleccionado
-    df_filtrado = df_final[df_final['Fecha'].dt.year == año_seleccionado]
+    filas_año = archivo.rows(anio=año_seleccionado)
 
     # Seleccionar estaciones
-    estaciones_disponibles = df_filtrado["Estacion"].unique()
+    estaciones_disponibles = pd.unique(archivo.estacion(filas_año))
     estaciones_predefinidas = list(estaciones_disponibles[:3]) if len(estaciones_disponibles) >= 3 else list(estaciones_disponibles)
     estaciones_seleccionadas = st.multiselect("Select Stations", estaciones_disponibles, default=estaciones_predefinidas)
 
     # Filtrar datos por estaciones seleccionadas
-    df_filtrado = df_filtrado[df_filtrado["Estacion"].isin(estaciones_seleccionadas)]
+    filas = archivo.rows(estacion=estaciones_seleccionadas, anio=año_seleccionado)
+    df_filtrado = pd.DataFrame({
+        'Hora': ETIQUETAS_HORA[archivo.hora[filas]],
+        'Estacion': archivo.estacion(filas),
+        'Total_Vehiculos': archivo.total(filas),
+    })
 
     # Agrupar por hora y estación para obtener la media de vehículos en cada hora
     df_agrupado = df_filtrado.groupby(["Hora", "Estacion"])["Total_Vehiculos"].mean().reset_index()
@@ -291,18 +270,19 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# Asegurarse de que la columna 'Fecha' y 'Total_Vehiculos' existen
-if 'Fecha' in df_final.columns and 'Total_Vehiculos' in df_final.columns:
-    # Crear una nueva columna con el nombre del día de la semana (Lunes, Martes, etc.)
-    df_final['DiaSemana'] = df_final['Fecha'].dt.day_name()
-
+# Asegurarse de que hay datos cargados
+if len(archivo) > 0:
     # Filtrar por año seleccionado
-    año_seleccionado = st.selectbox("Selecciona el Año", df_final['Fecha'].dt.year.unique(), index=0)
+    año_seleccionado = st.selectbox("Selecciona el Año", pd.unique(archivo.anio()), index=0)
     
     # Filtrar los datos por el año seleccionado
-    df_filtrado = df_final[df_final['Fecha'].dt.year == año_seleccionado]
+    filas = archivo.rows(anio=año_seleccionado)
     
     # Agrupar por día de la semana y calcular el tráfico promedio
+    df_filtrado = pd.DataFrame({
+        'DiaSemana': np.array(NOMBRES_DIA, dtype=object)[archivo.dia_semana(filas)],
+        'Total_Vehiculos': archivo.total(filas),
+    })
     df_agrupado_dia = df_filtrado.groupby(['DiaSemana'])['Total_Vehiculos'].mean().reset_index()
 
     # Reordenar los días de la semana para que aparezcan de forma lógica (lunes, martes, ...)
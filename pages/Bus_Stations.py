@@ -1,9 +1,11 @@
 import streamlit as st
 import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-import plotly.express as px
+
+from mobility.boxplot import box_figure, box_summary
+from mobility.data_layer import gtfs_feed
+from mobility.trip_comparison import service_durations, trip_summary
 
 # =============================================
 # CONFIGURACIÓN INICIAL (ESTILO COMO PAGINA PRINCIPAL)
@@ -146,34 +148,19 @@ st.markdown("""
 # =============================================
 # CARGA DE DATOS
 # =============================================
-agency_dbus = pd.read_csv("Datos 1/agency_dbus.csv",sep=';')
-calendar_dbus = pd.read_csv("Datos 1/calendar_dbus.csv",sep=';')
-routes_dbus = pd.read_csv("Datos 1/routes_dbus.csv",sep=';')
-stt_dbus = pd.read_csv("Datos 1/stop_times_dbus.csv",sep=';')
-stt2_dbus = pd.read_csv("Datos 1/stop_times_dbus.csv",sep=';')
-st_dbus = pd.read_csv("Datos 1/stops_dbus.csv",sep=';')
-tri_dbus = pd.read_csv("Datos 1/trips_dbus.csv",sep=';')
-sha_dbus = pd.read_csv("Datos 1/sha_dbus.csv",sep=';')
+# Tablas del GTFS precalculadas y compartidas por todas las sesiones; stop_times
+# llega con las distancias corregidas (coma decimal, km -> m) y las horas como
+# segundos, y stop_speeds añade la ruta y el servicio de cada viaje y el
+# tiempo, la distancia y la velocidad desde la parada anterior
+gtfs = gtfs_feed()
+stt_dbus = gtfs['stop_speeds']
+tri_dbus = gtfs['trips']
 
 # =============================================
 # PROCESAMIENTO DE DATOS
 # =============================================
-# Corrección de distancias
-stt_dbus['shape_dist_traveled'] = stt_dbus['shape_dist_traveled'].astype(str).str.replace(',', '.').astype(float)
-stt_dbus.loc[stt_dbus['shape_dist_traveled'] < 12, 'shape_dist_traveled'] *= 1000
-
-# Obtención del tiempo entre paradas
-stt_dbus['arrival_time'] = pd.to_timedelta(stt_dbus['arrival_time'])
-stt_dbus['departure_time'] = pd.to_timedelta(stt_dbus['departure_time'])
-stt_dbus['time_difference'] = (stt_dbus['departure_time'] - stt_dbus['arrival_time']).dt.total_seconds()
-stt_dbus['time_between_stops'] = stt_dbus['arrival_time'] - stt_dbus.groupby('trip_id')['departure_time'].shift(1)
-stt_dbus['time_between_stops'] = stt_dbus['time_between_stops'].fillna(pd.Timedelta(seconds=0))
-stt_dbus['time_between_stops'] = stt_dbus['time_between_stops'].dt.total_seconds()
-
 # Relaciona el trip id con la ruta y día de la semana
 df = (tri_dbus.sort_values(by=['route_id'],ascending=True))[['trip_id','route_id','service_id']]
-stt_dbus = stt_dbus.merge(df[['trip_id', 'route_id','service_id']], on='trip_id', how='left')
-stt_dbus = stt_dbus.drop_duplicates()
 
 # Obtención del tiempo total de recorrido
 mf = (df.groupby(by=['route_id','service_id']).size().reset_index()).rename(columns={0: 'trip_count'})
@@ -194,12 +181,8 @@ distance_stats_per_route = stt_dbus[stt_dbus['time_between_stops']>0].groupby(by
 merged_df = merged_df.merge(distance_stats_per_route, on=['route_id', 'service_id'], how='left')
 
 # DataFrame con datos relevantes
-df_final = stt_dbus[['route_id', 'service_id', 'trip_id', 'stop_id','stop_sequence','time_between_stops','shape_dist_traveled']]
-df_final['distance_between_stops'] = (df_final['shape_dist_traveled']-df_final.groupby('trip_id')['shape_dist_traveled'].shift(1))
-df_final['distance_between_stops'] = df_final['distance_between_stops'].fillna(0)
-df_final['avg_speed'] = df_final['distance_between_stops']/df_final['time_between_stops']
-df_final['avg_speed'] = df_final['avg_speed'].fillna(0)
-df_final.loc[df_final['time_between_stops'] == 0, ['avg_speed', 'distance_between_stops']] = 0
+df_final = stt_dbus[['route_id', 'service_id', 'trip_id', 'stop_id','stop_sequence','time_between_stops','shape_dist_traveled',
+                     'distance_between_stops', 'avg_speed']]
 
 speed_stats_per_route = df_final[df_final['avg_speed'] > 0].groupby(['route_id', 'service_id'])['avg_speed'].agg(
     avg_speed='mean',
@@ -275,8 +258,11 @@ if not filtered_df.empty:
     filtered_df["service_label"] = filtered_df["service_id"].map(service_labels)
 
     title = f"Distribution of {selected_variable} by Service Type and Stop ID for Route ID {selected_route}"
-    fig = px.box(
-        filtered_df,
+    # Cuartiles y bigotes por (servicio, parada) calculados aquí; el navegador
+    # recibe cinco números por caja en lugar de todos los tramos
+    resumen_cajas = box_summary(filtered_df, x="service_label", y=selected_variable, color="stop_id")
+    fig = box_figure(
+        resumen_cajas,
         x="service_label",  # Use the new label column
         y=selected_variable,
         color="stop_id",
@@ -299,68 +285,18 @@ st.markdown("""<div style='height: 50px;'></div>""", unsafe_allow_html=True)
 st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
 st.markdown('<h4 style="text-align: center;">📌 3. Additional Analysis</h4>', unsafe_allow_html=True)
 
-# Procesamiento de datos adicional
-df_2 = (tri_dbus.sort_values(by=['route_id'],ascending=True))[['trip_id','route_id','service_id']]
-stt2_dbus['arrival_time'] = pd.to_timedelta(stt2_dbus['arrival_time'])
-stt2_dbus['departure_time'] = pd.to_timedelta(stt2_dbus['departure_time'])
-stt2_dbus['time_difference'] = (stt2_dbus['departure_time'] - stt2_dbus['arrival_time']).dt.total_seconds()
-stt2_dbus['time_between_stops'] = stt2_dbus['arrival_time'] - stt2_dbus.groupby('trip_id')['departure_time'].shift(1)
-stt2_dbus['time_between_stops'] = stt2_dbus['time_between_stops'].fillna(pd.Timedelta(seconds=0))
-stt2_dbus['time_between_stops'] = stt2_dbus['time_between_stops'].dt.total_seconds()
-stt2_dbus = stt2_dbus.merge(df_2[['trip_id', 'route_id', 'service_id']], on='trip_id', how='left')
-
-# Filtrado por días de semana/fin de semana
-stt2_dbus_weekdays = stt2_dbus[stt2_dbus['service_id'].isin([1840, 1841])]
-stt2_dbus_weekends = stt2_dbus[stt2_dbus['service_id'].isin([1842, 1843])]
-
-# Resumen de tiempos
-trip_time_summary_weekdays = stt2_dbus_weekdays.groupby('trip_id')['time_between_stops'].sum().reset_index()
-trip_time_summary_weekends = stt2_dbus_weekends.groupby('trip_id')['time_between_stops'].sum().reset_index()
-
-trip_time_summary_weekdays = trip_time_summary_weekdays.merge(stt2_dbus_weekdays[['trip_id', 'route_id', 'service_id']].drop_duplicates(), on='trip_id', how='left')
-trip_time_summary_weekends = trip_time_summary_weekends.merge(stt2_dbus_weekends[['trip_id', 'route_id', 'service_id']].drop_duplicates(), on='trip_id', how='left')
-
-max_shape_dist_weekdays = stt2_dbus_weekdays.groupby('trip_id')['shape_dist_traveled'].max().reset_index()
-max_shape_dist_weekends = stt2_dbus_weekends.groupby('trip_id')['shape_dist_traveled'].max().reset_index()
-
-trip_time_summary_weekdays = trip_time_summary_weekdays.merge(max_shape_dist_weekdays, on='trip_id', how='left')
-trip_time_summary_weekends = trip_time_summary_weekends.merge(max_shape_dist_weekends, on='trip_id', how='left')
-
-trip_time_summary_weekdays.columns = ['trip_id', 'total_time_between_stops', 'route_id', 'service_id', 'max_shape_dist_traveled']
-trip_time_summary_weekends.columns = ['trip_id', 'total_time_between_stops', 'route_id', 'service_id', 'max_shape_dist_traveled']
-
-total_trip_time_summary = pd.concat([trip_time_summary_weekdays, trip_time_summary_weekends])
-
-# Creación del DataFrame final
-selected_rows = []
-for index, row in total_trip_time_summary.iterrows():
-    matching_rows = total_trip_time_summary[
-        (total_trip_time_summary['route_id'] == row['route_id']) &
-        (total_trip_time_summary['max_shape_dist_traveled'] == row['max_shape_dist_traveled']) &
-        (total_trip_time_summary['service_id'] != row['service_id'])
-    ]
-    if not matching_rows.empty:
-        selected_rows.append(row.to_dict())
-        selected_rows.extend(matching_rows.to_dict(orient='records'))
-
-new_trip_time_summary = pd.DataFrame(selected_rows)
-new_trip_time_summary.drop_duplicates(inplace=True)
-
-aggregated_trip_time_summary = new_trip_time_summary.groupby(['route_id', 'max_shape_dist_traveled', 'service_id']).agg(
-    duracion_media=('total_time_between_stops', 'mean'),
-    variance=('total_time_between_stops', 'var'),
-    std_dev=('total_time_between_stops', 'std'),
-    min_time=('total_time_between_stops', 'min'),
-    max_time=('total_time_between_stops', 'max'),
-    median_time=('total_time_between_stops', 'median')
-).reset_index()
+# Duración de cada viaje de laborables y fines de semana, y estadísticas por
+# recorrido (ruta y distancia) y servicio de los que se hacen en más de uno
+total_trip_time_summary = trip_summary(stt_dbus)
+aggregated_trip_time_summary = service_durations(total_trip_time_summary)
 
-aggregated_trip_time_summary['variance'].fillna(0, inplace=True)
-aggregated_trip_time_summary['std_dev'].fillna(0, inplace=True)
-
-# Mostrar resultados finales
+# Mostrar resultados finales. La distancia del recorrido está en metros
+# (antes era el texto del feed, con coma decimal y a veces en kilómetros)
 with st.expander("📌 View Aggregated Trip Time Summary (First 50 Rows)"):
-    st.dataframe(aggregated_trip_time_summary.head(50), use_container_width=True)
+    st.dataframe(
+        aggregated_trip_time_summary.head(50), use_container_width=True,
+        column_config={'max_shape_dist_traveled': st.column_config.NumberColumn(format="%.0f m")}
+    )
 
 # Cerrar contenedor principal
 st.markdown('</div>', unsafe_allow_html=True)
\ No newline at end of file
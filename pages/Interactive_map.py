@@ -1,13 +1,14 @@
 import streamlit as st
 import folium
 from streamlit_folium import st_folium
-import pandas as pd
 import numpy as np
 from folium import PolyLine
-from geopy.distance import geodesic
 from datetime import time
 import os
 
+from mobility.data_layer import gtfs_feed, segment_store
+from mobility.gtfs import SEGUNDOS_DIA, SIN_HORA
+
 # =============================================
 # CONFIGURACIÓN INICIAL
 # =============================================
@@ -160,41 +161,17 @@ def get_color(speed):
     else:
         return 'darkgreen'
 
-# Cargar los datos
-@st.cache_data
-def load_data():
-    agency_dbus = pd.read_csv("Datos 1/agency_dbus.csv", sep=';')
-    calendar_dbus = pd.read_csv("Datos 1/calendar_dbus.csv", sep=';')
-    routes_dbus = pd.read_csv("Datos 1/routes_dbus.csv", sep=';')
-    stt_dbus = pd.read_csv("Datos 1/stop_times_dbus.csv", sep=';')
-    st_dbus = pd.read_csv("Datos 1/stops_dbus.csv", sep=';')
-    tri_dbus = pd.read_csv("Datos 1/trips_dbus.csv", sep=';')
-    sha_dbus = pd.read_csv("Datos 1/sha_dbus.csv", sep=';')
-    return agency_dbus, calendar_dbus, routes_dbus, stt_dbus, st_dbus, tri_dbus, sha_dbus
-
-agency_dbus, calendar_dbus, routes_dbus, stt_dbus, st_dbus, tri_dbus, sha_dbus = load_data()
-
-# Procesamiento de datos
-stt_dbus['shape_dist_traveled'] = stt_dbus['shape_dist_traveled'].astype(str).str.replace(',', '.').astype(float)
-stt_dbus.loc[stt_dbus['shape_dist_traveled'] < 12, 'shape_dist_traveled'] *= 1000
-
-# Unión de datos
-df = tri_dbus[['trip_id', 'route_id', 'service_id', 'direction_id', 'shape_id']]
-stt_dbus = stt_dbus.merge(df, on='trip_id', how='left').drop_duplicates()
-stt_dbus['arrival_time'] = pd.to_timedelta(stt_dbus['arrival_time'])
-stt_dbus['departure_time'] = pd.to_timedelta(stt_dbus['departure_time'])
-
-stt_dbus['time_between_stops'] = stt_dbus['arrival_time'] - stt_dbus.groupby('trip_id')['departure_time'].shift(1)
-stt_dbus['time_between_stops'] = stt_dbus['time_between_stops'].fillna(pd.Timedelta(seconds=0)).dt.total_seconds()
+# Tablas del GTFS precalculadas y compartidas por todas las sesiones: cada parada
+# con su viaje y el tiempo, la distancia y la velocidad desde la anterior
+# (stop_speeds), y la geometría simplificada de cada tramo entre paradas
+gtfs = gtfs_feed()
+st_dbus = gtfs['stops']
+segmentos = segment_store()
 
 # Crear df_final
-df_final = stt_dbus[['route_id', 'service_id', 'trip_id', 'direction_id', 'shape_id',
-                     'arrival_time', 'stop_id', 'stop_sequence', 'time_between_stops', 'shape_dist_traveled']].copy()
-df_final['distance_between_stops'] = df_final['shape_dist_traveled'] - df_final.groupby('trip_id')['shape_dist_traveled'].shift(1)
-df_final['distance_between_stops'] = df_final['distance_between_stops'].fillna(0)
-df_final['avg_speed'] = df_final['distance_between_stops'] / df_final['time_between_stops']
-df_final['avg_speed'] = df_final['avg_speed'].fillna(0)
-df_final.loc[df_final['time_between_stops'] == 0, ['avg_speed', 'distance_between_stops']] = 0
+df_final = gtfs['stop_speeds'][['route_id', 'service_id', 'trip_id', 'direction_id', 'shape_id',
+                                'arrival_time', 'stop_id', 'prev_stop_id', 'stop_sequence', 'time_between_stops',
+                                'shape_dist_traveled', 'distance_between_stops', 'avg_speed']]
 
 # Crear df_result para mostrar paradas
 df3 = df_final[['route_id', 'stop_id']]
@@ -236,24 +213,26 @@ with col2:
 
 st.markdown('<div class="subsection-divider"></div>', unsafe_allow_html=True)
 
-# Filtrar datos por horario
-df_final["arrival_time_only"] = df_final["arrival_time"].dt.components.hours.astype(str).str.zfill(2) + ":" + \
-                                df_final["arrival_time"].dt.components.minutes.astype(str).str.zfill(2) + ":" + \
-                                df_final["arrival_time"].dt.components.seconds.astype(str).str.zfill(2)
-df_final["arrival_time_only"] = pd.to_datetime(df_final["arrival_time_only"], format="%H:%M:%S").dt.time
+# Filtrar datos por horario: arrival_time son segundos desde el inicio del día
+# de servicio, y las llegadas de después de medianoche (24:00:00 en adelante)
+# cuentan a su hora del reloj. Las paradas sin hora (SIN_HORA) no entran en
+# ninguna franja: el módulo las llevaría a las 23:59:59
+llegada = df_final["arrival_time"].to_numpy()
+segundo_del_dia = llegada % SEGUNDOS_DIA
+en_horario = (llegada != SIN_HORA) & \
+             (segundo_del_dia >= hora_inicio.hour * 3600 + hora_inicio.minute * 60) & \
+             (segundo_del_dia <= hora_fin.hour * 3600 + hora_fin.minute * 60)
 
 if route_id != "All":
-    df_filtrado = df_final[(df_final["route_id"].astype(str) == route_id) &
-                           (df_final["arrival_time_only"] >= hora_inicio) &
-                           (df_final["arrival_time_only"] <= hora_fin)]
+    df_filtrado = df_final[(df_final["route_id"].astype(str) == route_id) & en_horario]
 else:
-    df_filtrado = df_final[(df_final["arrival_time_only"] >= hora_inicio) &
-                           (df_final["arrival_time_only"] <= hora_fin)]
+    df_filtrado = df_final[en_horario]
 
-# Calcular velocidad promedio por tramo entre paradas
-segment_speeds = df_filtrado[df_filtrado["stop_sequence"] > 1].copy()
-segment_speeds["prev_stop_id"] = segment_speeds.groupby('trip_id')['stop_id'].shift(1)
-segment_speeds = segment_speeds.dropna(subset=["prev_stop_id"])
+# Calcular velocidad promedio por tramo entre paradas (el primer tramo de cada
+# viaje dentro de la ventana no cuenta, como al calcular la parada anterior
+# sobre las filas filtradas)
+segment_speeds = df_filtrado[df_filtrado["stop_sequence"] > 1]
+segment_speeds = segment_speeds[segment_speeds['trip_id'].duplicated()]
 segment_avg = segment_speeds.groupby(['shape_id', 'prev_stop_id', 'stop_id'])['avg_speed'].mean().reset_index()
 
 # Crear mapa
@@ -276,31 +255,16 @@ else:
             icon=folium.Icon(color="red", icon="info-sign")
         ).add_to(mapa)
 
-    # Pintar tramos promedios
-    for _, row in segment_avg.iterrows():
-        shape_id = row['shape_id']
-        stop1 = st_dbus[st_dbus['stop_id'] == row['prev_stop_id']][['stop_lat', 'stop_lon']].values
-        stop2 = st_dbus[st_dbus['stop_id'] == row['stop_id']][['stop_lat', 'stop_lon']].values
-        if len(stop1) == 0 or len(stop2) == 0:
-            continue
-
-        coord1, coord2 = stop1[0], stop2[0]
-        shape_points = sha_dbus[sha_dbus['shape_id'] == shape_id].sort_values('shape_pt_sequence')
-        shape_coords = shape_points[['shape_pt_lat', 'shape_pt_lon']].values.tolist()
-
-        idx1 = min(range(len(shape_coords)), key=lambda i: geodesic(shape_coords[i], coord1).meters)
-        idx2 = min(range(len(shape_coords)), key=lambda i: geodesic(shape_coords[i], coord2).meters)
-        if idx1 > idx2:
-            idx1, idx2 = idx2, idx1
-
-        segment_coords = shape_coords[idx1:idx2+1]
-        if len(segment_coords) >= 2:
-            PolyLine(
-                locations=segment_coords,
-                color=get_color(row['avg_speed']),
-                weight=6,
-                tooltip=f"Avg Speed: {row['avg_speed']:.2f} m/s"
-            ).add_to(mapa)
+    # Pintar tramos promedios: la geometría de los tramos de la ruta ya está
+    # precalculada, basta con unirla con sus velocidades
+    tramos = segment_avg.merge(segmentos.route(route_id), on=['shape_id', 'prev_stop_id', 'stop_id'])
+    for velocidad, coordenadas in zip(tramos['avg_speed'], tramos['locations']):
+        PolyLine(
+            locations=coordenadas,
+            color=get_color(velocidad),
+            weight=6,
+            tooltip=f"Avg Speed: {velocidad:.2f} m/s"
+        ).add_to(mapa)
 
 # Leyenda del mapa
 from branca.element import Template, MacroElement
@@ -3,6 +3,8 @@ import numpy as np
 import pandas as pd
 import plotly.express as px
 
+from mobility.data_layer import gtfs_feed
+
 # =============================================
 # CONFIGURACIÓN INICIAL (ESTILO COMO PAGINA PRINCIPAL)
 # =============================================
@@ -170,34 +172,16 @@ with st.container():
     """, unsafe_allow_html=True)
 
 # --- Carga y procesamiento de datos ---
-@st.cache_data
-def load_data():
-    # Cargar datos originales
-    agency_dbus = pd.read_csv("Datos 1/agency_dbus.csv", sep=';')
-    calendar_dbus = pd.read_csv("Datos 1/calendar_dbus.csv", sep=';')
-    routes_dbus = pd.read_csv("Datos 1/routes_dbus.csv", sep=';')
-    stt_dbus = pd.read_csv("Datos 1/stop_times_dbus.csv", sep=';')
-    st_dbus = pd.read_csv("Datos 1/stops_dbus.csv", sep=';')
-    tri_dbus = pd.read_csv("Datos 1/trips_dbus.csv", sep=';')
-    sha_dbus = pd.read_csv("Datos 1/sha_dbus.csv", sep=';')
-    
-    # Procesamiento de stop_times
-    stt_dbus['shape_dist_traveled'] = stt_dbus['shape_dist_traveled'].astype(str).str.replace(',', '.').astype(float)
-    stt_dbus.loc[stt_dbus['shape_dist_traveled'] < 12, 'shape_dist_traveled'] *= 1000
-    
-    # Convertir tiempos y calcular diferencias
-    stt_dbus['arrival_time'] = pd.to_timedelta(stt_dbus['arrival_time'])
-    stt_dbus['departure_time'] = pd.to_timedelta(stt_dbus['departure_time'])
-    
-    # Calcular distancia y tiempo entre paradas consecutivas
-    stt_dbus['dist_between_stops'] = stt_dbus.groupby('trip_id')['shape_dist_traveled'].diff()
-    stt_dbus['time_between_stops'] = stt_dbus.groupby('trip_id')['arrival_time'].diff().dt.total_seconds()
-    
-    # Calcular velocidad (km/h) entre paradas
-    stt_dbus['speed_kmh'] = (stt_dbus['dist_between_stops'] / 1000) / (stt_dbus['time_between_stops'] / 3600)
+@st.cache_data(max_entries=1)
+def load_data(_gtfs, firma):
+    # Paradas de cada viaje ya enriquecidas: stop_speeds trae la velocidad
+    # (km/h) de llegada a llegada desde la parada anterior del viaje, NaN en la
+    # primera parada o sin hora; la firma de los ficheros hace de clave de la caché.
+    # cache_data da a cada sesión su propia copia del resultado
+    stt_dbus = _gtfs['stop_speeds'][['trip_id', 'route_id', 'stop_id', 'speed_kmh']]
+    st_dbus = _gtfs['stops']
     
-    # Unir con información de rutas y paradas
-    stt_dbus = stt_dbus.merge(tri_dbus[['trip_id', 'route_id']], on='trip_id', how='left')
+    # Unir con el nombre de las paradas
     stt_dbus = stt_dbus.merge(st_dbus[['stop_id', 'stop_name']], on='stop_id', how='left')
     
     # Crear secuencia de paradas
@@ -216,10 +200,11 @@ def load_data():
     # Eliminar la última parada de cada ruta (no tiene siguiente parada)
     df_final = df_final.dropna(subset=['next_stop_id'])
     
-    return agency_dbus, calendar_dbus, routes_dbus, stt_dbus, st_dbus, tri_dbus, sha_dbus, df_final
+    return df_final
 
 # Cargar datos
-agency_dbus, calendar_dbus, routes_dbus, stt_dbus, st_dbus, tri_dbus, sha_dbus, df_final = load_data()
+gtfs = gtfs_feed()
+df_final = load_data(gtfs, gtfs.firma)
 
 # =============================================
 # SELECCIÓN DE RUTA Y PARADAS
@@ -11,8 +11,18 @@ from streamlit_folium import st_folium
 from streamlit_folium import folium_static
 from folium.plugins import MarkerCluster
 import calendar
+from datetime import timedelta
 import plotly.graph_objects as go
 
+from mobility.boxplot import box_figure, box_stats
+from mobility.data_layer import station_correlation, station_registry, traffic_anomalies, traffic_data, traffic_forecast
+from mobility.downsample import downsample_series
+from mobility.station_registry import StationRegistry
+from mobility.traffic_anomaly import FRANJAS, UMBRAL_Z
+from mobility.traffic_archive import ESTACIONES_DEL_ANIO
+from mobility.traffic_cube import ETIQUETAS_HORA, NOMBRES_DIA, period_bounds
+from mobility.traffic_sketch import ALFA
+
 # =============================================
 # CONFIGURACIÓN INICIAL (ESTILO COMO PAGINA PRINCIPAL)
 # =============================================
@@ -181,62 +191,27 @@ if "show_section" not in st.session_state:
 # CARGA DE DATOS
 # =============================================
 carpeta = "Datos 2"
-lista_df = []
-columnas_requeridas = ['Fecha', 'Hora']
-
-for i, Datos in enumerate(os.listdir(carpeta)):
-    base_datos = os.path.join(carpeta, Datos)
-    
-    if Datos.lower() == 'estaciones.csv':
-        try:
-            df_estaciones = pd.read_csv(base_datos, delimiter=";", encoding='latin1')
-            st.session_state.datos_estaciones = df_estaciones
-            continue
-        except Exception as e:
-            continue
-    
-    if base_datos.endswith('.csv'):
-        try:
-            try:
-                df = pd.read_csv(base_datos, delimiter=";", encoding='utf-8')
-            except UnicodeDecodeError:
-                df = pd.read_csv(base_datos, delimiter=";", encoding='latin1')
-            
-            if not all(col in df.columns for col in columnas_requeridas):
-                st.warning(f"File {Datos} skipped - missing columns")
-                continue
-                
-            if i > 0:
-                df = df.iloc[1:].reset_index(drop=True)
-            
-            df['Fecha'] = pd.to_datetime(df['Fecha'], dayfirst=True)
-            df['Hora'] = df['Hora'].astype(str)
-            
-            for col in df.columns:
-                if 'ligeros' in col or 'pesados' in col:
-                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
-            
-            lista_df.append(df)
-            
-        except Exception as e:
-            st.error(f"Error processing {Datos}: {str(e)}")
-            continue
 
-# Combinar todos los DataFrames válidos
-if lista_df:
-    df_final = pd.concat(lista_df, ignore_index=True)
-    
-    # Limpieza final
-    df_final = df_final.dropna(subset=columnas_requeridas)
-    df_final['DiaSemana'] = df_final['Fecha'].dt.day_name()
-    df_final['Mes'] = df_final['Fecha'].dt.month
-    
-    # Identificar automáticamente columnas de carriles
-    columnas_carriles = [col for col in df_final.columns if 'ligeros' in col.lower() or 'pesados' in col.lower()]
-    df_final['Total_Vehiculos'] = df_final[columnas_carriles].sum(axis=1)
-
-    # 🔁 AÑADIR AQUÍ:
-    df_final['Day_Type'] = df_final['Fecha'].dt.dayofweek.apply(lambda x: 'Weekend' if x >= 5 else 'Weekday')
+# Histórico y agregados del almacén, cargados una vez por proceso y compartidos
+# entre sesiones (se recargan solo si cambian los ficheros semanales)
+datos_trafico = traffic_data(carpeta)
+for aviso in datos_trafico.avisos:
+    st.error(aviso)
+
+# Conteos estación x hora x carril mapeados en memoria
+tensor = datos_trafico.tensor
+# Cubo preagregado (estación x año x mes x día x hora) del que salen los gráficos
+cubo = datos_trafico.cubo
+# Bocetos de cuantiles por estación y mes (medianas y cuartiles sin ordenar filas)
+bocetos = datos_trafico.bocetos
+años_disponibles = list(cubo.anios)
+estaciones_disponibles = list(tensor.estaciones)
+# Código del histórico <-> ETD code, carretera y coordenadas (estaciones.csv)
+try:
+    registro = station_registry(carpeta)
+except Exception as e:
+    st.error(f"Error loading stations file: {str(e)}")
+    registro = StationRegistry.build(pd.DataFrame(), tensor.estaciones)
 # ============================================================================================================================================
 # SECCIÓN 1: Statical Modeling
 # ============================================================================================================================================
@@ -251,13 +226,14 @@ if st.session_state.show_section in ["all", "modelizacion"]:
         col1, col2, col3 = st.columns(3)
         
         # Estadísticos clave
-        total_vehicles = df_final['Total_Vehiculos'].sum()
-        avg_per_station = df_final.groupby('Estacion')['Total_Vehiculos'].mean().mean()
-        peak_hour = df_final.groupby('Hora')['Total_Vehiculos'].mean().idxmax()
+        total_vehicles = cubo.total()
+        avg_per_station = cubo.reduce(['estacion'])['mean'].mean()
+        media_por_hora = cubo.reduce(['hora'])
+        peak_hour = ETIQUETAS_HORA[media_por_hora.loc[media_por_hora['mean'].idxmax(), 'hora']]
         
         col1.metric("Total Vehicles Recorded", f"{total_vehicles:,}")
         col2.metric("Avg Vehicles per Station", f"{avg_per_station:,.0f}")
-        col3.metric("Peak Traffic Hour", f"{peak_hour}:00")
+        col3.metric("Peak Traffic Hour", peak_hour)
 
 
   
@@ -267,27 +243,30 @@ if st.session_state.show_section in ["all", "modelizacion"]:
     with st.container():
         st.markdown('<h4 style="text-align: center;">🚦 1. Traffic Distribution by Station</h4>', unsafe_allow_html=True)
         
-        if 'Estacion' in df_final.columns and 'Total_Vehiculos' in df_final.columns:
-            top_estaciones = df_final.groupby('Estacion')['Total_Vehiculos'].median().nlargest(5).index
-            estaciones_seleccionadas = st.multiselect("Select stations:", df_final['Estacion'].unique(), default=list(top_estaciones), key="estaciones_boxplot")
+        if len(estaciones_disponibles) > 0:
+            top_estaciones = bocetos.station_quantiles(0.5)[0.5].nlargest(5).index
+            estaciones_seleccionadas = st.multiselect("Select stations:", estaciones_disponibles, default=list(top_estaciones), format_func=registro.label, key="estaciones_boxplot")
             
             if estaciones_seleccionadas:
-                estacion_a_numero = {estacion: i+1 for i, estacion in enumerate(estaciones_seleccionadas)}
-                df_boxplot = df_final[df_final['Estacion'].isin(estaciones_seleccionadas)].copy()
-                df_boxplot['Estacion_Numero'] = df_boxplot['Estacion'].map(estacion_a_numero)
+                # Cuartiles de los bocetos de cuantiles (de todos los meses); las
+                # horas de la estación solo se recorren para bigotes y atípicos.
+                # Al navegador llegan cinco números por estación y una muestra de atípicos
+                resumen_cajas = pd.DataFrame([
+                    {'Estacion': estacion, **box_stats(
+                        tensor.totals(estacion), cuartiles=bocetos.quantiles(estacion, [0.25, 0.5, 0.75]),
+                        error_relativo=ALFA,
+                    )}
+                    for estacion in estaciones_seleccionadas
+                ])
                 
-                fig = px.box(
-                    df_boxplot,
-                    x='Estacion_Numero', 
+                fig = box_figure(
+                    resumen_cajas,
+                    x='Estacion', 
                     y='Total_Vehiculos',
                     color='Estacion',
                     title="Traffic distribution by station",
-                    labels={'Estacion_Numero': 'Station'}
-                )
-                
-                fig.update_xaxes(
-                    tickvals=list(estacion_a_numero.values()),
-                    ticktext=[f"Station {num}" for num in estacion_a_numero.values()]
+                    labels={'Estacion': 'Station'},
+                    etiquetas_x={estacion: f"Station {num}" for num, estacion in enumerate(estaciones_seleccionadas, 1)}
                 )
                 
                 st.plotly_chart(fig, use_container_width=True)
@@ -300,28 +279,31 @@ if st.session_state.show_section in ["all", "modelizacion"]:
         
         años_seleccionados = st.multiselect(
             "Select year(s):", 
-            df_final['Fecha'].dt.year.unique(),
-            default=[df_final['Fecha'].dt.year.unique()[-1]],
+            años_disponibles,
+            default=[años_disponibles[-1]],
             key="year_multiselect"
         )
         
         estaciones_evolucion = st.multiselect(
             "Select stations to display:", 
-            df_final['Estacion'].unique(),
-            default=df_final['Estacion'].unique()[:3],
+            estaciones_disponibles,
+            default=estaciones_disponibles[:3],
+            format_func=registro.label,
             key="estaciones_evolucion"
         )
         
-        df_filtrado = df_final[
-            (df_final['Fecha'].dt.year.isin(años_seleccionados)) & 
-            (df_final['Estacion'].isin(estaciones_evolucion))
-        ]
+        df_agrupado = cubo.select(anio=años_seleccionados, estacion=estaciones_evolucion).reduce(['hora', 'estacion', 'anio'])
         
-        if not df_filtrado.empty and len(años_seleccionados) > 0:
-            df_filtrado['Año-Estación'] = df_filtrado['Fecha'].dt.year.astype(str) + " - " + df_filtrado['Estacion'].astype(str)
+        if not df_agrupado.empty and len(años_seleccionados) > 0:
+            df_agrupado = pd.DataFrame({
+                'Hora': ETIQUETAS_HORA[df_agrupado['hora']],
+                'Año-Estación': df_agrupado['anio'].astype(str) + " - " + df_agrupado['estacion'].astype(str),
+                'Estacion': df_agrupado['estacion'],
+                'Total_Vehiculos': df_agrupado['mean'],
+            }).sort_values(['Hora', 'Año-Estación'])
             
             fig = px.line(
-                df_filtrado.groupby(['Hora', 'Año-Estación', 'Estacion', df_filtrado['Fecha'].dt.year])['Total_Vehiculos'].mean().reset_index(),
+                df_agrupado,
                 x='Hora', 
                 y='Total_Vehiculos',
                 color='Año-Estación',
@@ -341,6 +323,128 @@ if st.session_state.show_section in ["all", "modelizacion"]:
             st.warning("Please select at least one year and one station.")
         st.markdown('</div>', unsafe_allow_html=True)
 
+    # Serie horaria completa, reducida con LTTB al ancho del gráfico
+    st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
+    with st.container():
+        st.markdown('<h4 style="text-align: center;">📉 3. Raw Hourly Series</h4>', unsafe_allow_html=True)
+        
+        estaciones_serie = st.multiselect(
+            "Select stations to display:", 
+            estaciones_disponibles,
+            default=estaciones_disponibles[:3],
+            format_func=registro.label,
+            key="estaciones_serie"
+        )
+        
+        if estaciones_serie and len(tensor.horas) > 0:
+            primera_hora = tensor.timestamps(0).astype(object)
+            ultima_hora = (tensor.timestamps(-1) + np.timedelta64(1, 'h')).astype(object)
+            if "ventana_serie" not in st.session_state:
+                st.session_state.ventana_serie = (primera_hora, ultima_hora)
+            
+            def ampliar_ventana():
+                # Al seleccionar un rango con la caja se vuelve a reducir solo esa ventana
+                cajas = st.session_state.grafico_serie.selection.get('box', [])
+                if cajas:
+                    desde, hasta = sorted(pd.to_datetime(cajas[0]['x'], format='ISO8601'))
+                    st.session_state.ventana_serie = (
+                        max(desde.floor('h').to_pydatetime(), primera_hora),
+                        min(hasta.ceil('h').to_pydatetime(), ultima_hora),
+                    )
+            
+            def restablecer_ventana():
+                st.session_state.ventana_serie = (primera_hora, ultima_hora)
+            
+            inicio_ventana, fin_ventana = st.slider(
+                "Time window:",
+                min_value=primera_hora,
+                max_value=ultima_hora,
+                step=timedelta(hours=1),
+                format="YYYY-MM-DD HH:mm",
+                key="ventana_serie"
+            )
+            st.button("Reset zoom", key="btn_reset_serie", on_click=restablecer_ventana)
+            
+            horas_ventana = tensor.time_slice(inicio_ventana, fin_ventana)
+            fig = go.Figure()
+            for estacion in estaciones_serie:
+                horas, totales = tensor.series(estacion, horas_ventana)
+                horas, totales = downsample_series(horas, totales)
+                fig.add_trace(go.Scattergl(
+                    x=horas.astype('datetime64[h]'), y=totales,
+                    mode='lines', name=str(estacion)
+                ))
+            
+            fig.update_layout(
+                title="Hourly vehicles (select a range to load more detail)",
+                xaxis_title="Time",
+                yaxis_title="Vehicles per hour",
+                legend_title_text='Station',
+                dragmode='select',
+                selectdirection='h'
+            )
+            
+            st.plotly_chart(fig, use_container_width=True, key="grafico_serie",
+                            on_select=ampliar_ventana, selection_mode="box")
+        else:
+            st.warning("Please select at least one station.")
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    # Correlación entre estaciones, calculada una vez por ventana
+    st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
+    with st.container():
+        st.markdown('<h4 style="text-align: center;">🔗 4. Station Correlation</h4>', unsafe_allow_html=True)
+
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            anio_desde, anio_hasta = st.select_slider(
+                "Years:",
+                options=años_disponibles,
+                value=(años_disponibles[0], años_disponibles[-1]),
+                key="anios_correlacion"
+            )
+        with col2:
+            sin_perfil = st.checkbox(
+                "Remove weekday x hour profile", value=True, key="perfil_correlacion",
+                help="Correlate deviations from each station's usual weekday x hour traffic"
+            )
+
+        correlacion = station_correlation(
+            str(period_bounds(int(anio_desde))[0]), str(period_bounds(int(anio_hasta))[1]), sin_perfil, carpeta
+        )
+        orden = correlacion.cluster_order()
+
+        if len(orden) > 1:
+            etiquetas = [registro.label(e) for e in correlacion.estaciones[orden]]
+            fig = go.Figure(go.Heatmap(
+                z=correlacion.r[np.ix_(orden, orden)],
+                x=etiquetas,
+                y=etiquetas,
+                zmin=-1, zmax=1,
+                colorscale='RdBu_r',
+                colorbar=dict(title='r'),
+                hovertemplate="%{y}<br>%{x}<br>r = %{z:.2f}<extra></extra>"
+            ))
+            fig.update_layout(
+                title=f"Hourly traffic correlation between stations ({anio_desde}-{anio_hasta}, clustered)",
+                height=800,
+                xaxis=dict(showticklabels=len(orden) <= 60),
+                yaxis=dict(showticklabels=len(orden) <= 60, autorange='reversed')
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+            with st.expander("🔍 Most correlated station pairs"):
+                pares = correlacion.top_pairs(50)
+                st.dataframe(
+                    pares.assign(
+                        Estacion_A=pares['Estacion_A'].map(registro.label),
+                        Estacion_B=pares['Estacion_B'].map(registro.label),
+                    ).rename(columns={'Estacion_A': 'Station A', 'Estacion_B': 'Station B', 'Horas_comunes': 'Common hours'}),
+                    use_container_width=True
+                )
+        else:
+            st.warning("Not enough overlapping hours in this window to correlate stations.")
+
 # ==========================================================================================================================================================
 # SECCIÓN 2: Temporal Analysis (Versión Mejorada)
 # ==========================================================================================================================================================
@@ -359,14 +463,15 @@ if st.session_state.show_section in ["all", "analisis"]:
         with col1:
             selected_road = st.selectbox(
                 "Select road:",
-                df_final['Estacion'].unique(),
+                estaciones_disponibles,
+                format_func=registro.label,
                 key="weekly_road"
             )
         with col2:
             selected_year = st.selectbox(
                 "Select year:",
-                sorted(df_final['Fecha'].dt.year.unique()),
-                index=len(df_final['Fecha'].dt.year.unique())-1,
+                años_disponibles,
+                index=len(años_disponibles)-1,
                 key="weekly_year"
             )
         with col3:
@@ -377,20 +482,14 @@ if st.session_state.show_section in ["all", "analisis"]:
                 key="weekly_month"
             )
         
-        # Filtrar y procesar datos
-        df_filtered = df_final[
-            (df_final['Estacion'] == selected_road) &
-            (df_final['Fecha'].dt.year == selected_year) &
-            (df_final['Fecha'].dt.month == selected_month)
-        ].copy()
+        # Recorte del cubo para la carretera, año y mes seleccionados
+        por_dia = cubo.select(estacion=selected_road, anio=selected_year, mes=selected_month).reduce(['dia_semana'])
         
-        if not df_filtered.empty:
-            df_filtered['DiaSemana'] = df_filtered['Fecha'].dt.day_name()
-            df_filtered['DiaSemana'] = pd.Categorical(df_filtered['DiaSemana'], 
-                                                     categories=['Monday','Tuesday','Wednesday','Thursday','Friday','Saturday','Sunday'],
-                                                     ordered=True)
-            
-            weekly_avg = df_filtered.groupby('DiaSemana')['Total_Vehiculos'].mean().reset_index()
+        if not por_dia.empty:
+            weekly_avg = pd.DataFrame({
+                'DiaSemana': pd.Categorical([NOMBRES_DIA[d] for d in por_dia['dia_semana']], categories=NOMBRES_DIA, ordered=True),
+                'Total_Vehiculos': por_dia['mean'],
+            })
             
             # Gráfico de área mejorado
             fig = px.area(
@@ -431,23 +530,20 @@ if st.session_state.show_section in ["all", "analisis"]:
         with col1:
             road_monthly = st.selectbox(
                 "Select road:",
-                df_final['Estacion'].unique(),
+                estaciones_disponibles,
+                format_func=registro.label,
                 key="monthly_road"
             )
         with col2:
             year_monthly = st.selectbox(
                 "Select year:",
-                sorted(df_final['Fecha'].dt.year.unique()),
-                index=len(df_final['Fecha'].dt.year.unique())-1,
+                años_disponibles,
+                index=len(años_disponibles)-1,
                 key="monthly_year"
             )
         
-        df_monthly = df_final[
-            (df_final['Estacion'] == road_monthly) &
-            (df_final['Fecha'].dt.year == year_monthly)
-        ]
-        
-        monthly_avg = df_monthly.groupby('Mes')['Total_Vehiculos'].mean().reset_index()
+        por_mes = cubo.select(estacion=road_monthly, anio=year_monthly).reduce(['mes'])
+        monthly_avg = pd.DataFrame({'Mes': por_mes['mes'], 'Total_Vehiculos': por_mes['mean']})
         monthly_avg['Month_Name'] = monthly_avg['Mes'].apply(lambda x: calendar.month_name[x])
         
         fig = px.bar(
@@ -475,7 +571,8 @@ if st.session_state.show_section in ["all", "analisis"]:
         with cols[0]:
             road_yearly = st.selectbox(
                 "Select road:",
-                df_final['Estacion'].unique(),
+                estaciones_disponibles,
+                format_func=registro.label,
                 key="yearly_road"
             )
 
@@ -486,8 +583,7 @@ if st.session_state.show_section in ["all", "analisis"]:
             show_trend = st.checkbox("Show trend", value=True, key="trend_checkbox")
 
         # Preparar datos
-        df_yearly = df_final[df_final['Estacion'] == road_yearly]
-        yearly_stats = df_yearly.groupby(df_yearly['Fecha'].dt.year)['Total_Vehiculos'].agg(['mean','std','count']).reset_index()
+        yearly_stats = cubo.select(estacion=road_yearly).reduce(['anio'])[['anio', 'mean', 'std', 'count']]
         yearly_stats.columns = ['Year', 'Average', 'Std', 'Count']
 
         # Crear gráfico con estilo minimalista
@@ -581,27 +677,20 @@ if st.session_state.show_section in ["all", "analisis"]:
     with st.container():
         st.markdown('<h4 style="text-align: center;">🌸 4. Seasonal Traffic Trends</h4>', unsafe_allow_html=True)
 
-        # Función para estaciones climáticas
-        def get_season(date):
-            month = date.month
-            if month in [12, 1, 2]: return 'Winter'
-            elif month in [3, 4, 5]: return 'Spring'
-            elif month in [6, 7, 8]: return 'Summer'
-            else: return 'Autumn'
-
         # Selector de año
         selected_year = st.selectbox(
             "Select year:",
-            sorted(df_final['Fecha'].dt.year.unique()),
-            index=len(df_final['Fecha'].dt.year.unique())-1,
+            años_disponibles,
+            index=len(años_disponibles)-1,
             key="seasonal_year"
         )
 
-        # Procesamiento de datos
-        df_season = df_final[df_final['Fecha'].dt.year == selected_year].copy()
-        df_season['Season'] = df_season['Fecha'].apply(get_season)
+        # Procesamiento de datos: medias mensuales del cubo agrupadas por estación del año
+        df_season = cubo.select(anio=selected_year).reduce(['mes'])
+        df_season['Season'] = ESTACIONES_DEL_ANIO[df_season['mes'].to_numpy()]
 
-        season_avg = df_season.groupby('Season')['Total_Vehiculos'].mean().reset_index()
+        season_avg = df_season.groupby('Season')[['sum', 'count']].sum().reset_index()
+        season_avg['Total_Vehiculos'] = season_avg['sum'] / season_avg['count']
         season_order = ['Winter', 'Spring', 'Summer', 'Autumn']
         season_avg['Season'] = pd.Categorical(season_avg['Season'], categories=season_order, ordered=True)
         season_avg = season_avg.sort_values('Season')
@@ -620,6 +709,130 @@ if st.session_state.show_section in ["all", "analisis"]:
         fig.update_layout(showlegend=False)
         st.plotly_chart(fig, use_container_width=True)
 
+    # ----------------------------
+    # 5. HORAS ANÓMALAS
+    # ----------------------------
+    st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
+    with st.container():
+        st.markdown('<h4 style="text-align: center;">🚨 5. Anomalous Hours</h4>', unsafe_allow_html=True)
+
+        # Líneas base día x hora y z robusta de todas las estaciones, calculadas una vez
+        anomalias = traffic_anomalies(carpeta)
+
+        umbral_z = st.slider(
+            "Robust z-score threshold:",
+            min_value=2.0, max_value=10.0, value=float(UMBRAL_Z), step=0.5,
+            key="umbral_anomalias"
+        )
+        conteo_anomalias = anomalias.counts_by_station(umbral_z)
+
+        col1, col2 = st.columns(2)
+        col1.metric("Anomalous hours", f"{int(conteo_anomalias.sum()):,}")
+        col2.metric("Stations affected", f"{int((conteo_anomalias > 0).sum())} / {len(conteo_anomalias)}")
+
+        fig = px.bar(
+            conteo_anomalias.head(20).reset_index().astype({'Estacion': str}),
+            x='Estacion',
+            y='Anomalias',
+            title="Stations with most anomalous hours",
+            labels={'Estacion': 'Station', 'Anomalias': 'Anomalous hours'}
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        estacion_anomalias = st.selectbox(
+            "Select station:",
+            list(conteo_anomalias.index),
+            format_func=registro.label,
+            key="estacion_anomalias"
+        )
+        horas, totales = tensor.series(estacion_anomalias)
+        esperado = anomalias.expected(estacion_anomalias, horas)
+        marcadas = anomalias.flagged(umbral_z, estacion=estacion_anomalias)
+
+        fig = go.Figure()
+        for nombre, valores in (("Observed", totales), ("Expected (weekday x hour median)", esperado)):
+            x, y = downsample_series(horas, valores)
+            fig.add_trace(go.Scattergl(x=x.astype('datetime64[h]'), y=y, mode='lines', name=nombre))
+        fig.add_trace(go.Scattergl(
+            x=marcadas['Fecha_Hora'], y=marcadas['Total_Vehiculos'], mode='markers',
+            name="Anomaly", marker=dict(color='red', size=6),
+            customdata=marcadas[['Esperado', 'z']],
+            hovertemplate="%{x}<br>Vehicles: %{y}<br>Expected: %{customdata[0]}<br>z: %{customdata[1]:.1f}<extra></extra>"
+        ))
+        fig.update_layout(
+            title=f"Station {estacion_anomalias}: observed vs expected traffic",
+            xaxis_title="Time",
+            yaxis_title="Vehicles per hour"
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        with st.expander("🔍 Most anomalous hours (all stations)"):
+            st.dataframe(
+                anomalias.flagged(umbral_z).head(200).rename(columns={
+                    'Estacion': 'Station', 'Fecha_Hora': 'Hour', 'Total_Vehiculos': 'Vehicles', 'Esperado': 'Expected'
+                }),
+                use_container_width=True
+            )
+
+    # ----------------------------
+    # 6. PREVISIÓN
+    # ----------------------------
+    st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
+    with st.container():
+        st.markdown('<h4 style="text-align: center;">🔮 6. Traffic Forecast</h4>', unsafe_allow_html=True)
+
+        # Tendencia + perfil día x hora de todas las estaciones, ajustados una vez
+        prevision = traffic_forecast(carpeta)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            estacion_prevision = st.selectbox(
+                "Select station:",
+                list(prevision.estaciones),
+                format_func=registro.label,
+                key="estacion_prevision"
+            )
+        with col2:
+            semanas_prevision = st.slider("Weeks ahead:", min_value=1, max_value=8, value=2, key="semanas_prevision")
+
+        futuro = prevision.predict(estacion_prevision, prevision.future_hours(semanas_prevision))
+        horas, totales = tensor.series(estacion_prevision, slice(-4 * FRANJAS, None))
+
+        fila = int(np.searchsorted(prevision.estaciones, estacion_prevision))
+        media = np.nanmean(prevision.perfil[fila])
+        col1, col2 = st.columns(2)
+        col1.metric(f"Forecast vehicles ({semanas_prevision} wk)", f"{futuro['Prevision'].sum():,.0f}")
+        col2.metric("Trend", f"{prevision.pendiente[fila] / media:+.1%} / year" if media > 0 else "n/a")
+
+        fig = go.Figure()
+        x, y = downsample_series(horas, totales)
+        fig.add_trace(go.Scattergl(x=x.astype('datetime64[h]'), y=y, mode='lines', name="Observed (last weeks)"))
+        fig.add_trace(go.Scatter(
+            x=futuro['Fecha_Hora'], y=futuro['Superior'], mode='lines', line=dict(width=0),
+            showlegend=False, hoverinfo='skip'
+        ))
+        fig.add_trace(go.Scatter(
+            x=futuro['Fecha_Hora'], y=futuro['Inferior'], mode='lines', line=dict(width=0),
+            fill='tonexty', fillcolor='rgba(255,127,14,0.2)', name="95% interval"
+        ))
+        fig.add_trace(go.Scatter(
+            x=futuro['Fecha_Hora'], y=futuro['Prevision'], mode='lines', name="Forecast",
+            line=dict(color='#FF7F0E')
+        ))
+        fig.update_layout(
+            title=f"Station {estacion_prevision}: hourly forecast",
+            xaxis_title="Time",
+            yaxis_title="Vehicles per hour"
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        with st.expander("🔍 Forecast vehicles per station"):
+            st.dataframe(
+                prevision.weekly_totals(semanas_prevision).sort_values(ascending=False).round()
+                .rename_axis('Station').rename('Forecast vehicles'),
+                use_container_width=True
+            )
+
 # ==================================================================================================================================
 # SECCIÓN 3: MAPA DE ESTACIONES DE TRÁFICO
 # ==================================================================================================================================
@@ -627,49 +840,39 @@ if st.session_state.show_section in ["all", "mapa"]:
     st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
     st.markdown('<h2 class="section-title"><strong>Stations Map</strong></h2>', unsafe_allow_html=True)
     
-    # Load station data
-    carpeta = "Datos 2"
-    estaciones_file = os.path.join(carpeta, "estaciones.csv")
-    
-    try:
-        df_estaciones = pd.read_csv(estaciones_file, encoding='latin1', delimiter=';', index_col=False)
-        st.session_state.datos_estaciones = df_estaciones
-    except Exception as e:
-        st.error(f"Error loading stations file: {str(e)}")
-        df_estaciones = pd.DataFrame()
-
     # Map section - ahora ocupa todo el ancho
     st.markdown('<div class="section-divider"></div>', unsafe_allow_html=True)
     st.markdown('<h4 style="text-align: center;">🗺️ 1. Traffic Stations Map</h4>', unsafe_allow_html=True)
     
-    if not df_estaciones.empty and 'X' in df_estaciones.columns and 'Y' in df_estaciones.columns:
+    con_coordenadas = registro.located()
+    if con_coordenadas:
         # Create station selection dropdown - ahora es el primer selector
-        station_list = df_estaciones['ETD code'].unique().tolist()
         selected_station = st.selectbox(
             "Select a station to zoom to:",
-            options=["All Stations"] + station_list,
+            options=["All Stations"] + [r.estacion for r in con_coordenadas],
+            format_func=lambda e: e if e == "All Stations" else registro.label(e),
             index=0
         )
         
         # Create map centered on average or selected station
-        centro_mapa = [df_estaciones['Y'].mean(), df_estaciones['X'].mean()]
+        centro_mapa = [np.mean([r.lat for r in con_coordenadas]), np.mean([r.lon for r in con_coordenadas])]
         zoom_start = 11
         
         # If a specific station is selected, center the map on it
         if selected_station != "All Stations":
-            station_data = df_estaciones[df_estaciones['ETD code'] == selected_station].iloc[0]
-            centro_mapa = [station_data['Y'], station_data['X']]
+            centro_mapa = list(registro.coordinates(selected_station))
             zoom_start = 13
         
         mapa = folium.Map(location=centro_mapa, zoom_start=zoom_start, width='100%')
         
         # Add markers for each station
-        for idx, row in df_estaciones.iterrows():
-            is_selected = (selected_station != "All Stations" and row['ETD code'] == selected_station)
+        for estacion in con_coordenadas:
+            is_selected = estacion.estacion == selected_station
             
             folium.Marker(
-                location=[row['Y'], row['X']],
-                popup=f"ETD code: {row['ETD code']}<br>X: {row['X']}<br>Y: {row['Y']}",
+                location=[estacion.lat, estacion.lon],
+                popup=f"Station: {estacion.codigo}<br>Road: {estacion.sistema}<br>{estacion.municipio}"
+                      f"<br>X: {estacion.lon}<br>Y: {estacion.lat}",
                 icon=folium.Icon(
                     color='red' if is_selected else 'blue', 
                     icon='info-sign'
@@ -679,7 +882,7 @@ if st.session_state.show_section in ["all", "mapa"]:
             # Add circle to highlight selected station
             if is_selected:
                 folium.Circle(
-                    location=[row['Y'], row['X']],
+                    location=[estacion.lat, estacion.lon],
                     radius=100,
                     color='red',
                     fill=True,
@@ -692,14 +895,19 @@ if st.session_state.show_section in ["all", "mapa"]:
     else:
         st.warning("No valid station data available for the map", icon="⚠️")
 
+    incidencias = registro.report()
+    if len(incidencias):
+        with st.expander(f"⚠️ {len(incidencias)} station codes not matched between the archive and estaciones.csv"):
+            st.dataframe(incidencias.rename(columns={'Estacion': 'Station', 'Motivo': 'Issue'}), use_container_width=True)
+
     # Divider between map and chart
     st.markdown('<hr style="margin: 30px 0;">', unsafe_allow_html=True)
 
     # Traffic pattern analysis section
     st.markdown('<h4 style="text-align: center;">🕒 2. Traffic Patterns Analysis</h4>', unsafe_allow_html=True)
 
-    if not df_final.empty:
-        selected_road = selected_station if 'selected_station' in locals() and selected_station != "All Stations" else df_final['Estacion'].iloc[0]
+    if len(estaciones_disponibles) > 0:
+        selected_road = selected_station if 'selected_station' in locals() and selected_station in tensor else estaciones_disponibles[0]
         
         col1, col2 = st.columns(2)
         with col1:
@@ -715,15 +923,12 @@ if st.session_state.show_section in ["all", "mapa"]:
                 horizontal=True
             )
 
-        df_filtered = df_final[df_final['Estacion'] == selected_road]
-        if selected_month != 'All Months':
-            df_filtered = df_filtered[df_filtered['Fecha'].dt.month == selected_month]
+        mes_cubo = None if selected_month == 'All Months' else selected_month
+        cubo_estacion = cubo.select(estacion=selected_road, mes=mes_cubo)
+
+        traffic_levels = bocetos.quantiles(selected_road, [0.25, 0.75], mes=mes_cubo) if selected_road in tensor else [np.nan]
         
-        if not df_filtered.empty:
-            df_filtered = df_filtered.copy()
-            df_filtered['Hora'] = df_filtered['Hora'].astype(str).str.split(':').str[0].astype(int)
-            
-            traffic_levels = df_filtered['Total_Vehiculos'].quantile([0.25, 0.75]).values
+        if not np.isnan(traffic_levels).any():
             low_traffic = traffic_levels[0]
             high_traffic = traffic_levels[1]
 
@@ -734,17 +939,20 @@ if st.session_state.show_section in ["all", "mapa"]:
                     horizontal=True
                 )
                 
+                laborables = cubo_estacion.select(dia_semana=range(5)).reduce(['hora']).assign(Day_Type='Weekday')
+                fin_de_semana = cubo_estacion.select(dia_semana=[5, 6]).reduce(['hora']).assign(Day_Type='Weekend')
+                
                 if day_type == 'Weekdays':
-                    plot_data = df_filtered[df_filtered['Fecha'].dt.dayofweek < 5]
+                    plot_data = laborables
                     color_scale = ['#3A86FF']
                 elif day_type == 'Weekends':
-                    plot_data = df_filtered[df_filtered['Fecha'].dt.dayofweek >= 5]
+                    plot_data = fin_de_semana
                     color_scale = ['#FF6B6B']
                 else:
-                    plot_data = df_filtered
+                    plot_data = pd.concat([laborables, fin_de_semana]).sort_values(['hora', 'Day_Type'])
                     color_scale = ['#3A86FF', '#FF6B6B']
                 
-                agg_data = plot_data.groupby(['Hora', 'Day_Type'] if day_type == 'Compare' else ['Hora'])['Total_Vehiculos'].mean().reset_index()
+                agg_data = plot_data.rename(columns={'hora': 'Hora', 'mean': 'Total_Vehiculos'})
                 
                 fig = px.bar(
                     agg_data,
@@ -764,9 +972,11 @@ if st.session_state.show_section in ["all", "mapa"]:
                 fig.update_xaxes(tickvals=list(range(24)), title="Hour of Day")
                 
             else:
-                plot_data = df_filtered.copy()
-                plot_data['Day_Name'] = plot_data['Fecha'].dt.day_name()
-                agg_data = plot_data.groupby('Day_Name')['Total_Vehiculos'].mean().reset_index()
+                por_dia = cubo_estacion.reduce(['dia_semana'])
+                agg_data = pd.DataFrame({
+                    'Day_Name': [NOMBRES_DIA[d] for d in por_dia['dia_semana']],
+                    'Total_Vehiculos': por_dia['mean'],
+                })
                 
                 fig = px.bar(
                     agg_data,